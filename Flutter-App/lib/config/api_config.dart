@@ -22,4 +22,14 @@ class ApiConfig {
   static const String apiDownload = '/api/download';
   static const String apiFile = '/api/file';
   static const String apiHealth = '/api/health';
+  static const String apiProgress = '/api/progress';
+
+  // Receive download progress over server-sent events instead of polling
+  static const bool useProgressStream = true;
+
+  // Start saving progressive downloads while the backend is still fetching them
+  static const bool streamWhileDownloading = true;
+
+  // Parallel range requests used to fetch a finished file (1 for a single stream)
+  static const int downloadConnections = 4;
 }
@@ -2,6 +2,8 @@ class VideoInfo {
   final String id;
   final String title;
   final String thumbnail;
+  // Server path of the resized thumbnail proxy, empty when there is none
+  final String thumbnailUrl;
   final int duration;
   final String uploader;
   final int viewCount;
@@ -11,6 +13,7 @@ class VideoInfo {
     required this.id,
     required this.title,
     required this.thumbnail,
+    this.thumbnailUrl = '',
     required this.duration,
     required this.uploader,
     required this.viewCount,
@@ -22,6 +25,7 @@ class VideoInfo {
       id: json['id'] ?? '',
       title: json['title'] ?? 'Unknown',
       thumbnail: json['thumbnail'] ?? '',
+      thumbnailUrl: json['thumbnail_url'] ?? '',
       duration: json['duration'] ?? 0,
       uploader: json['uploader'] ?? 'Unknown',
       viewCount: json['view_count'] ?? 0,
@@ -15,15 +15,44 @@ class DownloadsScreen extends StatefulWidget {
 class _DownloadsScreenState extends State<DownloadsScreen> {
   String _selectedCategory = 'All';
   final DatabaseService _dbService = DatabaseService();
+  final ScrollController _scrollController = ScrollController();
   List<Download> _userDownloads = [];
   bool _isLoading = false;
+  bool _isLoadingMore = false;
+  bool _hasMore = true;
 
   @override
   void initState() {
     super.initState();
+    _scrollController.addListener(_onScroll);
     _loadUserDownloads();
   }
 
+  @override
+  void dispose() {
+    _scrollController.dispose();
+    super.dispose();
+  }
+
+  // Fetch the next page shortly before the end of the list comes into view
+  void _onScroll() {
+    final position = _scrollController.position;
+    if (position.pixels >= position.maxScrollExtent - 400) {
+      _loadMoreDownloads();
+    }
+  }
+
+  // Database type for the selected category, null for all
+  String? get _selectedType {
+    if (_selectedCategory == 'Videos') {
+      return 'video';
+    } else if (_selectedCategory == 'Audio') {
+      return 'audio';
+    }
+    return null;
+  }
+
+  // Load the first page of history for the selected category
   Future<void> _loadUserDownloads() async {
     setState(() {
       _isLoading = true;
@@ -36,15 +65,23 @@ class _DownloadsScreenState extends State<DownloadsScreen> {
       if (user == null) {
         setState(() {
           _userDownloads = [];
+          _hasMore = false;
           _isLoading = false;
         });
         return;
       }
 
       // Get downloads from database for current user
-      final downloads = await _dbService.getUserDownloads(user.id!);
+      final type = _selectedType;
+      final downloads = await _dbService.getDownloadsPage(
+        user.id!,
+        type: type,
+      );
+      // Ignore a page that arrives after the category changed again
+      if (!mounted || type != _selectedType) return;
       setState(() {
         _userDownloads = downloads;
+        _hasMore = downloads.length == DatabaseService.pageSize;
         _isLoading = false;
       });
     } catch (e) {
@@ -55,14 +92,32 @@ class _DownloadsScreenState extends State<DownloadsScreen> {
     }
   }
 
-  List<Download> _getFilteredDownloads() {
-    if (_selectedCategory == 'All') {
-      return _userDownloads;
-    } else if (_selectedCategory == 'Videos') {
-      return _userDownloads.where((dl) => dl.type == 'video').toList();
-    } else {
-      return _userDownloads.where((dl) => dl.type == 'audio').toList();
+  // Append the page after the last loaded download
+  Future<void> _loadMoreDownloads() async {
+    if (_isLoading || _isLoadingMore || !_hasMore || _userDownloads.isEmpty) {
+      return;
     }
+    final user = context.read<AuthProvider>().currentUser;
+    if (user == null) return;
+
+    setState(() {
+      _isLoadingMore = true;
+    });
+    final type = _selectedType;
+    final downloads = await _dbService.getDownloadsPage(
+      user.id!,
+      after: _userDownloads.last,
+      type: type,
+    );
+    if (!mounted) return;
+    setState(() {
+      // Ignore a page that arrives after the category changed
+      if (type == _selectedType) {
+        _userDownloads.addAll(downloads);
+        _hasMore = downloads.length == DatabaseService.pageSize;
+      }
+      _isLoadingMore = false;
+    });
   }
 
   Future<void> _deleteDownloadRecord(Download download) async {
@@ -98,7 +153,9 @@ class _DownloadsScreenState extends State<DownloadsScreen> {
         // Delete from database
         await _dbService.deleteDownload(download.id!);
 
-        _loadUserDownloads();
+        setState(() {
+          _userDownloads.removeWhere((dl) => dl.id == download.id);
+        });
         if (mounted) {
           ScaffoldMessenger.of(context).showSnackBar(
             const SnackBar(
@@ -208,7 +265,7 @@ class _DownloadsScreenState extends State<DownloadsScreen> {
               Expanded(
                 child: _isLoading
                     ? const Center(child: CircularProgressIndicator())
-                    : _getFilteredDownloads().isEmpty
+                    : _userDownloads.isEmpty
                         ? Center(
                             child: Column(
                               mainAxisAlignment: MainAxisAlignment.center,
@@ -240,10 +297,22 @@ class _DownloadsScreenState extends State<DownloadsScreen> {
                             ),
                           )
                         : ListView.builder(
+                            controller: _scrollController,
                             padding: const EdgeInsets.symmetric(horizontal: 16),
-                            itemCount: _getFilteredDownloads().length,
+                            itemCount: _userDownloads.length + (_hasMore ? 1 : 0),
                             itemBuilder: (context, index) {
-                              final download = _getFilteredDownloads()[index];
+                              if (index == _userDownloads.length) {
+                                // Footer shown while more history can be
+                                // loaded; also covers lists too short to scroll
+                                WidgetsBinding.instance.addPostFrameCallback(
+                                  (_) => _loadMoreDownloads(),
+                                );
+                                return const Padding(
+                                  padding: EdgeInsets.symmetric(vertical: 16),
+                                  child: Center(child: CircularProgressIndicator()),
+                                );
+                              }
+                              final download = _userDownloads[index];
                               final isVideo = download.type == 'video';
 
                               return Card(
@@ -304,9 +373,11 @@ class _DownloadsScreenState extends State<DownloadsScreen> {
   Widget _buildCategoryTab(String text, String category) {
     return GestureDetector(
       onTap: () {
+        if (_selectedCategory == category) return;
         setState(() {
           _selectedCategory = category;
         });
+        _loadUserDownloads();
       },
       child: Container(
         padding: const EdgeInsets.symmetric(horizontal: 16, vertical: 8),
@@ -1,6 +1,7 @@
 import 'package:flutter/material.dart';
 import 'package:permission_handler/permission_handler.dart';
 import 'package:provider/provider.dart';
+import '../config/api_config.dart';
 import '../services/api_service.dart';
 import '../services/auth_provider.dart';
 import '../services/database_service.dart';
@@ -103,7 +104,7 @@ class _HomeScreenState extends State<HomeScreen> {
                       ClipRRect(
                         borderRadius: BorderRadius.circular(4),
                         child: Image.network(
-                          _videoInfo!.thumbnail,
+                          _thumbnailSource(_videoInfo!, 80),
                           width: 80,
                           height: 60,
                           fit: BoxFit.cover,
@@ -291,6 +292,15 @@ class _HomeScreenState extends State<HomeScreen> {
     );
   }
 
+  // Ask the backend for a thumbnail sized for the screen instead of the full image
+  String _thumbnailSource(VideoInfo info, double width) {
+    if (info.thumbnailUrl.isEmpty) {
+      return info.thumbnail;
+    }
+    final pixels = (width * MediaQuery.of(context).devicePixelRatio).round();
+    return '${ApiConfig.baseUrl}${info.thumbnailUrl}?w=$pixels';
+  }
+
   Widget _buildFormatButton(String text, IconData icon, String format) {
     return Expanded(
       child: GestureDetector(
@@ -1,12 +1,17 @@
+import 'dart:convert';
 import 'dart:io';
 import 'package:dio/dio.dart';
 import 'package:path_provider/path_provider.dart';
 import '../config/api_config.dart';
 import '../models/video_models.dart';
+import 'ranged_downloader.dart';
 
 class ApiService {
   final Dio _dio = Dio();
 
+  // Last video info per URL with its ETag, so repeat lookups revalidate
+  final Map<String, MapEntry<String, VideoInfo>> _infoCache = {};
+
   ApiService() {
     _dio.options.baseUrl = ApiConfig.baseUrl;
     _dio.options.connectTimeout = const Duration(seconds: 60);
@@ -25,16 +30,32 @@ class ApiService {
     }
   }
 
-  /// Get video information
+  /// Get video information.
+  ///
+  /// Info fetched before is revalidated with its ETag; the server answers
+  /// 304 without a body when it hasn't changed.
   Future<VideoInfo?> getVideoInfo(String url) async {
     try {
-      final response = await _dio.post(
+      final cached = _infoCache[url];
+      final response = await _dio.get(
         ApiConfig.apiInfo,
-        data: {'url': url},
+        queryParameters: {'url': url},
+        options: Options(
+          headers: {if (cached != null) 'If-None-Match': cached.key},
+          validateStatus: (status) => status == 200 || status == 304,
+        ),
       );
 
+      if (response.statusCode == 304 && cached != null) {
+        return cached.value;
+      }
       if (response.statusCode == 200) {
-        return VideoInfo.fromJson(response.data);
+        final info = VideoInfo.fromJson(response.data);
+        final etag = response.headers.value('etag');
+        if (etag != null) {
+          _infoCache[url] = MapEntry(etag, info);
+        }
+        return info;
       }
       return null;
     } catch (e) {
@@ -87,50 +108,27 @@ class ApiService {
           throw Exception('No download ID received from server');
         }
         
-        // Step 2: Poll for progress until download completes
-        String? filename;
-        String? downloadUrl;
+        // Step 2: Wait for the backend download to complete
+        var result = await _waitForDownload(downloadId, onProgress: onProgress);
+        _checkFinalStatus(result);
         
-        while (true) {
-          await Future.delayed(const Duration(seconds: 2));
-          
-          final progressResponse = await _dio.get(
-            '${ApiConfig.baseUrl}/api/progress/$downloadId',
-          );
-          
-          if (progressResponse.statusCode == 200) {
-            final status = progressResponse.data['status'] as String?;
-            final progress = progressResponse.data['progress'] ?? 0.0;
-            
-            // Update progress callback
-            if (onProgress != null) {
-              onProgress(progress.toInt(), 100);
-            }
-            
-            if (status == 'completed') {
-              filename = progressResponse.data['filename'] as String?;
-              final downloadPath = progressResponse.data['download_url'] as String?;
-              if (downloadPath != null) {
-                downloadUrl = '${ApiConfig.baseUrl}$downloadPath';
-              }
-              break;
-            } else if (status == 'error') {
-              final errorMsg = progressResponse.data['error'] as String?;
-              throw Exception(errorMsg ?? 'Download failed');
-            } else if (status == 'not_found') {
-              throw Exception('Download not found on server');
-            }
+        // Step 3: Download the file from backend to device
+        try {
+          return await _fetchResult(result, onProgress);
+        } on DioException catch (e) {
+          // The server streams a limited number of unfinished downloads at
+          // once; when it is busy, wait for the finished file instead
+          if (result['status'] == 'completed' ||
+              e.response?.statusCode != 503) {
+            rethrow;
           }
-        }
-        
-        if (filename != null && downloadUrl != null) {
-          // Step 3: Download the file from backend to device
-          final savedPath = await _downloadFileToDevice(
-            downloadUrl,
-            filename,
+          result = await _waitForDownload(
+            downloadId,
             onProgress: onProgress,
+            allowStream: false,
           );
-          return savedPath;
+          _checkFinalStatus(result);
+          return await _fetchResult(result, onProgress);
         }
       }
       return null;
@@ -140,10 +138,168 @@ class ApiService {
     }
   }
 
-  /// Download file from backend server to device storage
+  static const _finalStatuses = {'completed', 'error', 'cancelled', 'not_found'};
+
+  void _checkFinalStatus(Map<String, dynamic> result) {
+    final status = result['status'] as String?;
+    if (status == 'error') {
+      final errorMsg = result['error'] as String?;
+      throw Exception(errorMsg ?? 'Download failed');
+    } else if (status == 'cancelled') {
+      throw Exception('Download was cancelled');
+    } else if (status == 'not_found') {
+      throw Exception('Download not found on server');
+    }
+  }
+
+  /// Save the file a download result points at: the finished file, or a
+  /// progressive download that can be fetched while the backend is still
+  /// downloading it
+  Future<String?> _fetchResult(
+    Map<String, dynamic> result,
+    Function(int received, int total)? onProgress,
+  ) async {
+    final completed = result['status'] == 'completed';
+    final filename = result['filename'] as String?;
+    final downloadPath = completed
+        ? result['download_url'] as String?
+        : result['stream_url'] as String?;
+    if (filename == null || downloadPath == null) {
+      return null;
+    }
+    return _downloadFileToDevice(
+      '${ApiConfig.baseUrl}$downloadPath',
+      filename,
+      // Finished files can be fetched in parallel ranges and verified
+      ranged: completed,
+      sha256: result['sha256'] as String?,
+      onProgress: onProgress,
+    );
+  }
+
+  /// Wait for a backend download to reach a final status, or until it can
+  /// be streamed when [ApiConfig.streamWhileDownloading] and [allowStream]
+  /// are set.
+  ///
+  /// Uses the server-sent progress stream when enabled and falls back to
+  /// polling if the stream cannot be opened (e.g. the server is at its
+  /// stream limit) or drops early.
+  Future<Map<String, dynamic>> _waitForDownload(
+    String downloadId, {
+    Function(int received, int total)? onProgress,
+    bool allowStream = true,
+  }) async {
+    if (ApiConfig.useProgressStream) {
+      try {
+        return await _streamProgress(downloadId,
+            onProgress: onProgress, allowStream: allowStream);
+      } catch (e) {
+        print('Progress stream failed, falling back to polling: $e');
+      }
+    }
+    return _pollProgress(downloadId,
+        onProgress: onProgress, allowStream: allowStream);
+  }
+
+  /// Follow /api/progress/<id>/stream until a final status arrives
+  Future<Map<String, dynamic>> _streamProgress(
+    String downloadId, {
+    Function(int received, int total)? onProgress,
+    bool allowStream = true,
+  }) async {
+    final response = await _dio.get<ResponseBody>(
+      '${ApiConfig.apiProgress}/$downloadId/stream',
+      options: Options(
+        responseType: ResponseType.stream,
+        headers: {'Accept': 'text/event-stream'},
+        receiveTimeout: const Duration(minutes: 2),
+      ),
+    );
+
+    final lines = response.data!.stream
+        .cast<List<int>>()
+        .transform(utf8.decoder)
+        .transform(const LineSplitter());
+
+    final data = StringBuffer();
+    await for (final line in lines) {
+      if (line.startsWith('data:')) {
+        data.write(line.substring(5).trim());
+      } else if (line.isEmpty && data.isNotEmpty) {
+        final event = jsonDecode(data.toString()) as Map<String, dynamic>;
+        data.clear();
+        _reportProgress(event, onProgress);
+        if (_isReady(event, allowStream)) {
+          return event;
+        }
+      }
+    }
+    throw Exception('Progress stream closed before the download finished');
+  }
+
+  /// Poll /api/progress/<id> every 2 seconds until a final status arrives
+  Future<Map<String, dynamic>> _pollProgress(
+    String downloadId, {
+    Function(int received, int total)? onProgress,
+    bool allowStream = true,
+  }) async {
+    while (true) {
+      await Future.delayed(const Duration(seconds: 2));
+
+      final progressResponse = await _dio.get(
+        '${ApiConfig.apiProgress}/$downloadId',
+        options: Options(validateStatus: (status) => status! < 500),
+      );
+
+      final data = Map<String, dynamic>.from(progressResponse.data as Map);
+      _reportProgress(data, onProgress);
+      if (_isReady(data, allowStream)) {
+        return data;
+      }
+    }
+  }
+
+  bool _isReady(Map<String, dynamic> progress, bool allowStream) {
+    if (_finalStatuses.contains(progress['status'])) {
+      return true;
+    }
+    return allowStream &&
+        ApiConfig.streamWhileDownloading &&
+        progress['stream_url'] != null;
+  }
+
+  void _reportProgress(
+    Map<String, dynamic> data,
+    Function(int received, int total)? onProgress,
+  ) {
+    final progress = data['progress'] ?? 0.0;
+    if (onProgress != null) {
+      onProgress((progress as num).toInt(), 100);
+    }
+  }
+
+  /// Cancel a queued or running download on the backend
+  Future<bool> cancelDownload(String downloadId) async {
+    try {
+      final response = await _dio.delete('${ApiConfig.apiDownload}/$downloadId');
+      return response.statusCode == 200;
+    } catch (e) {
+      print('Error cancelling download: $e');
+      return false;
+    }
+  }
+
+  /// Download file from backend server to device storage.
+  ///
+  /// A [ranged] download is split over [ApiConfig.downloadConnections]
+  /// connections, resumes after interruptions and is checked against the
+  /// server's checksum (or [sha256]). Files the server can't serve in
+  /// ranges, such as downloads still in progress, use a single connection.
   Future<String?> _downloadFileToDevice(
     String url,
     String filename, {
+    bool ranged = false,
+    String? sha256,
     Function(int received, int total)? onProgress,
   }) async {
     try {
@@ -174,6 +330,24 @@ class ApiService {
         connectTimeout: const Duration(minutes: 2),
       ));
 
+      if (ranged && ApiConfig.downloadConnections > 1) {
+        try {
+          final savedPath = await RangedDownloader(
+            downloadDio,
+            connections: ApiConfig.downloadConnections,
+          ).download(
+            url,
+            savePath,
+            expectedSha256: sha256,
+            onProgress: onProgress,
+          );
+          print('File saved to: $savedPath');
+          return savedPath;
+        } on RangesNotSupported catch (e) {
+          print('$e; downloading over one connection');
+        }
+      }
+
       // Retry logic for unreliable connections
       int maxRetries = 3;
       int retryCount = 0;
@@ -204,7 +378,9 @@ class ApiService {
           retryCount++;
           print('Download attempt $retryCount failed: $e');
           
-          if (retryCount >= maxRetries) {
+          // A busy server is handled by the caller, not by retrying
+          if (retryCount >= maxRetries ||
+              (e is DioException && e.response?.statusCode == 503)) {
             rethrow;
           }
           
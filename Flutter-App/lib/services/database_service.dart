@@ -4,6 +4,9 @@ import '../models/user_model.dart';
 import '../models/download_model.dart';
 
 class DatabaseService {
+  // Rows per page of download history
+  static const int pageSize = 50;
+
   static final DatabaseService _instance = DatabaseService._internal();
   static Database? _database;
 
@@ -25,7 +28,7 @@ class DatabaseService {
 
     return await openDatabase(
       path,
-      version: 2,
+      version: 3,
       onCreate: _onCreate,
       onUpgrade: _onUpgrade,
     );
@@ -47,6 +50,22 @@ class DatabaseService {
         )
       ''');
     }
+    if (oldVersion < 3) {
+      await _createDownloadIndexes(db);
+    }
+  }
+
+  // History is always read per user, newest first, optionally by type;
+  // these indexes answer those queries and their pages without sorting
+  Future<void> _createDownloadIndexes(Database db) async {
+    await db.execute('''
+      CREATE INDEX IF NOT EXISTS idx_downloads_user_date
+      ON downloads (userId, downloadedAt DESC, id DESC)
+    ''');
+    await db.execute('''
+      CREATE INDEX IF NOT EXISTS idx_downloads_user_type_date
+      ON downloads (userId, type, downloadedAt DESC, id DESC)
+    ''');
   }
 
   Future<void> _onCreate(Database db, int version) async {
@@ -71,6 +90,7 @@ class DatabaseService {
         FOREIGN KEY (userId) REFERENCES users(id) ON DELETE CASCADE
       )
     ''');
+    await _createDownloadIndexes(db);
   }
 
   // Register a new user
@@ -198,6 +218,69 @@ class DatabaseService {
     }
   }
 
+  // Add or update many download records in one transaction
+  // (records with an id replace the stored row, others are inserted)
+  Future<bool> saveDownloads(List<Download> downloads) async {
+    try {
+      final db = await database;
+      await db.transaction((txn) async {
+        final batch = txn.batch();
+        for (final download in downloads) {
+          batch.insert(
+            'downloads',
+            download.toMap(),
+            conflictAlgorithm: ConflictAlgorithm.replace,
+          );
+        }
+        await batch.commit(noResult: true);
+      });
+      return true;
+    } catch (e) {
+      print('Error saving downloads: $e');
+      return false;
+    }
+  }
+
+  // Get one page of a user's downloads, newest first.
+  // Pass the last download of the previous page as [after] to get the next
+  // one; [type] ('video' or 'audio') limits the page to that type. Pages
+  // seek from the previous row instead of using OFFSET, so deep pages are
+  // as fast as the first one.
+  Future<List<Download>> getDownloadsPage(
+    int userId, {
+    Download? after,
+    String? type,
+    int limit = pageSize,
+  }) async {
+    try {
+      final db = await database;
+      final where = ['userId = ?'];
+      final whereArgs = <Object>[userId];
+      if (type != null) {
+        where.add('type = ?');
+        whereArgs.add(type);
+      }
+      if (after != null) {
+        final downloadedAt = after.downloadedAt.toIso8601String();
+        // The first term bounds the index range; the second breaks ties by id
+        where.add('downloadedAt <= ? AND (downloadedAt < ? OR id < ?)');
+        whereArgs.addAll([downloadedAt, downloadedAt, after.id!]);
+      }
+      final List<Map<String, dynamic>> maps = await db.query(
+        'downloads',
+        where: where.join(' AND '),
+        whereArgs: whereArgs,
+        orderBy: 'downloadedAt DESC, id DESC',
+        limit: limit,
+      );
+
+      return maps.map(Download.fromMap).toList();
+    } catch (e) {
+      print('Error getting downloads page: $e');
+      return [];
+    }
+  }
+
   // Get all downloads for a specific user
   Future<List<Download>> getUserDownloads(int userId) async {
     try {
@@ -206,7 +289,7 @@ class DatabaseService {
         'downloads',
         where: 'userId = ?',
         whereArgs: [userId],
-        orderBy: 'downloadedAt DESC',
+        orderBy: 'downloadedAt DESC, id DESC',
       );
 
       return List.generate(
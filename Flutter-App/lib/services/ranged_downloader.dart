@@ -0,0 +1,347 @@
+import 'dart:async';
+import 'dart:convert';
+import 'dart:io';
+import 'dart:math';
+import 'package:crypto/crypto.dart';
+import 'package:dio/dio.dart';
+
+/// Thrown when the server can't serve byte ranges of a file, so it has to be
+/// fetched over a single connection instead.
+class RangesNotSupported implements Exception {
+  final String reason;
+
+  RangesNotSupported(this.reason);
+
+  @override
+  String toString() => 'Ranges not supported: $reason';
+}
+
+/// Thrown when a downloaded file doesn't match the server's checksum
+class ChecksumMismatch implements Exception {
+  final String expected;
+  final String actual;
+
+  ChecksumMismatch(this.expected, this.actual);
+
+  @override
+  String toString() => 'Checksum mismatch: expected $expected, got $actual';
+}
+
+/// A byte range of the file and how much of it has been written
+class _Chunk {
+  final int start;
+  final int end; // exclusive
+  int done;
+
+  _Chunk(this.start, this.end, [this.done = 0]);
+
+  int get remaining => end - start - done;
+
+  List<int> toJson() => [start, end, done];
+
+  static _Chunk fromJson(List<dynamic> json) =>
+      _Chunk(json[0] as int, json[1] as int, json[2] as int);
+}
+
+/// Downloads a file over several connections, one byte range per request.
+///
+/// The file's size, ETag and checksum are probed with a HEAD request, the
+/// file is preallocated under a `.part` name and every chunk is written at
+/// its own offset. How far each chunk got is kept in a `.chunks` file next
+/// to it, so an interrupted download resumes where each chunk stopped as
+/// long as the server still has the same version of the file (checked with
+/// If-Range). The result is verified against the server's SHA-256 before it
+/// is moved into place.
+class RangedDownloader {
+  final Dio _dio;
+
+  /// Requests that run at the same time
+  final int connections;
+
+  /// Chunks are never split smaller than this
+  final int minChunkSize;
+
+  /// Attempts per chunk before the download fails
+  final int maxRetries;
+
+  RangedDownloader(
+    this._dio, {
+    this.connections = 4,
+    this.minChunkSize = 1024 * 1024,
+    this.maxRetries = 3,
+  });
+
+  /// Download [url] to [savePath].
+  ///
+  /// [expectedSha256] (hex) is used when the server sends no Repr-Digest.
+  /// Throws [RangesNotSupported] before writing anything if the server
+  /// can't serve ranges of the file.
+  Future<String> download(
+    String url,
+    String savePath, {
+    String? expectedSha256,
+    Function(int received, int total)? onProgress,
+    CancelToken? cancelToken,
+  }) async {
+    try {
+      return await _download(
+          url, savePath, expectedSha256, onProgress, cancelToken);
+    } on _VersionChanged {
+      // The file was rebuilt on the server mid-download; start over once
+      return _download(url, savePath, expectedSha256, onProgress, cancelToken);
+    }
+  }
+
+  Future<String> _download(
+    String url,
+    String savePath,
+    String? expectedSha256,
+    Function(int received, int total)? onProgress,
+    CancelToken? cancelToken,
+  ) async {
+    final probe = await _dio.head(
+      url,
+      cancelToken: cancelToken,
+      options: Options(
+        followRedirects: true,
+        // Compressed responses would break byte offsets
+        headers: {'Accept-Encoding': 'identity'},
+      ),
+    );
+    final size = int.tryParse(probe.headers.value('content-length') ?? '');
+    final etag = probe.headers.value('etag');
+    if (probe.headers.value('accept-ranges') != 'bytes') {
+      throw RangesNotSupported('no Accept-Ranges');
+    }
+    if (size == null || size <= 0) {
+      throw RangesNotSupported('unknown size');
+    }
+    if (etag == null || etag.startsWith('W/')) {
+      throw RangesNotSupported('no strong ETag');
+    }
+    final checksum =
+        parseSha256Digest(probe.headers.value('repr-digest')) ?? expectedSha256;
+
+    final partPath = '$savePath.part';
+    final statePath = '$savePath.chunks';
+    var chunks = await _loadChunks(statePath, etag, size, partPath);
+    if (chunks == null) {
+      chunks = _planChunks(size);
+      final file = await File(partPath).open(mode: FileMode.write);
+      try {
+        await file.truncate(size);
+      } finally {
+        await file.close();
+      }
+      await _saveChunks(statePath, etag, size, chunks);
+    }
+
+    void report() {
+      if (onProgress != null) {
+        onProgress(chunks!.fold<int>(0, (sum, c) => sum + c.done), size);
+      }
+    }
+
+    report();
+    // Persist progress regularly so a killed app loses at most a second;
+    // saves are chained so two never write the map at once
+    var saving = Future<void>.value();
+    void persist() {
+      saving = saving
+          .then((_) => _saveChunks(statePath, etag, size, chunks!))
+          .catchError((e) => print('Could not save download state: $e'));
+    }
+
+    final saver = Timer.periodic(const Duration(seconds: 1), (_) => persist());
+    try {
+      final pending = chunks.where((c) => c.remaining > 0).toList();
+      final workers = List.generate(
+        min(connections, pending.length),
+        (_) async {
+          while (pending.isNotEmpty) {
+            final chunk = pending.removeAt(0);
+            try {
+              await _fetchChunk(
+                  url, etag, partPath, chunk, report, cancelToken);
+            } catch (_) {
+              pending.clear(); // Other connections stop after their chunk
+              rethrow;
+            }
+          }
+        },
+      );
+      await Future.wait(workers);
+    } on _VersionChanged {
+      saver.cancel();
+      await saving;
+      // The written chunks belong to the old version of the file
+      await _discard(partPath, statePath);
+      rethrow;
+    } catch (_) {
+      saver.cancel();
+      persist();
+      await saving;
+      rethrow;
+    }
+    saver.cancel();
+    await saving;
+
+    if (checksum != null) {
+      final actual =
+          (await sha256.bind(File(partPath).openRead()).first).toString();
+      if (actual != checksum) {
+        await _discard(partPath, statePath);
+        throw ChecksumMismatch(checksum, actual);
+      }
+    }
+    await File(partPath).rename(savePath);
+    await File(statePath).delete();
+    return savePath;
+  }
+
+  /// Split [size] bytes into chunks, a few per connection so that fast
+  /// connections pick up the work slow ones haven't started
+  List<_Chunk> _planChunks(int size) {
+    final count = max(1, min(connections * 4, size ~/ minChunkSize));
+    final chunkSize = (size / count).ceil();
+    return [
+      for (var start = 0; start < size; start += chunkSize)
+        _Chunk(start, min(start + chunkSize, size)),
+    ];
+  }
+
+  Future<void> _fetchChunk(
+    String url,
+    String etag,
+    String partPath,
+    _Chunk chunk,
+    void Function() report,
+    CancelToken? cancelToken,
+  ) async {
+    var attempt = 0;
+    while (chunk.remaining > 0) {
+      // Append mode opens without truncating; writes go where setPosition says
+      final file = await File(partPath).open(mode: FileMode.append);
+      try {
+        final response = await _dio.get<ResponseBody>(
+          url,
+          cancelToken: cancelToken,
+          options: Options(
+            responseType: ResponseType.stream,
+            headers: {
+              'Range': 'bytes=${chunk.start + chunk.done}-${chunk.end - 1}',
+              'If-Range': etag,
+              'Accept-Encoding': 'identity',
+            },
+          ),
+        );
+        if (response.statusCode != 206) {
+          throw _VersionChanged();
+        }
+        await file.setPosition(chunk.start + chunk.done);
+        await for (final data in response.data!.stream) {
+          final take = min(data.length, chunk.remaining);
+          await file.writeFrom(data, 0, take);
+          chunk.done += take;
+          report();
+        }
+        if (chunk.remaining > 0) {
+          throw Exception('Connection closed early');
+        }
+      } on _VersionChanged {
+        rethrow;
+      } catch (e) {
+        if (e is DioException && CancelToken.isCancel(e)) {
+          rethrow;
+        }
+        attempt++;
+        print('Chunk ${chunk.start}-${chunk.end} attempt $attempt failed: $e');
+        if (attempt >= maxRetries) {
+          rethrow;
+        }
+        await Future.delayed(Duration(seconds: 2 * attempt));
+      } finally {
+        await file.close();
+      }
+    }
+  }
+
+  Future<List<_Chunk>?> _loadChunks(
+    String statePath,
+    String etag,
+    int size,
+    String partPath,
+  ) async {
+    try {
+      final state = jsonDecode(await File(statePath).readAsString())
+          as Map<String, dynamic>;
+      if (state['etag'] != etag ||
+          state['size'] != size ||
+          await File(partPath).length() != size) {
+        return null;
+      }
+      return (state['chunks'] as List)
+          .map((c) => _Chunk.fromJson(c as List))
+          .toList();
+    } catch (_) {
+      return null; // No usable state: start over
+    }
+  }
+
+  Future<void> _saveChunks(
+    String statePath,
+    String etag,
+    int size,
+    List<_Chunk> chunks,
+  ) async {
+    // Write-then-rename so a crash never leaves a truncated chunk map
+    final tmp = File('$statePath.tmp');
+    await tmp.writeAsString(jsonEncode({
+      'etag': etag,
+      'size': size,
+      'chunks': chunks.map((c) => c.toJson()).toList(),
+    }));
+    await tmp.rename(statePath);
+  }
+
+  Future<void> _discard(String partPath, String statePath) async {
+    for (final path in [partPath, statePath]) {
+      final file = File(path);
+      if (await file.exists()) {
+        await file.delete();
+      }
+    }
+  }
+}
+
+class _VersionChanged implements Exception {
+  @override
+  String toString() => 'The file changed on the server during the download';
+}
+
+/// Hex SHA-256 from an RFC 9530 `Repr-Digest` header such as
+/// `sha-256=:base64:`, or null if there is none
+String? parseSha256Digest(String? header) {
+  if (header == null) {
+    return null;
+  }
+  for (final member in header.split(',')) {
+    final parts = member.trim().split('=');
+    if (parts.first.toLowerCase() != 'sha-256' || parts.length < 2) {
+      continue;
+    }
+    final value = parts.sublist(1).join('=').trim();
+    if (value.length < 2 || !value.startsWith(':') || !value.endsWith(':')) {
+      continue;
+    }
+    try {
+      return base64
+          .decode(value.substring(1, value.length - 1))
+          .map((b) => b.toRadixString(16).padLeft(2, '0'))
+          .join();
+    } on FormatException {
+      continue;
+    }
+  }
+  return null;
+}
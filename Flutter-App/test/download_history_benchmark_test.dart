@@ -0,0 +1,158 @@
+// Query times of the downloads history on a seeded database of 100k rows.
+//
+// Skipped by default (see dart_test.yaml); run with:
+//   flutter test --run-skipped -t benchmark test/download_history_benchmark_test.dart
+@Tags(['benchmark'])
+library;
+
+import 'package:flutter_test/flutter_test.dart';
+import 'package:path/path.dart';
+import 'package:sqflite_common_ffi/sqflite_ffi.dart';
+import 'package:video_downloader/models/download_model.dart';
+import 'package:video_downloader/models/user_model.dart';
+import 'package:video_downloader/services/database_service.dart';
+
+const totalRows = 100000;
+const users = 10;
+const heavyUserRows = 50000; // user 1; the rest is split between the others
+const runs = 20;
+
+// Median milliseconds of [runs] calls to [body]
+Future<double> medianMs(Future<void> Function() body) async {
+  final timings = <int>[];
+  for (var i = 0; i < runs; i++) {
+    final watch = Stopwatch()..start();
+    await body();
+    timings.add(watch.elapsedMicroseconds);
+  }
+  timings.sort();
+  return timings[timings.length ~/ 2] / 1000;
+}
+
+void main() {
+  late DatabaseService service;
+  late Database db;
+  final results = <String, double>{};
+
+  setUpAll(() async {
+    sqfliteFfiInit();
+    databaseFactory = databaseFactoryFfi;
+    await deleteDatabase(join(await getDatabasesPath(), 'user_auth.db'));
+    service = DatabaseService();
+    db = await service.database;
+
+    for (var u = 1; u <= users; u++) {
+      await service.registerUser(
+          User(name: 'User $u', email: 'user$u@example.com', password: 'x'));
+    }
+
+    // Several rows share a timestamp, as quick successive downloads do
+    final start = DateTime(2025, 1, 1);
+    final rows = <Download>[];
+    for (var i = 0; i < totalRows; i++) {
+      final userId = i < heavyUserRows ? 1 : 2 + i % (users - 1);
+      rows.add(Download(
+        userId: userId,
+        filename: 'video_$i.mp4',
+        filepath: '/storage/emulated/0/Downloads/video_$i.mp4',
+        type: i % 3 == 0 ? 'audio' : 'video',
+        downloadedAt: start.add(Duration(minutes: i ~/ 3)),
+      ));
+    }
+    final watch = Stopwatch()..start();
+    for (var i = 0; i < rows.length; i += 5000) {
+      await service.saveDownloads(rows.sublist(i, i + 5000));
+    }
+    results['seed 100k rows, batches of 5000 (ms)'] =
+        watch.elapsedMilliseconds.toDouble();
+  });
+
+  tearDownAll(() async {
+    print('\nDownloads history on $totalRows rows '
+        '(heavy user: $heavyUserRows rows, median of $runs runs):');
+    results.forEach((name, ms) => print('  ${name.padRight(48)} $ms'));
+    await service.closeDb();
+    await deleteDatabase(join(await getDatabasesPath(), 'user_auth.db'));
+  });
+
+  test('single inserts versus one batched transaction', () async {
+    final rows = List.generate(
+      1000,
+      (i) => Download(
+        userId: users,
+        filename: 'extra_$i.mp4',
+        filepath: '/tmp/extra_$i.mp4',
+        type: 'video',
+        downloadedAt: DateTime(2024, 1, 1),
+      ),
+    );
+    var watch = Stopwatch()..start();
+    for (final row in rows) {
+      await service.addDownload(row);
+    }
+    results['1000 single inserts (ms)'] = watch.elapsedMilliseconds.toDouble();
+    watch = Stopwatch()..start();
+    await service.saveDownloads(rows);
+    results['1000 inserts in one batch (ms)'] =
+        watch.elapsedMilliseconds.toDouble();
+  });
+
+  test('pages are read from the index without sorting', () async {
+    final plan = await db.rawQuery(
+      'EXPLAIN QUERY PLAN SELECT * FROM downloads WHERE userId = ? '
+      'AND downloadedAt <= ? AND (downloadedAt < ? OR id < ?) '
+      'ORDER BY downloadedAt DESC, id DESC LIMIT 50',
+      [1, '2025', '2025', 1],
+    );
+    final details = plan.map((row) => row['detail']).join('\n');
+    expect(details, contains('idx_downloads_user_date'));
+    expect(details, isNot(contains('TEMP B-TREE')));
+  });
+
+  test('keyset pages walk the whole history once, in order', () async {
+    final all = await service.getUserDownloads(2);
+    final walked = <Download>[];
+    Download? after;
+    while (true) {
+      final page = await service.getDownloadsPage(2, after: after);
+      walked.addAll(page);
+      if (page.length < DatabaseService.pageSize) break;
+      after = page.last;
+    }
+    expect(walked.map((d) => d.id), all.map((d) => d.id));
+  });
+
+  test('query times', () async {
+    final deep = Download.fromMap((await db.rawQuery(
+      'SELECT * FROM downloads WHERE userId = 1 '
+      'ORDER BY downloadedAt DESC, id DESC LIMIT 1 OFFSET 40000',
+    ))
+        .first);
+
+    Future<void> measure(String suffix) async {
+      results['full history, heavy user$suffix'] =
+          await medianMs(() => service.getUserDownloads(1));
+      results['first page$suffix'] =
+          await medianMs(() => service.getDownloadsPage(1));
+      results['first audio page$suffix'] =
+          await medianMs(() => service.getDownloadsPage(1, type: 'audio'));
+      results['page after row 40000, keyset$suffix'] =
+          await medianMs(() => service.getDownloadsPage(1, after: deep));
+      results['page after row 40000, OFFSET$suffix'] = await medianMs(() =>
+          db.query('downloads',
+              where: 'userId = ?',
+              whereArgs: [1],
+              orderBy: 'downloadedAt DESC, id DESC',
+              limit: DatabaseService.pageSize,
+              offset: 40000));
+    }
+
+    await measure(' (ms)');
+    await db.execute('DROP INDEX idx_downloads_user_date');
+    await db.execute('DROP INDEX idx_downloads_user_type_date');
+    await measure(', no index (ms)');
+
+    expect(results['first page (ms)']!,
+        lessThan(results['full history, heavy user (ms)']!));
+  });
+}
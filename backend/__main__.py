@@ -0,0 +1,138 @@
+"""
+Command line entry point for the backend.
+
+    python -m backend serve --workers 2 --threads 16   (from the repository root)
+    python . serve                                      (from backend/)
+
+`serve` runs the API on a production WSGI server instead of Flask's debug
+server: gunicorn with threaded (gthread) workers where available, otherwise
+waitress, which also runs on Windows. With gunicorn the heavy libraries are
+preloaded in the master before the workers fork (--no-preload to skip).
+"""
+
+import argparse
+import gc
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_threads():
+    # Requests mostly wait on the network or the extraction pool, so run
+    # well above the core count while leaving room beyond EXTRACTION_WORKERS
+    return max(8, 4 * (os.cpu_count() or 1))
+
+
+def pick_server(requested):
+    if requested != 'auto':
+        return requested
+    if os.name != 'nt':
+        try:
+            import gunicorn  # noqa: F401
+            return 'gunicorn'
+        except ImportError:
+            pass
+    try:
+        import waitress  # noqa: F401
+        return 'waitress'
+    except ImportError:
+        sys.exit('No production server installed: pip install gunicorn (Linux/macOS) or waitress')
+
+
+def preload():
+    """Import Flask and yt-dlp, and build yt-dlp's extractor tables, in this process.
+
+    Forked workers then find them already imported and share the pages
+    copy-on-write; gc.freeze() keeps the collector from writing to (and so
+    copying) them. The app module itself is imported per worker, since it
+    opens the job journal and other per-process state.
+    """
+    import flask  # noqa: F401
+    import yt_dlp
+    yt_dlp.YoutubeDL({'quiet': True}).close()
+    gc.freeze()
+
+
+def start_worker_services(worker):
+    import app
+    app.start_background_services()
+
+
+def serve_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class BackendServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{args.host}:{args.port}')
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', args.threads)
+            # Progress streams and file transfers are long-lived; gthread
+            # workers heartbeat from their main thread, so they stay alive
+            self.cfg.set('timeout', 120)
+            self.cfg.set('graceful_timeout', int(os.environ.get('DOWNLOAD_DRAIN_TIMEOUT', 30)) + 5)
+            self.cfg.set('keepalive', 5)
+            self.cfg.set('post_worker_init', start_worker_services)
+
+        def load(self):
+            import app
+            return app.app
+
+    BackendServer().run()
+
+
+def serve_waitress(args):
+    import waitress
+    import app
+
+    if args.workers > 1:
+        print('waitress runs a single process; ignoring --workers')
+    app.start_background_services()
+    waitress.serve(app.app, host=args.host, port=args.port, threads=args.threads,
+                   channel_timeout=120)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='backend', description='Video Downloader backend')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='run the API on a production WSGI server')
+    serve.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    serve.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    serve.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 1)),
+                       help='server processes (each runs its own download workers)')
+    serve.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', default_threads())),
+                       help='request threads per process')
+    serve.add_argument('--server', choices=['auto', 'gunicorn', 'waitress'], default='auto')
+    serve.add_argument('--preload', action=argparse.BooleanOptionalAction,
+                       default=os.environ.get('WEB_PRELOAD', '1') != '0',
+                       help='import libraries before forking workers (gunicorn)')
+    args = parser.parse_args(argv)
+
+    if args.workers > 1 and os.environ.get('PROGRESS_STORE', 'memory') == 'memory':
+        # Other processes could not see a download's progress, cancel it or serve it
+        print('The in-memory progress store is private to each process; running 1 worker '
+              '(set PROGRESS_STORE to share it between workers)')
+        args.workers = 1
+    # The app sizes its stream limit from the request threads per process
+    os.environ['WEB_THREADS'] = str(args.threads)
+    # Run from the backend directory so downloads/ and jobs.db resolve the
+    # same way as with `python app.py`
+    os.chdir(BACKEND_DIR)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    server = pick_server(args.server)
+    print(f'Serving on http://{args.host}:{args.port} with {server} '
+          f'({args.workers} worker(s) x {args.threads} threads)')
+    if server == 'gunicorn':
+        if args.preload:
+            preload()
+        serve_gunicorn(args)
+    else:
+        serve_waitress(args)
+
+
+if __name__ == '__main__':
+    main()
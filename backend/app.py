@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import yt_dlp
 import os
@@ -6,329 +6,1429 @@ import json
 from pathlib import Path
 import threading
 import time
+import atexit
+import signal
+import sys
+import uuid
+import mimetypes
+import shutil
+import base64
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as ExtractionTimeout
+from urllib.parse import quote
+from audio_pipeline import (
+    AUDIO_CODECS, AudioCancelled, TranscodePool, convert as convert_audio, format_selector as audio_format_selector,
+    parse_bitrate, parse_codecs, parse_cpus, plan as plan_audio, probe_audio,
+)
+from bandwidth import BandwidthManager
+from batch_info import iter_batch
+from batch_jobs import BatchJob, iter_zip, unique_names
+from clipper import ClipCancelled, cut_clip
+from content_store import INDEX_FILENAME, ContentStore, artifact_key, video_key
+from file_serving import serve_file
+from format_index import FILTERS as FORMAT_FILTERS, FormatIndexCache
+from ffmpeg_caps import FFmpegCapabilities
+from live_files import LiveFile, follow
+from metadata_cache import MetadataCache
+from metadata_responses import metadata_response, parse_fields
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from progress_model import ProgressRecord
+from progress_store import open_progress_store
+from progress_stream import TERMINAL_STATUSES, ProgressBroker, StreamSlots
+from storage_manager import StorageManager
+from thumbnails import FORMATS as THUMBNAIL_FORMATS, ThumbnailCache, ThumbnailError
+from download_queue import DEFAULT_PRIORITY, DownloadJob, DownloadScheduler, JobCancelled, JobExists, JobJournal
+from ydl_pool import YoutubeDLPool
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Flutter app to communicate
 
+# Exported at /metrics; gauges for state tracked elsewhere are registered with it
+metrics = Registry()
+REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'Time to build a response (streamed bodies excluded)',
+    ['route', 'method', 'status'])
+EXTRACTION_SECONDS = metrics.histogram(
+    'extraction_duration_seconds', 'yt-dlp metadata extraction time', ['extractor'])
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    'download_queue_wait_seconds', 'Time downloads spend queued before a worker picks them up')
+JOB_PHASE_SECONDS = metrics.histogram(
+    'download_phase_duration_seconds', 'Time spent in each phase of a download job', ['phase'])
+POSTPROCESSOR_SECONDS = metrics.histogram(
+    'postprocessor_duration_seconds', 'Time spent in each yt-dlp post-processor', ['postprocessor'])
+BYTES_DOWNLOADED = metrics.counter('downloaded_bytes_total', 'Bytes downloaded from origin sites')
+BYTES_SERVED = metrics.counter('served_bytes_total', 'File bytes sent to clients', ['endpoint'])
+FFMPEG_ACTIVE = metrics.gauge('ffmpeg_processes_active', 'ffmpeg post-processors currently running')
+FFMPEG_ACTIVE.set(0)
+DOWNLOAD_RESULTS = metrics.counter('downloads_total', 'Finished download jobs by outcome', ['outcome'])
+AUDIO_ACTIONS = metrics.counter(
+    'audio_pipeline_total', 'Audio downloads by what had to be done to the file', ['action'])
+FILE_ENDPOINTS = ('get_file', 'download_batch_archive')
+
 # Directory to store downloaded videos
 DOWNLOAD_DIR = os.path.join(os.getcwd(), 'downloads')
 Path(DOWNLOAD_DIR).mkdir(exist_ok=True)
 
-# Store download progress
-download_progress = {}
-download_tasks = {}
+# Store download progress; writes go through progress_broker so streams see them
+# memory (default), sqlite:///<path> or redis://<host>; shared stores let
+# several server processes answer progress polls for each other's downloads
+PROGRESS_STORE = os.environ.get('PROGRESS_STORE', 'memory')
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get('PROGRESS_FLUSH_INTERVAL', 0.5))
+download_progress = open_progress_store(PROGRESS_STORE, PROGRESS_FLUSH_INTERVAL)
+PROGRESS_MIN_INTERVAL = float(os.environ.get('PROGRESS_MIN_INTERVAL', 0.5))
+progress_broker = ProgressBroker(
+    download_progress,
+    min_interval=PROGRESS_MIN_INTERVAL,
+    poll_interval=PROGRESS_MIN_INTERVAL if download_progress.shared else None,
+)
+
+# Progress streams and live file streams each hold a request thread while
+# open; past this many per process new ones get 503 and clients poll instead.
+# Defaults to half the request threads (see `serve --threads`).
+STREAM_LIMIT = int(os.environ.get('STREAM_LIMIT', 0)) or max(int(os.environ.get('WEB_THREADS', 16)) // 2, 1)
+stream_slots = StreamSlots(STREAM_LIMIT)
+
+# Let a fronting proxy send files: 'x-accel' (nginx) or 'x-sendfile' (Apache/lighttpd)
+FILE_ACCEL_MODE = os.environ.get('FILE_ACCEL_MODE') or None
+FILE_ACCEL_PREFIX = os.environ.get('FILE_ACCEL_PREFIX', '/protected-downloads/')
+
+# Partially downloaded progressive files that can be streamed before they finish
+live_files = {}
+
+# Index of materialized downloads, keyed by video and download options
+content_store = ContentStore(DOWNLOAD_DIR)
+
+# Disk budget for DOWNLOAD_DIR and expiry of finished progress entries
+STORAGE_BUDGET_BYTES = int(os.environ.get('STORAGE_BUDGET_BYTES', 10 * 1024 ** 3))
+STORAGE_POLICY = os.environ.get('STORAGE_POLICY', 'lru')  # 'lru' or 'lfu'
+STORAGE_PIN_SECONDS = int(os.environ.get('STORAGE_PIN_SECONDS', 600))
+ARTIFACT_MAX_AGE = int(os.environ.get('ARTIFACT_MAX_AGE', 0))  # 0 keeps artifacts until evicted
+PROGRESS_TTL = int(os.environ.get('PROGRESS_TTL', 3600))
+STORAGE_SWEEP_INTERVAL = int(os.environ.get('STORAGE_SWEEP_INTERVAL', 60))
+storage = StorageManager(
+    content_store,
+    STORAGE_BUDGET_BYTES,
+    policy=STORAGE_POLICY,
+    pin_seconds=STORAGE_PIN_SECONDS,
+    max_age=ARTIFACT_MAX_AGE,
+    progress=download_progress,
+    progress_ttl=PROGRESS_TTL,
+)
+
+# Shared metadata cache so one user flow extracts each URL only once
+METADATA_CACHE_TTL = int(os.environ.get('METADATA_CACHE_TTL', 900))
+METADATA_CACHE_SIZE = int(os.environ.get('METADATA_CACHE_SIZE', 256))
+metadata_cache = MetadataCache(ttl=METADATA_CACHE_TTL, max_entries=METADATA_CACHE_SIZE)
+# Seconds clients may reuse /api/info and /api/formats responses before revalidating
+METADATA_MAX_AGE = int(os.environ.get('METADATA_MAX_AGE', 60))
+
+# Thumbnails proxied for list screens: originals and resized variants on disk
+THUMBNAIL_DIR = os.environ.get('THUMBNAIL_DIR', os.path.join(os.getcwd(), 'thumbnails'))
+THUMBNAIL_CACHE_BYTES = int(os.environ.get('THUMBNAIL_CACHE_BYTES', 256 * 1024 ** 2))
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+THUMBNAIL_MAX_AGE = int(os.environ.get('THUMBNAIL_MAX_AGE', 7 * 24 * 3600))
+THUMBNAIL_MAX_WIDTH = 4096
+thumbnails = ThumbnailCache(THUMBNAIL_DIR, THUMBNAIL_CACHE_BYTES, workers=THUMBNAIL_WORKERS)
+
+# Ranked format table per cached info dict, shared by /api/formats and downloads
+format_indexes = FormatIndexCache(max_entries=METADATA_CACHE_SIZE)
+FORMATS_PAGE_SIZE = int(os.environ.get('FORMATS_PAGE_SIZE', 50))
+FORMATS_MAX_PAGE_SIZE = 500
+
+INFO_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': False,
+}
+
+# Extractions run on a bounded pool so slow sites can't take every server
+# thread away from health checks and progress requests
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', 4))
+EXTRACTION_TIMEOUT = int(os.environ.get('EXTRACTION_TIMEOUT', 120))
+extraction_pool = ThreadPoolExecutor(EXTRACTION_WORKERS, thread_name_prefix='extract')
+
+# Batch info requests expand playlists without extracting every entry up front
+BATCH_PARALLELISM = int(os.environ.get('BATCH_PARALLELISM', 4))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 200))
+BATCH_RESOLVE_OPTS = dict(INFO_OPTS, extract_flat='in_playlist')
+
+# Idle YoutubeDL instances kept per option profile; building one registers
+# every extractor, so requests and jobs borrow a pre-warmed one instead
+YDL_POOL_SIZE = int(os.environ.get('YDL_POOL_SIZE', 4))
+ydl_pool = YoutubeDLPool(yt_dlp.YoutubeDL, max_idle=YDL_POOL_SIZE)
+FORMAT_SELECT_OPTS = {'quiet': True}
+# Download options that differ per job; the rest are shared by pooled instances
+DOWNLOAD_JOB_OPTIONS = ('outtmpl', 'format', 'progress_hooks', 'postprocessor_hooks', 'buffersize', 'noresizebuffer',
+                        'fixup')
+
+# Batch downloads: items per batch downloading at once, and HLS/DASH
+# fragments fetched in parallel within a single download
+BATCH_DOWNLOAD_PARALLELISM = int(os.environ.get('BATCH_DOWNLOAD_PARALLELISM', 3))
+FRAGMENT_CONCURRENCY = int(os.environ.get('FRAGMENT_CONCURRENCY', 4))
+batch_jobs = {}
+
+# Audio downloads: codecs clients accept by default (in order of preference),
+# and transcodes, which run niced on a bounded set of ffmpeg processes
+DEFAULT_AUDIO_CODECS = parse_codecs(os.environ.get('AUDIO_CODECS', 'mp3'))
+DEFAULT_AUDIO_BITRATE = parse_bitrate(os.environ.get('AUDIO_BITRATE', 192))
+AUDIO_TRANSCODE_WORKERS = int(os.environ.get('AUDIO_TRANSCODE_WORKERS', max((os.cpu_count() or 2) // 2, 1)))
+AUDIO_TRANSCODE_NICE = int(os.environ.get('AUDIO_TRANSCODE_NICE', 10))
+AUDIO_TRANSCODE_CPUS = parse_cpus(os.environ.get('AUDIO_TRANSCODE_CPUS', ''))
+transcode_pool = TranscodePool(AUDIO_TRANSCODE_WORKERS, nice=AUDIO_TRANSCODE_NICE, cpus=AUDIO_TRANSCODE_CPUS)
+
+# Download bandwidth in bytes/s (0 for unlimited): a cap shared by all jobs,
+# weighted towards clips and urgent requests, and a cap for any single job
+BANDWIDTH_LIMIT = int(os.environ.get('BANDWIDTH_LIMIT', 0))
+BANDWIDTH_JOB_LIMIT = int(os.environ.get('BANDWIDTH_JOB_LIMIT', 0))
+bandwidth = BandwidthManager(BANDWIDTH_LIMIT, BANDWIDTH_JOB_LIMIT)
+PACED_BUFFER_SIZE = 64 * 1024
+
+# Sites serve some formats only to browsers
+DOWNLOAD_USER_AGENT = os.environ.get(
+    'DOWNLOAD_USER_AGENT',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+)
+
+def timed_extract(url, profile, opts):
+    """Run yt-dlp's extract_info on a pooled instance, timing it per extractor"""
+    start = time.perf_counter()
+    extractor = 'failed'
+    try:
+        with ydl_pool.checkout(profile, opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+        extractor = info.get('extractor_key') or 'unknown'
+        return info
+    finally:
+        EXTRACTION_SECONDS.observe(time.perf_counter() - start, extractor=extractor)
+
+def extract_video_info(url):
+    """Extract metadata for a URL, sharing the result through the metadata cache"""
+    return metadata_cache.get_or_extract(
+        url,
+        lambda: extraction_pool.submit(timed_extract, url, 'info', INFO_OPTS).result(timeout=EXTRACTION_TIMEOUT)
+    )
+
+def create_progress_hooks(job, streamable=False, timings=None, share=None):
+    """Build yt-dlp progress and post-processor hooks that publish progress for job.id.
+
+    yt-dlp calls progress hooks for every chunk, so 'downloading' updates
+    are sampled at most every PROGRESS_MIN_INTERVAL seconds into a
+    ProgressRecord. When the job writes a single file over HTTP(S) that
+    nothing rewrites afterwards (streamable), the partial file is registered in live_files so
+    /api/file/<download_id> can stream it; its name also goes into the progress, so any
+    process sharing the progress store can stream it too. Post-processor run times are
+    added to timings['postprocess'], and timings['running'] holds the
+    start time of each post-processor still running. Every
+    CHECKPOINT_INTERVAL seconds the progress is also journaled so a
+    restart can resume the download. With a bandwidth share, every chunk
+    is paced to the job's allocated rate.
+    """
+    record = ProgressRecord(PROGRESS_MIN_INTERVAL)
+    last_checkpoint = [time.monotonic()]
+    if timings is None:
+        timings = {}
+    timings.setdefault('postprocess', 0.0)
+    running = timings.setdefault('running', {})
 
-def create_progress_hook(download_id):
-    """Create a progress hook for a specific download"""
     def progress_hook(d):
-        """Hook to track download progress"""
+        if job.cancelled:
+            raise yt_dlp.utils.DownloadCancelled()
         if d['status'] == 'downloading':
-            if '_percent_str' in d:
-                percent = d['_percent_str'].strip().replace('%', '')
-                try:
-                    progress_val = float(percent)
-                except:
-                    progress_val = 0
-                download_progress[download_id] = {
-                    'status': 'downloading',
-                    'progress': progress_val,
-                    'speed': d.get('_speed_str', 'N/A'),
-                    'eta': d.get('_eta_str', 'N/A')
-                }
+            if share is not None:
+                # Pausing in the hook holds back the download thread that called it
+                delay = share.consume(d.get('downloaded_bytes'))
+                if delay and job.cancel_event.wait(delay):
+                    raise yt_dlp.utils.DownloadCancelled()
+            live = live_files.get(job.id)
+            if live is None and streamable and d.get('info_dict', {}).get('protocol') in ('http', 'https'):
+                title = d.get('info_dict', {}).get('title', 'video')
+                live = live_files[job.id] = LiveFile(
+                    d.get('tmpfilename') or d['filename'],
+                    d['filename'],
+                    yt_dlp.utils.sanitize_filename(title) + os.path.splitext(d['filename'])[1],
+                    d.get('total_bytes'),
+                )
+            
+            now = time.monotonic()
+            if not record.due(now):
+                return
+            if now - last_checkpoint[0] >= CHECKPOINT_INTERVAL:
+                last_checkpoint[0] = now
+                save_checkpoint(job, d)
+            record.update(d, now)
+            progress = record.to_payload()
+            if live is not None:
+                progress['filename'] = live.display_name
+                progress['stream_url'] = f'/api/file/{job.id}'
+                progress['stream_file'] = os.path.basename(live.filename)
+            progress_broker.publish(job.id, progress)
         elif d['status'] == 'finished':
-            download_progress[download_id] = {
-                'status': 'processing',
-                'progress': 95,
-                'message': 'Processing downloaded file...'
-            }
-    return progress_hook
+            BYTES_DOWNLOADED.inc(d.get('total_bytes') or d.get('downloaded_bytes') or 0)
+            record.update(d, time.monotonic())
+            progress = record.to_payload()
+            progress['filename'] = os.path.basename(d.get('filename', ''))
+            progress_broker.publish(job.id, progress)
+
+    def postprocessor_hook(d):
+        if job.cancelled:
+            raise yt_dlp.utils.DownloadCancelled()
+        name = d.get('postprocessor') or 'unknown'
+        if d['status'] == 'started':
+            running[name] = time.perf_counter()
+            if name.startswith('FFmpeg'):
+                FFMPEG_ACTIVE.inc()
+            if name != 'MoveFiles':
+                record.start_stage(name)
+                progress_broker.publish(job.id, record.to_payload())
+        elif d['status'] == 'finished' and name in running:
+            finish_postprocessor(name, running.pop(name), timings)
+
+    return progress_hook, postprocessor_hook
+
+def save_checkpoint(job, d):
+    """Journal how far a download got, from a yt-dlp progress hook dict"""
+    if scheduler.journal is None:
+        return
+    scheduler.journal.save_checkpoint(job.id, {
+        'format': job.options.get('resolved_format'),
+        'filename': os.path.basename(d.get('tmpfilename') or d.get('filename') or ''),
+        'downloaded_bytes': d.get('downloaded_bytes'),
+        'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate'),
+        'fragment_index': d.get('fragment_index'),
+        'fragment_count': d.get('fragment_count'),
+        'saved_at': time.time(),
+    })
+
+def resume_progress(checkpoint):
+    """Progress payload for a job picking up where an earlier run stopped"""
+    payload = {'status': 'resuming', 'progress': 0}
+    done = checkpoint.get('downloaded_bytes')
+    total = checkpoint.get('total_bytes')
+    if done is not None:
+        payload['downloaded_bytes'] = done
+        if total:
+            payload['total_bytes'] = total
+            payload['progress'] = round(min(done / total, 1) * 100, 1)
+    return payload
+
+def finish_postprocessor(name, started, timings):
+    elapsed = time.perf_counter() - started
+    timings['postprocess'] += elapsed
+    POSTPROCESSOR_SECONDS.observe(elapsed, postprocessor=name)
+    if name.startswith('FFmpeg'):
+        FFMPEG_ACTIVE.dec()
+
+def build_download_options(format_type, quality, key, audio=None):
+    """yt-dlp options for a video or audio download stored under an artifact key.
+
+    Format and post-processor choices depend on the cached ffmpeg
+    capabilities: without ffmpeg nothing can be merged or converted.
+    audio holds the audio pipeline settings from audio_pipeline_options().
+    """
+    ydl_opts = {
+        'outtmpl': os.path.join(DOWNLOAD_DIR, f'{key}.%(ext)s'),
+        'quiet': False,
+        # The output name depends only on the artifact key, so a job restored
+        # after a restart picks up its .part file (and fragment state)
+        'continuedl': True,
+        # Only affects fragmented (HLS/DASH) formats
+        'concurrent_fragment_downloads': FRAGMENT_CONCURRENCY,
+        'extractor_retries': 3,
+        'fragment_retries': 10,
+        'retries': 10,
+        'nocheckcertificate': True,
+        'user_agent': DOWNLOAD_USER_AGENT,
+    }
+    ffmpeg_location = ffmpeg_caps.location
+    if ffmpeg_location:
+        ydl_opts['ffmpeg_location'] = ffmpeg_location
+    
+    if format_type == 'audio':
+        if ffmpeg_location is None:
+            ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio/best'
+        else:
+            # Converted after the download, and only if the source isn't accepted as is
+            ydl_opts['format'] = audio_format_selector((audio or {}).get('codecs', DEFAULT_AUDIO_CODECS))
+    elif ffmpeg_location is None:
+        # Merging separate video and audio streams needs ffmpeg
+        if quality == 'best':
+            ydl_opts['format'] = 'best[ext=mp4]/best'
+        else:
+            ydl_opts['format'] = f'best[height<={quality}][ext=mp4]/best[height<={quality}]/best'
+    else:
+        if quality == 'best':
+            ydl_opts['format'] = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+        else:
+            ydl_opts['format'] = f'bestvideo[height<={quality}][ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+    
+    return ydl_opts
+
+def split_download_options(ydl_opts):
+    """Split download options into the pooled profile's and the job's own"""
+    profile_opts = {name: value for name, value in ydl_opts.items() if name not in DOWNLOAD_JOB_OPTIONS}
+    job_opts = {name: value for name, value in ydl_opts.items() if name in DOWNLOAD_JOB_OPTIONS}
+    return profile_opts, job_opts
+
+def audio_pipeline_options(format_type, options):
+    """Audio pipeline settings for a download's options, or None when it doesn't apply"""
+    if format_type != 'audio' or ffmpeg_caps.location is None:
+        return None
+    return {
+        'codecs': options.get('audio_codecs') or DEFAULT_AUDIO_CODECS,
+        'bitrate': options.get('audio_bitrate') or DEFAULT_AUDIO_BITRATE,
+    }
+
+def parse_audio_request(data):
+    """Audio options of a download request; raises ValueError for invalid ones"""
+    options = {}
+    if data.get('audio_codecs'):
+        options['audio_codecs'] = parse_codecs(data['audio_codecs'])
+    if data.get('audio_bitrate'):
+        options['audio_bitrate'] = parse_bitrate(data['audio_bitrate'])
+    return options
+
+def normalize_url(url):
+    """Trim a requested URL and give it a protocol if it has none"""
+    url = (url or '').strip()
+    if url and not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+def parse_rate_limit(data):
+    """Per-download bandwidth limit in bytes/s from a request, or None"""
+    if not data.get('rate_limit'):
+        return None
+    limit = int(data['rate_limit'])
+    if limit <= 0:
+        raise ValueError('rate_limit must be a positive number of bytes per second')
+    return limit
 
-def download_video_task(download_id, url, ydl_opts):
-    """Background task to download video"""
+def traffic_class(job):
+    """Bandwidth class of a job: clips and urgent requests are interactive"""
+    if job.options.get('traffic_class'):
+        return job.options['traffic_class']
+    if job.options.get('clip') or job.priority < DEFAULT_PRIORITY:
+        return 'interactive'
+    return 'normal'
+
+def parse_height(quality):
+    """Height limit of a quality setting like '720' or '720p', or None for best"""
     try:
-        # Update progress hook with the correct download_id
-        ydl_opts['progress_hooks'] = [create_progress_hook(download_id)]
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            
-            # Get the downloaded filename
-            base_filename = ydl.prepare_filename(info)
-            
-            # Try different possible extensions
-            possible_files = [
-                base_filename,
-                base_filename.rsplit('.', 1)[0] + '.mp3',
-                base_filename.rsplit('.', 1)[0] + '.m4a',
-                base_filename.rsplit('.', 1)[0] + '.mp4',
-                base_filename.rsplit('.', 1)[0] + '.webm',
-            ]
-            
-            filename = None
-            for possible_file in possible_files:
-                if os.path.exists(possible_file):
-                    filename = possible_file
-                    break
-            
-            # If still not found, search in downloads directory
-            if not filename:
-                title = info.get('title', 'video')
-                for file in os.listdir(DOWNLOAD_DIR):
-                    if title in file:
-                        filename = os.path.join(DOWNLOAD_DIR, file)
-                        break
-            
-            if filename and os.path.exists(filename):
-                download_progress[download_id]['status'] = 'completed'
-                download_progress[download_id]['filename'] = os.path.basename(filename)
-                download_progress[download_id]['title'] = info.get('title', 'Unknown')
-            else:
-                download_progress[download_id]['status'] = 'error'
-                download_progress[download_id]['error'] = 'File not found after download'
-    except Exception as e:
-        download_progress[download_id]['status'] = 'error'
-        download_progress[download_id]['error'] = str(e)
+        return int(str(quality).lower().rstrip('p'))
+    except ValueError:
+        return None
+
+def resolve_download(info, format_type, quality, options=None):
+    """Concrete format and content store key for downloading a video.
+
+    The format comes from the video's format index: an explicit format_id in
+    options, or the best match for the type and quality. When the index
+    can't decide (e.g. a site that lists no formats) yt-dlp gets the format
+    selector string instead. Different requests resolving to the same
+    formats share one artifact.
+    """
+    options = options or {}
+    audio = audio_pipeline_options(format_type, options)
+    index = format_indexes.get(info)
+    can_merge = ffmpeg_caps.location is not None
+    if options.get('format_id'):
+        format_id = index.with_audio(options['format_id']) if can_merge else options['format_id']
+    elif format_type == 'audio':
+        format_id = index.select_audio(audio['codecs'] if audio else None, prefer_m4a=True)
+    else:
+        format_id = index.select_video(parse_height(quality), can_merge)
+    if format_id is None:
+        format_id = build_download_options(format_type, quality, key='', audio=audio)['format']
+    postprocessors = [{'key': 'AudioPipeline', **audio}] if audio is not None else None
+    return format_id, artifact_key(video_key(info), format_id, postprocessors)
+
+def is_progressive_http(info, format_id):
+    """Whether format_id is one file fetched over plain HTTP(S), not a merge or a stream"""
+    formats = info.get('formats') or [info]
+    fmt = next((f for f in formats if f.get('format_id') == format_id), None)
+    return fmt is not None and fmt.get('protocol') in ('http', 'https')
+
+def clip_format(format_type, quality):
+    """Format selector for clips.
+
+    Progressive files come first: ffmpeg reads their index and then fetches
+    only the byte ranges covering the clip.
+    """
+    if format_type == 'audio':
+        return 'bestaudio[ext=m4a][protocol^=http]/bestaudio[ext=m4a]/bestaudio/best'
+    height = '' if quality == 'best' else f'[height<={quality}]'
+    return (
+        f'bestvideo{height}[ext=mp4][protocol^=http]+bestaudio[ext=m4a][protocol^=http]'
+        f'/best{height}[ext=mp4][protocol^=http]/best{height}/best'
+    )
+
+def artifact_progress(entry):
+    """Progress payload for an artifact that is ready to be fetched"""
+    return {
+        'status': 'completed',
+        'progress': 100,
+        'filename': entry['display_name'],
+        'title': entry.get('title', 'Unknown'),
+        'download_url': f"/api/file/{entry['file']}",
+        'size': entry['size'],
+        'sha256': entry.get('sha256'),
+        'finished_at': time.time()
+    }
+
+def digest_headers(entry):
+    """RFC 9530 Repr-Digest of an artifact, for clients verifying what they fetched"""
+    if not entry.get('sha256'):
+        return None  # Stored before checksums were recorded
+    digest = base64.b64encode(bytes.fromhex(entry['sha256'])).decode('ascii')
+    return {'Repr-Digest': f'sha-256=:{digest}:'}
+
+def download_video_task(job):
+    """Run a queued download on a worker thread"""
+    QUEUE_WAIT_SECONDS.observe(max(time.time() - job.created_at, 0))
+    if job.checkpoint:
+        progress_broker.publish(job.id, resume_progress(job.checkpoint))
+    else:
+        progress_broker.publish(job.id, {'status': 'downloading', 'progress': 0})
+    format_type = job.options.get('format', 'video')
+    quality = job.options.get('quality', 'best')
+    
+    # Reuse the cached metadata; process_ie_result only re-runs format
+    # selection against the new options before downloading
+    with JOB_PHASE_SECONDS.time(phase='extract'):
+        cached_info = extract_video_info(job.url)
+    format_id, key = job.options.get('resolved_format'), job.options.get('artifact_key')
+    # Clips pick their formats when they are cut and are keyed by their range
+    if not format_id and not job.options.get('clip'):
+        format_id, resolved_key = resolve_download(cached_info, format_type, quality, job.options)
+        key = key or resolved_key
+    job.check_cancelled()
+    
+    # Another request may have materialized the same artifact while we were queued
+    entry = content_store.get(key)
+    if entry is not None:
+        progress_broker.publish(job.id, artifact_progress(entry))
+        return
+    
+    if job.options.get('clip'):
+        with JOB_PHASE_SECONDS.time(phase='clip'):
+            clip_video_task(job, cached_info, key)
+        return
+    
+    audio = audio_pipeline_options(format_type, job.options)
+    ydl_opts = build_download_options(format_type, quality, key, audio)
+    ydl_opts['format'] = format_id
+    # Only a single file fetched over plain HTTP is written as it will be served;
+    # HLS/DASH, merged and post-processed output is rewritten after the download
+    streamable = audio is None and not ydl_opts.get('postprocessors') and is_progressive_http(cached_info, format_id)
+    if streamable:
+        # A fixup would rewrite the file after its bytes were already streamed
+        ydl_opts['fixup'] = 'never'
+    timings = {}
+    share = bandwidth.register(job.id, traffic_class(job), job.options.get('rate_limit'))
+    if share.rate is not None:
+        # yt-dlp grows its read size with the link speed (up to 4 MiB); keep
+        # chunks small so pacing is smooth rather than bursts and long pauses
+        ydl_opts.update(buffersize=PACED_BUFFER_SIZE, noresizebuffer=True)
+    progress_hook, postprocessor_hook = create_progress_hooks(job, streamable, timings, share)
+    ydl_opts['progress_hooks'] = [progress_hook]
+    ydl_opts['postprocessor_hooks'] = [postprocessor_hook]
+    
+    start = time.perf_counter()
+    profile_opts, job_opts = split_download_options(ydl_opts)
+    try:
+        with ydl_pool.checkout(f'download-{format_type}', profile_opts, **job_opts) as ydl:
+            info = ydl.process_ie_result(
+                yt_dlp.YoutubeDL.sanitize_info(cached_info, remove_private_keys=True),
+                download=True,
+            )
+    except yt_dlp.utils.DownloadCancelled:
+        raise JobCancelled(job.id)
+    finally:
+        bandwidth.unregister(job.id)
+        # Post-processors interrupted by an error never report 'finished'
+        for name, started in list(timings['running'].items()):
+            finish_postprocessor(name, started, timings)
+        JOB_PHASE_SECONDS.observe(time.perf_counter() - start - timings['postprocess'], phase='download')
+        if timings['postprocess']:
+            JOB_PHASE_SECONDS.observe(timings['postprocess'], phase='postprocess')
+    
+    # yt-dlp records the final path after post-processing
+    downloads = info.get('requested_downloads') or []
+    filepath = downloads[0].get('filepath') if downloads else None
+    if not filepath or not os.path.exists(filepath):
+        raise FileNotFoundError('File not found after download')
+    if audio is not None:
+        filepath = finish_audio(job, filepath, audio)
+    
+    title = info.get('title', 'Unknown')
+    ext = os.path.splitext(filepath)[1]
+    entry = content_store.add(
+        key,
+        filepath,
+        display_name=yt_dlp.utils.sanitize_filename(title) + ext,
+        title=title,
+        video=video_key(info),
+    )
+    progress_broker.publish(job.id, artifact_progress(entry))
+    storage.enforce()
+
+def finish_audio(job, filepath, audio):
+    """Keep, remux or transcode a downloaded audio file; returns the final path"""
+    ffmpeg = ffmpeg_caps.location
+    codec, has_video = probe_audio(ffmpeg, filepath)
+    base, ext = os.path.splitext(filepath)
+    action, target = plan_audio(codec, has_video, ext[1:], audio['codecs'], ffmpeg_caps.has_encoder)
+    AUDIO_ACTIONS.inc(action=action)
+    if action == 'keep':
+        return filepath
+    
+    progress_broker.publish(job.id, {'status': 'processing', 'progress': 100, 'stage': action})
+    target_ext = AUDIO_CODECS[target][1]
+    output = f'{base}.{target_ext}'
+    partial = f'{base}.part.{target_ext}'
+    start = time.perf_counter()
+    try:
+        convert_audio(ffmpeg, filepath, partial, action, target, audio['bitrate'],
+                      pool=transcode_pool, cancelled=lambda: job.cancelled)
+        os.replace(partial, output)
+    except AudioCancelled:
+        raise JobCancelled(job.id)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+        elapsed = time.perf_counter() - start
+        POSTPROCESSOR_SECONDS.observe(elapsed, postprocessor=f'Audio{action.title()}')
+        JOB_PHASE_SECONDS.observe(elapsed, phase='postprocess')
+    if output != filepath:
+        os.remove(filepath)
+    return output
+
+def clip_video_task(job, cached_info, key):
+    """Cut a clip with ffmpeg straight from the selected format's URLs"""
+    start, end = job.options['clip']
+    format_type = job.options.get('format', 'video')
+    selector = clip_format(format_type, job.options.get('quality', 'best'))
+    with ydl_pool.checkout('formats', FORMAT_SELECT_OPTS, format=selector) as ydl:
+        info = ydl.process_ie_result(
+            yt_dlp.YoutubeDL.sanitize_info(cached_info, remove_private_keys=True),
+            download=False,
+        )
+    formats = info.get('requested_formats') or [info]
+    
+    ext = '.m4a' if format_type == 'audio' else '.mp4'
+    filepath = os.path.join(DOWNLOAD_DIR, key + ext)
+    partial = os.path.join(DOWNLOAD_DIR, key + '.part' + ext)
+    last_publish = [0.0]
+    
+    def on_progress(fraction):
+        now = time.monotonic()
+        if now - last_publish[0] >= PROGRESS_MIN_INTERVAL:
+            last_publish[0] = now
+            progress_broker.publish(job.id, {
+                'status': 'downloading', 'progress': round(fraction * 100, 1), 'stage': 'clip'
+            })
+    
+    FFMPEG_ACTIVE.inc()
+    # ffmpeg reads the source itself and can't be paced, but its share is
+    # held back from the other downloads while it runs
+    bandwidth.register(job.id, traffic_class(job), metered=False)
+    try:
+        method = cut_clip(
+            ffmpeg_caps.location,
+            [f['url'] for f in formats],
+            start,
+            end,
+            partial,
+            headers=formats[0].get('http_headers') or info.get('http_headers'),
+            audio_only=format_type == 'audio',
+            can_encode=ffmpeg_caps.has_encoder,
+            on_progress=on_progress,
+            cancelled=lambda: job.cancelled,
+        )
+        os.replace(partial, filepath)
+    except ClipCancelled:
+        raise JobCancelled(job.id)
+    finally:
+        bandwidth.unregister(job.id)
+        FFMPEG_ACTIVE.dec()
+        if os.path.exists(partial):
+            os.remove(partial)
+    
+    title = info.get('title', 'Unknown')
+    entry = content_store.add(
+        key,
+        filepath,
+        display_name=yt_dlp.utils.sanitize_filename(f'{title} [{start:g}-{end:g}]') + ext,
+        title=title,
+        video=video_key(info),
+        clip=[start, end],
+        clip_method=method,
+    )
+    progress_broker.publish(job.id, artifact_progress(entry))
+    storage.enforce()
+
+def on_download_finished(job, error):
+    """Release the job's artifact and record how it ended if it did not complete"""
+    live_files.pop(job.id, None)
+    if not job.interrupted:
+        content_store.release(job.options.get('artifact_key'), job.id)
+    if error is None:
+        DOWNLOAD_RESULTS.inc(outcome='completed')
+        return
+    DOWNLOAD_RESULTS.inc(outcome='cancelled' if isinstance(error, JobCancelled) else 'error')
+    if isinstance(error, JobCancelled):
+        if not job.interrupted:
+            progress_broker.publish(job.id, {'status': 'cancelled', 'finished_at': time.time()})
+    else:
+        progress_broker.publish(job.id, {'status': 'error', 'error': str(error), 'finished_at': time.time()})
+
+# ffmpeg is probed once at startup instead of on every request
+FFMPEG_PATH = os.environ.get('FFMPEG_PATH')
+FFMPEG_WATCH_INTERVAL = int(os.environ.get('FFMPEG_WATCH_INTERVAL', 60))  # 0 disables
+ffmpeg_caps = FFmpegCapabilities(FFMPEG_PATH)
+
+# Bounded worker pool; queued jobs are journaled so they survive a restart
+DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', 2))
+DOWNLOAD_HOST_LIMIT = int(os.environ.get('DOWNLOAD_HOST_LIMIT', 2))
+DOWNLOAD_DRAIN_TIMEOUT = int(os.environ.get('DOWNLOAD_DRAIN_TIMEOUT', 30))
+JOB_JOURNAL_PATH = os.environ.get('JOB_JOURNAL_PATH', os.path.join(os.getcwd(), 'jobs.db'))
+CHECKPOINT_INTERVAL = float(os.environ.get('CHECKPOINT_INTERVAL', 5))
+# Jobs of a process that stops renewing its journal lease this long are taken over
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 30))
+
+def on_download_restored(job):
+    """Reclaim the artifact of a job taken over from the journal and show it as queued"""
+    if job.options.get('artifact_key'):
+        content_store.claim(job.options['artifact_key'], job.id)
+    if job.checkpoint:
+        progress_broker.publish(job.id, resume_progress(job.checkpoint))
+    else:
+        progress_broker.publish(job.id, {'status': 'queued', 'progress': 0})
+
+scheduler = DownloadScheduler(
+    download_video_task,
+    workers=DOWNLOAD_WORKERS,
+    per_host_limit=DOWNLOAD_HOST_LIMIT,
+    journal=JobJournal(JOB_JOURNAL_PATH, lease_seconds=JOB_LEASE_SECONDS),
+    on_finish=on_download_finished,
+    on_restore=on_download_restored,
+)
+
+def download_dir_bytes():
+    """Bytes on disk in DOWNLOAD_DIR, including partial downloads"""
+    total = 0
+    with os.scandir(DOWNLOAD_DIR) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+    return total
+
+def metadata_cache_lookups():
+    stats = metadata_cache.stats()
+    return {('hit',): stats['hits'], ('miss',): stats['misses'], ('coalesced',): stats['coalesced']}
+
+metrics.gauge('download_queue_depth', 'Downloads waiting for a worker',
+              function=lambda: scheduler.stats()['queued'])
+metrics.gauge('downloads_running', 'Downloads currently running',
+              function=lambda: scheduler.stats()['running'])
+metrics.counter('metadata_cache_lookups_total', 'Metadata cache lookups by result', ['result'],
+                function=metadata_cache_lookups)
+metrics.gauge('metadata_cache_hit_ratio', 'Share of metadata lookups served from cache',
+              function=lambda: metadata_cache.stats()['hit_rate'])
+metrics.gauge('download_dir_bytes', 'Bytes on disk in the downloads directory', function=download_dir_bytes)
+metrics.gauge('audio_transcodes_active', 'Audio transcodes running', function=lambda: transcode_pool.active)
+metrics.gauge('audio_transcodes_waiting', 'Audio transcodes waiting for a free slot',
+              function=lambda: transcode_pool.waiting)
+metrics.gauge('download_dir_free_bytes', 'Free space on the downloads filesystem',
+              function=lambda: shutil.disk_usage(DOWNLOAD_DIR).free)
+metrics.gauge('stored_artifact_bytes', 'Bytes of finished files in the content store',
+              function=lambda: content_store.stats()['bytes'])
+metrics.gauge('download_throughput_bytes', 'Combined download rate of running jobs in bytes/s',
+              function=bandwidth.total_throughput)
+metrics.gauge('download_job_throughput_bytes', 'Download rate of each running job in bytes/s',
+              ['download_id', 'class'],
+              function=lambda: {(job_id, s['class']): s['throughput'] for job_id, s in bandwidth.snapshot().items()})
+metrics.gauge('download_job_rate_limit_bytes', 'Bandwidth allocated to each running job in bytes/s',
+              ['download_id', 'class'],
+              function=lambda: {(job_id, s['class']): s['rate'] for job_id, s in bandwidth.snapshot().items()
+                                if s['rate'] is not None})
+metrics.counter('ydl_instances_total', 'YoutubeDL instances built for the pool and reused from it',
+                ['result'], function=lambda: {(result,): ydl_pool.stats()[result] for result in ('created', 'reused')})
+metrics.gauge('ydl_pool_idle', 'Idle pooled YoutubeDL instances', function=lambda: ydl_pool.stats()['idle'])
+metrics.gauge('thumbnail_cache_bytes', 'Bytes of cached thumbnails', function=lambda: thumbnails.stats()['bytes'])
+metrics.counter('thumbnail_cache_lookups_total', 'Thumbnail cache lookups by result', ['result'],
+                function=lambda: {('hit',): thumbnails.stats()['hits'], ('miss',): thumbnails.stats()['misses']})
+metrics.gauge('progress_stream_subscribers', 'Open Server-Sent Events progress streams',
+              function=lambda: progress_broker.subscribers)
+metrics.gauge('streams_open', 'Open progress and live file streams', function=lambda: stream_slots.active)
+metrics.counter('streams_rejected_total', 'Streams refused with 503 because every slot was in use',
+                function=lambda: stream_slots.rejected)
+
+_services_lock = threading.Lock()
+_services_started = False
+
+def warm_ydl_pool():
+    """Build the YoutubeDL instances requests and jobs start with"""
+    ydl_pool.warm('info', INFO_OPTS, EXTRACTION_WORKERS)
+    ydl_pool.warm('batch', BATCH_RESOLVE_OPTS)
+    ydl_pool.warm('formats', FORMAT_SELECT_OPTS)
+    for format_type in ('video', 'audio'):
+        profile_opts, _ = split_download_options(build_download_options(format_type, 'best', 'warmup'))
+        ydl_pool.warm(f'download-{format_type}', profile_opts, DOWNLOAD_WORKERS)
+
+def start_background_services():
+    """Start the download workers once per process"""
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+        ffmpeg_caps.refresh()
+        ffmpeg_caps.watch(FFMPEG_WATCH_INTERVAL)
+        # Off the request path; a request arriving first just builds its own
+        threading.Thread(target=warm_ydl_pool, name='ydl-warmup', daemon=True).start()
+        scheduler.start()
+        # Partial files of jobs that are gone for good; those of journaled
+        # jobs (here or in another process) are kept for resuming
+        if scheduler.journal is not None:
+            keep = {options.get('artifact_key') for options in scheduler.journal.options()}
+            removed, freed = content_store.remove_orphans(keep)
+            if removed:
+                print(f'Removed {removed} orphaned partial downloads ({freed} bytes)')
+        atexit.register(scheduler.shutdown, drain=True, timeout=DOWNLOAD_DRAIN_TIMEOUT)
+        storage.start(STORAGE_SWEEP_INTERVAL)
+        atexit.register(content_store.flush)
+        atexit.register(download_progress.close)
+        atexit.register(ydl_pool.close)
+
+@app.before_request
+def ensure_background_services():
+    start_background_services()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route=route,
+                                method=request.method, status=response.status_code)
+    if request.endpoint in FILE_ENDPOINTS and response.status_code in (200, 206) and request.method != 'HEAD':
+        BYTES_SERVED.inc(response.content_length or 0, endpoint=request.endpoint)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics for this process"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
 @app.route('/')
 def index():
     return jsonify({
         'message': 'Video Downloader API',
         'status': 'running',
-        'endpoints': ['/api/info', '/api/download', '/api/formats']
+        'endpoints': ['/api/info', '/api/info/batch', '/api/download', '/api/formats', '/api/progress']
     })
 
-@app.route('/api/info', methods=['POST'])
+def summarize_info(info):
+    """The fields of an info dict returned by the info endpoints"""
+    summary = {
+        'id': info.get('id', ''),
+        'title': info.get('title', 'Unknown'),
+        'thumbnail': info.get('thumbnail', ''),
+        'duration': info.get('duration', 0),
+        'uploader': info.get('uploader', 'Unknown'),
+        'view_count': info.get('view_count', 0),
+        'description': (info.get('description') or '')[:200],  # First 200 chars
+    }
+    if info.get('thumbnail'):
+        # The proxy only fetches thumbnails of videos it has been told about
+        thumbnails.register(video_key(info), info['thumbnail'])
+        summary['thumbnail_url'] = f"/api/thumbnail/{quote(video_key(info), safe=':')}"
+    return summary
+
+def resolve_batch_url(url):
+    """Classify a batch URL as one video or a playlist of entry URLs"""
+    info = metadata_cache.get(url)
+    if info is not None:
+        return 'video', summarize_info(info), None
+    
+    info = extraction_pool.submit(timed_extract, url, 'batch', BATCH_RESOLVE_OPTS).result(timeout=EXTRACTION_TIMEOUT)
+    if info.get('_type') == 'playlist':
+        entries = [entry for entry in info.get('entries') or [] if entry]
+        entry_urls = [entry.get('url') or entry.get('webpage_url') for entry in entries]
+        return 'playlist', info, [u for u in entry_urls if u]
+    
+    # Flat extraction only skips playlist entries; a single video is fully extracted
+    metadata_cache.put(url, info)
+    return 'video', summarize_info(info), None
+
+def request_params():
+    """Parameters of a metadata request: the query string of a GET, the JSON body of a POST"""
+    if request.method == 'GET':
+        return request.args.to_dict()
+    return request.get_json(silent=True) or {}
+
+def cached_metadata_response(url, info, build, variant, data):
+    """Conditional, negotiated response for data built from url's cached info.
+
+    variant names the endpoint and any parameters shaping the payload, so
+    each distinct response gets its own ETag.
+    """
+    stored_at = metadata_cache.stored_at(url) or time.time()
+    return metadata_response(
+        build,
+        [video_key(info), stored_at, variant],
+        stored_at,
+        fields=parse_fields(data.get('fields')),
+        cache_control=f'private, max-age={METADATA_MAX_AGE}',
+    )
+
+@app.route('/api/info', methods=['GET', 'POST'])
 def get_video_info():
     """Get video information without downloading"""
     try:
-        data = request.get_json()
+        data = request_params()
         url = data.get('url')
         
         if not url:
             return jsonify({'error': 'URL is required'}), 400
         
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            # Extract relevant information
-            video_info = {
-                'id': info.get('id', ''),
-                'title': info.get('title', 'Unknown'),
-                'thumbnail': info.get('thumbnail', ''),
-                'duration': info.get('duration', 0),
-                'uploader': info.get('uploader', 'Unknown'),
-                'view_count': info.get('view_count', 0),
-                'description': info.get('description', '')[:200],  # First 200 chars
-            }
-            
-            return jsonify(video_info)
+        info = extract_video_info(url)
+        return cached_metadata_response(url, info, lambda: summarize_info(info), 'info', data)
             
+    except ExtractionTimeout:
+        return jsonify({'error': 'Timed out extracting video information'}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/formats', methods=['POST'])
+@app.route('/api/info/batch', methods=['POST'])
+def get_video_info_batch():
+    """Get info for many URLs (and playlists), streamed back as NDJSON"""
+    data = request.get_json() or {}
+    urls = data.get('urls')
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'urls must be a non-empty list'}), 400
+    if len(urls) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {BATCH_MAX_ITEMS} URLs per batch'}), 400
+    
+    def generate():
+        results = iter_batch(
+            urls,
+            resolve_batch_url,
+            lambda url: summarize_info(extract_video_info(url)),
+            parallelism=BATCH_PARALLELISM,
+            max_items=BATCH_MAX_ITEMS,
+        )
+        for result in results:
+            yield json.dumps(result) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/formats', methods=['GET', 'POST'])
 def get_formats():
-    """Get available formats for a video"""
+    """Get a page of a video's formats, best first, optionally filtered"""
     try:
-        data = request.get_json()
+        data = request_params()
         url = data.get('url')
         
         if not url:
             return jsonify({'error': 'URL is required'}), 400
+        try:
+            filters = {name: data.get(name) for name in FORMAT_FILTERS}
+            for name in ('min_height', 'max_height'):
+                if filters[name] not in (None, ''):
+                    filters[name] = int(filters[name])
+            if isinstance(filters['progressive'], str) and filters['progressive']:
+                # Query strings carry booleans as text
+                filters['progressive'] = filters['progressive'].lower() in ('1', 'true', 'yes')
+            offset = max(int(data.get('offset', 0)), 0)
+            limit = min(max(int(data.get('limit', FORMATS_PAGE_SIZE)), 1), FORMATS_MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'offset, limit and heights must be integers'}), 400
         
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-        }
+        info = extract_video_info(url)
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            formats = []
-            seen_qualities = set()
-            
-            for f in info.get('formats', []):
-                # Video formats
-                if f.get('vcodec') != 'none' and f.get('acodec') != 'none':
-                    quality = f.get('format_note', f.get('height', 'unknown'))
-                    if quality not in seen_qualities:
-                        formats.append({
-                            'format_id': f.get('format_id'),
-                            'ext': f.get('ext', 'mp4'),
-                            'quality': str(quality),
-                            'resolution': f"{f.get('width', 0)}x{f.get('height', 0)}",
-                            'filesize': f.get('filesize', 0),
-                            'type': 'video'
-                        })
-                        seen_qualities.add(quality)
-                
-                # Audio-only formats
-                elif f.get('acodec') != 'none' and f.get('vcodec') == 'none':
-                    quality = f.get('abr', 'unknown')
-                    formats.append({
-                        'format_id': f.get('format_id'),
-                        'ext': f.get('ext', 'm4a'),
-                        'quality': f"{quality}kbps" if quality != 'unknown' else 'audio',
-                        'filesize': f.get('filesize', 0),
-                        'type': 'audio'
-                    })
-            
-            return jsonify({
+        def build():
+            total, rows = format_indexes.get(info).query(filters, offset, limit)
+            return {
                 'title': info.get('title', 'Unknown'),
-                'formats': formats[:10]  # Return top 10 formats
-            })
-            
+                'duration': info.get('duration'),
+                'total': total,
+                'offset': offset,
+                'limit': limit,
+                # Unknown values are left out rather than zeroed
+                'formats': [{k: v for k, v in row.items() if v is not None} for row in rows]
+            }
+        
+        return cached_metadata_response(url, info, build, ['formats', filters, offset, limit], data)
+        
+    except ExtractionTimeout:
+        return jsonify({'error': 'Timed out extracting video information'}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def queue_download(url, format_type='video', quality='best', priority=DEFAULT_PRIORITY, clip=None, audio=None,
+                   format_id=None, rate_limit=None, traffic=None):
+    """Serve, join or queue a download of url; returns the response fields.
+
+    clip is an optional [start, end] range in seconds to cut instead of
+    downloading the whole video; audio holds the request's audio options
+    from parse_audio_request(); format_id picks a format from /api/formats.
+    rate_limit caps the job's bandwidth in bytes/s and traffic overrides
+    its bandwidth class (see traffic_class()).
+    Raises ValueError for a format_id the video doesn't have.
+    """
+    info = extract_video_info(url)
+    request_options = dict(audio or {})
+    if format_id:
+        if not format_indexes.get(info).valid(format_id):
+            raise ValueError(f"Unknown format_id '{format_id}'")
+        request_options['format_id'] = format_id
+    resolved = None
+    if clip is None:
+        resolved, key = resolve_download(info, format_type, quality, request_options)
+    else:
+        key = artifact_key(video_key(info), clip_format(format_type, quality), clip=clip)
+    
+    # Already materialized: serve the stored artifact right away
+    entry = content_store.get(key)
+    if entry is not None:
+        storage.record_access(key)
+        download_id = uuid.uuid4().hex
+        progress_broker.publish(download_id, artifact_progress(entry))
+        return {'download_id': download_id, **download_progress[download_id]}
+    
+    # Coalesce onto a job that is already building the same artifact, in this
+    # process or, through the journal, in another server process
+    options = {'format': format_type, 'quality': quality, 'artifact_key': key, 'resolved_format': resolved,
+               **request_options}
+    if clip is not None:
+        options['clip'] = clip
+    if rate_limit:
+        options['rate_limit'] = rate_limit
+    if traffic:
+        options['traffic_class'] = traffic
+    job = DownloadJob(url, options, priority, key=key)
+    owner = content_store.claim(key, job.id)
+    if owner is None:
+        progress_broker.publish(job.id, {'status': 'queued', 'progress': 0})
+        try:
+            position = scheduler.submit(job)
+        except JobExists as e:
+            content_store.release(key, job.id)
+            download_progress.pop(job.id, None)
+            owner = e.job_id
+    if owner is not None:
+        # The client that queued it and every one that joined leave it through DELETE
+        scheduler.join(owner)
+        return {
+            'download_id': owner,
+            'status': download_progress.get(owner, {}).get('status', 'queued'),
+            'progress_url': f'/api/progress/{owner}',
+            'joined': True
+        }
+    
+    return {
+        'download_id': job.id,
+        'status': 'queued',
+        'queue_position': position,
+        'progress_url': f'/api/progress/{job.id}'
+    }
+
 @app.route('/api/download', methods=['POST'])
 def download_video():
-    """Download video/audio and return the file"""
+    """Queue a video/audio download and return its download ID"""
     try:
         data = request.get_json()
-        url = data.get('url', '').strip()
+        url = normalize_url(data.get('url'))
         format_type = data.get('format', 'video')  # 'video' or 'audio'
         quality = data.get('quality', 'best')
-        duration = data.get('duration', None)  # Optional: duration in seconds
+        priority = int(data.get('priority', DEFAULT_PRIORITY))  # lower runs first
+        duration = data.get('duration')  # Optional: only the first `duration` seconds
         
         if not url:
             return jsonify({'error': 'URL is required'}), 400
-        
-        # Ensure URL has protocol
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        # Check if FFmpeg is available
-        ffmpeg_available = False
-        ffmpeg_location = None
-        ffmpeg_paths = [
-            'ffmpeg',  # System PATH
-            'C:\\ProgramData\\chocolatey\\lib\\ffmpeg\\tools\\ffmpeg\\bin\\ffmpeg.exe',  # Chocolatey
-        ]
-        
-        for ffmpeg_path in ffmpeg_paths:
-            try:
-                import subprocess
-                subprocess.run([ffmpeg_path, '-version'], capture_output=True, check=True)
-                ffmpeg_available = True
-                ffmpeg_location = ffmpeg_path if ffmpeg_path != 'ffmpeg' else None
-                break
-            except (FileNotFoundError, subprocess.CalledProcessError):
-                continue
-        
-        # Configure yt-dlp options
-        ydl_opts = {
-            'outtmpl': os.path.join(DOWNLOAD_DIR, '%(title)s.%(ext)s'),
-            'quiet': False,
-            'no_warnings': False,
-            'extractor_retries': 3,
-            'fragment_retries': 10,
-            'retries': 10,
-            'nocheckcertificate': True,
-            'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        }
-        
-        # Add duration limit if specified (for testing with short clips)
         if duration:
-            ydl_opts['download_ranges'] = lambda info_dict, ydl: [{'start_time': 0, 'end_time': int(duration)}]
-        
-        # Add FFmpeg location if found
-        if ffmpeg_location:
-            ydl_opts['ffmpeg_location'] = os.path.dirname(ffmpeg_location)
-        
-        if format_type == 'audio':
-            if ffmpeg_available:
-                # Use FFmpeg to convert to MP3
-                ydl_opts.update({
-                    'format': 'bestaudio/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '192',
-                    }],
-                })
-            else:
-                # Download audio-only format without conversion
-                ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio/best'
-        else:
-            # For video formats - avoid HLS/DASH fragmented formats, prefer progressive
-            if ffmpeg_available:
-                # Can merge video+audio with FFmpeg, but prefer progressive formats first
-                if quality == 'best':
-                    ydl_opts['format'] = 'best[ext=mp4][protocol^=http]/best[protocol^=http]/bestvideo[ext=mp4][protocol^=http]+bestaudio[ext=m4a][protocol^=http]/best'
-                else:
-                    ydl_opts['format'] = f'best[height<={quality}][ext=mp4][protocol^=http]/best[height<={quality}][protocol^=http]/bestvideo[height<={quality}][ext=mp4][protocol^=http]+bestaudio[ext=m4a][protocol^=http]/best'
-            else:
-                # Download pre-merged formats only (no FFmpeg needed)
-                if quality == 'best':
-                    ydl_opts['format'] = 'best[ext=mp4][protocol^=http]/best[protocol^=http]/best'
-                else:
-                    ydl_opts['format'] = f'best[height<={quality}][ext=mp4][protocol^=http]/best[height<={quality}][protocol^=http]/best'
+            # Same as a clip from the start, cut without downloading the rest
+            return queue_clip(url, format_type, quality, priority, 0, duration)
+        try:
+            audio = parse_audio_request(data)
+            result = queue_download(url, format_type, quality, priority, audio=audio,
+                                    format_id=data.get('format_id'), rate_limit=parse_rate_limit(data))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Get video info to generate download ID
-        with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-            info = ydl.extract_info(url, download=False)
-            download_id = info.get('id', str(time.time()))
+        return jsonify({'success': True, **result})
         
-        # Initialize progress tracking
-        download_progress[download_id] = {
-            'status': 'starting',
-            'progress': 0
-        }
+    except ExtractionTimeout:
+        return jsonify({'error': 'Timed out extracting video information'}), 504
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clip', methods=['POST'])
+def clip_video():
+    """Queue a clip between start and end seconds and return its download ID"""
+    try:
+        data = request.get_json()
+        url = normalize_url(data.get('url'))
+        format_type = data.get('format', 'video')  # 'video' or 'audio'
+        quality = data.get('quality', 'best')
+        priority = int(data.get('priority', DEFAULT_PRIORITY))
         
-        # Start download in background thread
-        thread = threading.Thread(target=download_video_task, args=(download_id, url, ydl_opts))
-        thread.daemon = True
-        thread.start()
-        download_tasks[download_id] = thread
+        if not url:
+            return jsonify({'error': 'URL is required'}), 400
+        return queue_clip(url, format_type, quality, priority, data.get('start', 0), data.get('end'))
         
-        # Return immediately with download ID
+    except ExtractionTimeout:
+        return jsonify({'error': 'Timed out extracting video information'}), 504
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def queue_clip(url, format_type, quality, priority, start, end):
+    """Validate a clip range in seconds against the video and queue it; returns the response"""
+    try:
+        start = round(float(start), 3)
+        end = round(float(end), 3)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'start and end must be given in seconds'}), 400
+    if start < 0 or end <= start:
+        return jsonify({'error': 'end must be after start'}), 400
+    if ffmpeg_caps.location is None:
+        return jsonify({'error': 'Clips need ffmpeg, which is not available'}), 503
+    
+    duration = extract_video_info(url).get('duration')
+    if duration:
+        if start >= duration:
+            return jsonify({'error': 'start is past the end of the video'}), 400
+        end = min(end, round(duration, 3))
+    
+    return jsonify({'success': True, **queue_download(url, format_type, quality, priority, clip=[start, end])})
+
+def expand_batch_urls(urls):
+    """Replace playlist URLs with their entries, keeping the input order"""
+    def resolve(url):
+        try:
+            return resolve_batch_url(url)
+        except Exception:
+            # Left as is; the item's own download reports the error
+            return 'video', None, None
+    
+    with ThreadPoolExecutor(BATCH_PARALLELISM, thread_name_prefix='batch') as pool:
+        resolved = list(pool.map(resolve, urls))
+    expanded = []
+    for url, (kind, _, entry_urls) in zip(urls, resolved):
+        expanded.extend(entry_urls if kind == 'playlist' else [url])
+    return expanded[:BATCH_MAX_ITEMS]
+
+def run_batch(batch):
+    """Download a batch's items through the scheduler, a few at a time"""
+    def wait(seq, timeout):
+        seq = progress_broker.wait(seq, timeout)
+        # Cancelled through another server process
+        if not batch.cancelled and batch.id in scheduler.journal.take_cancel_requests([batch.id]):
+            batch.cancel()
+        return seq
+    
+    def start_item(url):
+        result = queue_download(
+            url,
+            batch.options.get('format', 'video'),
+            batch.options.get('quality', 'best'),
+            batch.priority,
+            audio=batch.options.get('audio'),
+            rate_limit=batch.options.get('rate_limit'),
+            traffic='bulk',
+        )
+        return result['download_id']
+    
+    batch.run(
+        expand=expand_batch_urls,
+        start_item=start_item,
+        get_progress=progress_snapshot,
+        cancel_item=scheduler.leave,
+        publish=lambda payload: progress_broker.publish(batch.id, payload),
+        wait=wait,
+    )
+
+@app.route('/api/download/batch', methods=['POST'])
+def download_batch():
+    """Queue a playlist or a list of URLs as one batch job"""
+    data = request.get_json() or {}
+    urls = data.get('urls') or ([data['url']] if data.get('url') else [])
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'url or urls is required'}), 400
+    if len(urls) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'At most {BATCH_MAX_ITEMS} URLs per batch'}), 400
+    try:
+        audio = parse_audio_request(data)
+        rate_limit = parse_rate_limit(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Batches whose progress has expired are no longer reachable
+    for batch_id in [b for b in batch_jobs if b not in download_progress]:
+        batch_jobs.pop(batch_id, None)
+    
+    batch = BatchJob(
+        urls,
+        {'format': data.get('format', 'video'), 'quality': data.get('quality', 'best'), 'audio': audio,
+         'rate_limit': rate_limit},
+        parallelism=int(data.get('parallelism', BATCH_DOWNLOAD_PARALLELISM)),
+        priority=int(data.get('priority', DEFAULT_PRIORITY)),
+    )
+    batch_jobs[batch.id] = batch
+    progress_broker.publish(batch.id, batch.summary())
+    threading.Thread(target=run_batch, args=(batch,), name=f'batch-{batch.id[:8]}', daemon=True).start()
+    
+    return jsonify({
+        'success': True,
+        'download_id': batch.id,
+        'status': batch.status,
+        'progress_url': f'/api/progress/{batch.id}'
+    })
+
+@app.route('/api/download/batch/<batch_id>/archive', methods=['GET'])
+def download_batch_archive(batch_id):
+    """Stream a finished batch's files as one ZIP archive"""
+    # Read from the published progress, so any process sharing it can answer
+    batch = download_progress.get(batch_id)
+    if batch is None or batch.get('type') != 'batch':
+        return jsonify({'error': 'Batch not found'}), 404
+    if batch['status'] != 'completed':
+        return jsonify({'error': 'Batch is not finished', 'status': batch['status']}), 409
+    
+    entries = []
+    for item in batch['items']:
+        if item['status'] != 'completed':
+            continue
+        entry = content_store.get_by_file(item['download_url'].rsplit('/', 1)[-1])
+        if entry is not None:
+            storage.record_access(entry['key'])
+            entries.append(entry)
+    if not entries:
+        return jsonify({'error': 'No files left to archive'}), 410
+    
+    names = unique_names([entry['display_name'] for entry in entries])
+    members = [(content_store.path_for(entry), name) for entry, name in zip(entries, names)]
+    return pin_while_sending([entry['key'] for entry in entries], Response(
+        stream_with_context(iter_zip(members)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f"attachment; filename*=UTF-8''batch-{batch_id[:8]}.zip"},
+    ))
+
+def pin_while_sending(keys, response):
+    """Keep the artifacts a response reads from out of eviction until it has been sent"""
+    for key in keys:
+        storage.pin(key)
+    
+    def unpin():
+        for key in keys:
+            storage.unpin(key)
+    
+    response.call_on_close(unpin)
+    return response
+
+@app.route('/api/download/<download_id>', methods=['DELETE'])
+def cancel_download(download_id):
+    """Cancel a queued or running download or batch"""
+    batch = batch_jobs.get(download_id)
+    if batch is not None and batch.status in ('expanding', 'downloading'):
+        batch.cancel()
+        return jsonify({'success': True, 'download_id': download_id, 'status': 'cancelling'})
+    progress = download_progress.get(download_id, {})
+    if batch is None and progress.get('type') == 'batch' and progress['status'] in ('expanding', 'downloading'):
+        # Running in another server process, which checks the journal for this
+        scheduler.journal.request_cancel(download_id)
+        return jsonify({'success': True, 'download_id': download_id, 'status': 'cancelling'})
+    remaining = scheduler.leave(download_id)
+    if remaining is None:
+        return jsonify({'error': 'Download not found or already finished'}), 404
+    if remaining:
+        # Other clients joined this download; it keeps running for them
         return jsonify({
             'success': True,
             'download_id': download_id,
-            'message': 'Download started'
+            'status': download_progress.get(download_id, {}).get('status', 'queued'),
+            'clients': remaining
         })
-                
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'success': True,
+        'download_id': download_id,
+        'status': download_progress.get(download_id, {}).get('status', 'cancelling')
+    })
+
+@app.route('/api/thumbnail/<path:video_id>', methods=['GET'])
+def get_thumbnail(video_id):
+    """Serve a video's thumbnail, resized to the width in ?w= when given.
+
+    The image format comes from ?format= (webp or jpeg), or else from
+    whether the client's Accept header takes WebP.
+    """
+    width = request.args.get('w', type=int)
+    if width is not None and not 0 < width <= THUMBNAIL_MAX_WIDTH:
+        return jsonify({'error': f'w must be between 1 and {THUMBNAIL_MAX_WIDTH}'}), 400
+    fmt = request.args.get('format')
+    if fmt is not None and fmt not in THUMBNAIL_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(THUMBNAIL_FORMATS)}"}), 400
+    negotiated = fmt is None
+    if negotiated:
+        fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    
+    try:
+        path, etag, content_type = thumbnails.get(video_id, width, fmt)
+    except KeyError:
+        return jsonify({'error': 'Unknown video; request its info first'}), 404
+    except ThumbnailError as e:
+        return jsonify({'error': str(e)}), 502
+    
+    ext = mimetypes.guess_extension(content_type) or ''
+    return serve_file(
+        path,
+        'thumbnail' + ext,
+        etag=etag,
+        cache_control=f'public, max-age={THUMBNAIL_MAX_AGE}',
+        extra_headers={'Vary': 'Accept'} if negotiated and width else None,
+        inline=True,
+    )
 
 @app.route('/api/file/<filename>', methods=['GET'])
 def get_file(filename):
-    """Serve the downloaded file with streaming support"""
+    """Serve the downloaded file, or stream it by download ID while it downloads"""
     try:
+        entry = content_store.get_by_file(filename)
+        if entry is not None:
+            storage.record_access(entry['key'])
+            return pin_while_sending([entry['key']], serve_file(
+                content_store.path_for(entry),
+                entry['display_name'],
+                etag=entry['key'],
+                accel_mode=FILE_ACCEL_MODE,
+                accel_prefix=FILE_ACCEL_PREFIX,
+                extra_headers=digest_headers(entry),
+            ))
+        
+        if filename in download_progress:
+            return serve_download(filename)
+        
+        # Files downloaded before the content store existed
         filepath = os.path.join(DOWNLOAD_DIR, filename)
-        if os.path.exists(filepath):
-            # Enable streaming for large files
-            return send_file(
+        if not filename.startswith(INDEX_FILENAME) and os.path.exists(filepath):
+            stat = os.stat(filepath)
+            return serve_file(
                 filepath,
-                as_attachment=True,
-                download_name=filename,
-                conditional=True,
-                max_age=0
+                filename,
+                etag=f'{stat.st_size:x}-{int(stat.st_mtime):x}',
+                accel_mode=FILE_ACCEL_MODE,
+                accel_prefix=FILE_ACCEL_PREFIX,
             )
         else:
             return jsonify({'error': 'File not found'}), 404
     except Exception as e:
-        print(f"Error serving file: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/progress/<video_id>', methods=['GET'])
-def get_progress(video_id):
-    """Get download progress for a specific video"""
-    if video_id in download_progress:
-        progress_data = download_progress[video_id].copy()
-        # Add download URL if completed
-        if progress_data.get('status') == 'completed' and 'filename' in progress_data:
-            progress_data['download_url'] = f'/api/file/{progress_data["filename"]}'
-        return jsonify(progress_data)
-    else:
-        return jsonify({'status': 'not_found'}), 404
+def serve_download(download_id):
+    """Serve a download by ID: the finished file, or its bytes so far while it runs"""
+    progress = download_progress[download_id]
+    if progress['status'] == 'completed':
+        return get_file(progress['download_url'].rsplit('/', 1)[-1])
+    
+    live = live_files.get(download_id)
+    if live is None and progress.get('stream_file'):
+        # Downloading in another server process into the shared directory
+        filename = os.path.join(DOWNLOAD_DIR, os.path.basename(progress['stream_file']))
+        live = LiveFile(filename + '.part', filename, progress.get('filename') or progress['stream_file'],
+                        progress.get('total_bytes'))
+    if live is None:
+        return jsonify({
+            'error': 'File is not ready and cannot be streamed yet',
+            'status': progress['status']
+        }), 409
+    
+    def status():
+        return download_progress.get(download_id, {}).get('status', 'not_found')
+    
+    headers = {
+        'Content-Disposition': f"attachment; filename*=UTF-8''{quote(live.display_name)}",
+        'Cache-Control': 'no-store',
+    }
+    if live.total_bytes:
+        headers['Content-Length'] = str(live.total_bytes)
+    return limited_stream(lambda: Response(
+        stream_with_context(follow(live, status)),
+        mimetype=mimetypes.guess_type(live.filename)[0] or 'application/octet-stream',
+        headers=headers,
+    ))
+
+def limited_stream(build):
+    """The long-lived response from build(), or 503 when this process has no stream slot left"""
+    if not stream_slots.acquire():
+        return jsonify({
+            'error': 'Too many open streams; poll /api/progress and fetch the finished file instead'
+        }), 503, {'Retry-After': '5'}
+    try:
+        response = build()
+    except Exception:
+        stream_slots.release()
+        raise
+    response.call_on_close(stream_slots.release)
+    return response
+
+def progress_snapshot(download_id):
+    """Current progress for a download, including its live queue position"""
+    progress = download_progress.get(download_id)
+    if progress is None:
+        return {'status': 'not_found'}
+    progress = dict(progress)
+    if progress['status'] == 'queued':
+        progress['queue_position'] = scheduler.queue_position(download_id)
+    return progress
+
+def progress_event_stream(download_ids):
+    """Server-Sent Events response for one or more downloads"""
+    return limited_stream(lambda: Response(
+        stream_with_context(progress_broker.stream(download_ids, progress_snapshot)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # Keep proxies from buffering events
+        },
+    ))
+
+@app.route('/api/progress/<download_id>', methods=['GET'])
+def get_progress(download_id):
+    """Get progress for a specific download"""
+    progress = progress_snapshot(download_id)
+    if progress['status'] == 'not_found':
+        return jsonify(progress), 404
+    return jsonify(progress)
+
+@app.route('/api/progress/<download_id>/stream', methods=['GET'])
+def stream_progress(download_id):
+    """Push progress for one download until it finishes"""
+    return progress_event_stream([download_id])
+
+@app.route('/api/progress/stream', methods=['GET'])
+def stream_progress_many():
+    """Push progress for several downloads: /api/progress/stream?ids=a,b,c"""
+    download_ids = [i for i in request.args.get('ids', '').split(',') if i]
+    if not download_ids:
+        return jsonify({'error': 'ids is required'}), 400
+    return progress_event_stream(download_ids)
+
+@app.route('/api/capabilities', methods=['GET'])
+def get_capabilities():
+    """Report the cached ffmpeg/ffprobe capabilities"""
+    return jsonify(ffmpeg_caps.snapshot())
+
+@app.route('/api/capabilities/refresh', methods=['POST'])
+def refresh_capabilities():
+    """Probe ffmpeg again, e.g. after installing or upgrading it"""
+    return jsonify(ffmpeg_caps.refresh())
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -336,7 +1436,19 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'downloads_dir': DOWNLOAD_DIR,
-        'active_downloads': len(download_progress)
+        'active_downloads': sum(
+            1 for progress in list(download_progress.values())
+            if progress.get('status') not in TERMINAL_STATUSES
+        ),
+        'metadata_cache': metadata_cache.stats(),
+        'queue': scheduler.stats(),
+        'batches': sum(1 for b in list(batch_jobs.values()) if b.status in ('expanding', 'downloading')),
+        'content_store': content_store.stats(),
+        'storage': storage.stats(),
+        'progress_store': download_progress.stats(),
+        'progress_subscribers': progress_broker.subscribers,
+        'streams': {'open': stream_slots.active, 'limit': STREAM_LIMIT, 'rejected': stream_slots.rejected},
+        'ffmpeg': ffmpeg_caps.snapshot()['available']
     })
 
 if __name__ == '__main__':
@@ -346,4 +1458,9 @@ if __name__ == '__main__':
     print(f"Download directory: {DOWNLOAD_DIR}")
     print("Server running on http://localhost:5000")
     print("=" * 50)
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Exit through atexit on SIGTERM so running downloads can drain
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # With the reloader on, only the child process that serves requests runs workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+    app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,212 @@
+"""
+Audio downloads without needless transcoding.
+
+Clients list the audio codecs they can play, in order of preference. The
+format selector asks yt-dlp for a source already in one of them, and after
+the download the file is only touched as much as needed:
+
+    keep       the file is already an accepted codec in its own container
+    remux      accepted codec in another container (e.g. Opus in WebM, AAC
+               in MP4 with video): stream copy into the codec's container
+    transcode  nothing accepted was available: re-encode into the first
+               accepted codec ffmpeg can encode
+
+Transcodes are CPU-bound, so they run as ffmpeg processes behind a bounded
+TranscodePool at a lower scheduling priority, optionally pinned to a set of
+CPUs, instead of competing with request handling.
+"""
+
+import os
+import re
+import subprocess
+import threading
+
+# codec: (yt-dlp acodec filter, container extension, ffmpeg encoder)
+AUDIO_CODECS = {
+    'aac': ('acodec^=mp4a', 'm4a', 'aac'),
+    'opus': ('acodec=opus', 'opus', 'libopus'),
+    'vorbis': ('acodec=vorbis', 'ogg', 'libvorbis'),
+    'mp3': ('acodec=mp3', 'mp3', 'libmp3lame'),
+}
+DEFAULT_BITRATE = 192  # kbps for transcodes
+MIN_BITRATE, MAX_BITRATE = 32, 320
+
+_STREAM_RE = re.compile(r'Stream #\d+:\d+.*?: (Audio|Video): (\w+)')
+
+
+class AudioError(Exception):
+    """ffmpeg could not remux or transcode the audio"""
+
+
+class AudioCancelled(Exception):
+    """The conversion was cancelled while ffmpeg was running"""
+
+
+def parse_codecs(value):
+    """Accepted codecs from a request: a list or comma-separated string.
+
+    Raises ValueError for unknown codecs.
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    codecs = []
+    for codec in value:
+        codec = str(codec).strip().lower()
+        if codec == 'm4a':
+            codec = 'aac'
+        if codec not in AUDIO_CODECS:
+            raise ValueError(f"Unknown audio codec '{codec}'; expected one of {', '.join(AUDIO_CODECS)}")
+        if codec not in codecs:
+            codecs.append(codec)
+    if not codecs:
+        raise ValueError('At least one audio codec is required')
+    return codecs
+
+
+def parse_bitrate(value):
+    """Transcode bitrate in kbps from a request; raises ValueError when out of range"""
+    bitrate = int(value)
+    if not MIN_BITRATE <= bitrate <= MAX_BITRATE:
+        raise ValueError(f'audio_bitrate must be between {MIN_BITRATE} and {MAX_BITRATE} kbps')
+    return bitrate
+
+
+def format_selector(codecs):
+    """yt-dlp format selector preferring audio-only sources in an accepted codec"""
+    choices = [f'bestaudio[{AUDIO_CODECS[codec][0]}]' for codec in codecs]
+    return '/'.join(choices + ['bestaudio', 'best'])
+
+
+def probe_audio(ffmpeg, path):
+    """Audio codec of a local file and whether it also has video"""
+    try:
+        result = subprocess.run([ffmpeg, '-hide_banner', '-nostdin', '-i', path],
+                                capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise AudioError(f'Could not probe the audio: {e}')
+    streams = _STREAM_RE.findall(result.stderr)
+    audio = next((codec for kind, codec in streams if kind == 'Audio'), None)
+    if audio is None:
+        raise AudioError('The download has no audio stream')
+    return audio, any(kind == 'Video' for kind, _ in streams)
+
+
+def plan(codec, has_video, ext, codecs, can_encode=None):
+    """Decide what to do with a downloaded file.
+
+    Returns (action, target codec) with action 'keep', 'remux' or
+    'transcode'. Raises AudioError when no accepted codec can be encoded.
+    """
+    if codec in codecs:
+        if not has_video and ext == AUDIO_CODECS[codec][1]:
+            return 'keep', codec
+        return 'remux', codec
+    for target in codecs:
+        if can_encode is None or can_encode(AUDIO_CODECS[target][2]):
+            return 'transcode', target
+    raise AudioError(f"ffmpeg can't encode any of {', '.join(codecs)}")
+
+
+def _lower_priority(nice, cpus):
+    """preexec_fn for transcodes (POSIX only)"""
+    def apply():
+        if nice:
+            os.nice(nice)
+        if cpus and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)
+    return apply
+
+
+def parse_cpus(spec):
+    """CPU set from '0,2' or '2-3' style lists; empty means unrestricted"""
+    cpus = set()
+    for part in filter(None, (p.strip() for p in (spec or '').split(','))):
+        low, _, high = part.partition('-')
+        cpus.update(range(int(low), int(high or low) + 1))
+    return cpus
+
+
+def _run(cmd, cancelled=None, **popen_args):
+    try:
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True, **popen_args)
+    except OSError as e:
+        raise AudioError(f'Could not start ffmpeg: {e}')
+    # Drain stderr on a thread so a chatty ffmpeg can't block on a full pipe
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    try:
+        while True:
+            try:
+                returncode = process.wait(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                if cancelled is not None and cancelled():
+                    raise AudioCancelled()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        reader.join()
+    if returncode != 0:
+        output = ''.join(stderr).strip()
+        raise AudioError(output.splitlines()[-1] if output else 'ffmpeg failed')
+
+
+class TranscodePool:
+    """At most `workers` ffmpeg transcodes at once, niced and optionally pinned to cpus"""
+
+    def __init__(self, workers, nice=10, cpus=None):
+        self.workers = workers
+        self.nice = nice
+        self.cpus = cpus or set()
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+
+    def run(self, cmd, cancelled=None):
+        """Run cmd once a slot is free; raises AudioError or AudioCancelled"""
+        with self._lock:
+            self.waiting += 1
+        try:
+            while not self._slots.acquire(timeout=0.5):
+                if cancelled is not None and cancelled():
+                    raise AudioCancelled()
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        with self._lock:
+            self.active += 1
+        try:
+            _run(cmd, cancelled, **self._popen_args())
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def _popen_args(self):
+        if os.name == 'nt':
+            return {'creationflags': subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+        return {'preexec_fn': _lower_priority(self.nice, self.cpus)}
+
+
+def convert(ffmpeg, source, output, action, codec, bitrate=DEFAULT_BITRATE, pool=None, cancelled=None):
+    """Remux or transcode source into output.
+
+    Remuxes are cheap stream copies and run directly; transcodes go through
+    pool when one is given.
+    """
+    cmd = [ffmpeg, '-hide_banner', '-nostdin', '-y', '-i', source, '-map', '0:a:0', '-vn']
+    if action == 'remux':
+        cmd += ['-c:a', 'copy']
+    else:
+        cmd += ['-c:a', AUDIO_CODECS[codec][2], '-b:a', f'{bitrate}k']
+    if AUDIO_CODECS[codec][1] == 'm4a':
+        cmd += ['-movflags', '+faststart']
+    cmd.append(output)
+    if action == 'transcode' and pool is not None:
+        pool.run(cmd, cancelled)
+    else:
+        _run(cmd, cancelled)
@@ -0,0 +1,164 @@
+"""
+Shared download bandwidth.
+
+Concurrent yt-dlp downloads otherwise compete blindly for one uplink.
+BandwidthManager splits a global cap between the active jobs by weighted
+fair share: interactive jobs (clips, urgent requests) weigh more than
+normal downloads, which weigh more than bulk playlist items. Allocations
+adapt to what each job actually achieves: a job held back by its origin is
+capped just above its measured throughput and the rest of its share goes to
+jobs that can use it. Every job also honours its own limit, if it has one.
+
+Each job's allocation is enforced by a token bucket fed from its progress
+hook (JobShare.consume), which returns how long the download should pause.
+yt-dlp's own ratelimit paces against the average since a transfer started,
+so changing it mid-download would stall a job after a cut and let it burst
+after a raise.
+"""
+
+import threading
+import time
+
+# Relative share of the global cap per traffic class
+CLASS_WEIGHTS = {'interactive': 4, 'normal': 2, 'bulk': 1}
+MIN_RATE = 64 * 1024  # bytes/s any active job is allowed, so none starves
+REBALANCE_INTERVAL = 1.0  # seconds between reallocations
+BURST_SECONDS = 0.5  # bucket depth in seconds of the job's rate
+_SAMPLE_SECONDS = 0.5  # throughput measurement window
+_SMOOTHING = 0.3  # weight of the newest throughput sample
+
+
+class JobShare:
+    """One job's slice of the bandwidth and its measured throughput"""
+
+    def __init__(self, manager, job_id, traffic_class, limit=None, metered=True):
+        self.manager = manager
+        self.job_id = job_id
+        self.traffic_class = traffic_class
+        self.weight = CLASS_WEIGHTS.get(traffic_class, CLASS_WEIGHTS['normal'])
+        self.limit = limit
+        # Unmetered jobs (ffmpeg clips) can't be paced; their share is reserved
+        self.metered = metered
+        self.rate = None  # allocated bytes/s, None for unlimited
+        self.throughput = 0.0  # smoothed bytes/s
+        self.started = time.monotonic()
+        self._seen = None  # last cumulative byte count
+        self._tokens = 0.0
+        self._refilled = self.started
+        self._sample_bytes = 0
+        self._sample_start = self.started
+
+    def consume(self, downloaded_bytes):
+        """Account for a cumulative byte count; returns seconds to pause for"""
+        if downloaded_bytes is None:
+            return 0
+        with self.manager._lock:
+            if self._seen is None:
+                # A resumed download starts counting at its partial file's size
+                self._seen = downloaded_bytes
+                self._refilled = time.monotonic()
+                return 0
+            delta = max(downloaded_bytes - self._seen, 0)
+            self._seen = max(downloaded_bytes, self._seen)
+            now = time.monotonic()
+            self._measure(delta, now)
+            self.manager._maybe_rebalance(now)
+            return self._pace(delta, now)
+
+    def _measure(self, delta, now):
+        self._sample_bytes += delta
+        elapsed = now - self._sample_start
+        if elapsed >= _SAMPLE_SECONDS:
+            sample = self._sample_bytes / elapsed
+            self.throughput = sample if not self.throughput else (
+                _SMOOTHING * sample + (1 - _SMOOTHING) * self.throughput)
+            self._sample_bytes = 0
+            self._sample_start = now
+
+    def _pace(self, delta, now):
+        if self.rate is None:
+            return 0
+        self._tokens = min(self._tokens + (now - self._refilled) * self.rate, self.rate * BURST_SECONDS)
+        self._refilled = now
+        self._tokens -= delta
+        return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def _demand(self):
+        """Bytes/s the job could use; infinite unless it is clearly held back elsewhere"""
+        demand = self.limit or float('inf')
+        if (self.metered and self.rate is not None and self.throughput
+                and time.monotonic() - self.started >= 2 * _SAMPLE_SECONDS
+                and self.throughput < 0.8 * self.rate):
+            demand = min(demand, max(self.throughput * 1.25, MIN_RATE))
+        return demand
+
+
+class BandwidthManager:
+    """Weighted fair sharing of a global download rate cap between jobs.
+
+    total_limit is the cap in bytes/s (None or 0 for none); job_limit caps
+    every job, on top of any limit given when the job registers.
+    """
+
+    def __init__(self, total_limit=None, job_limit=None):
+        self.total_limit = total_limit or None
+        self.job_limit = job_limit or None
+        self._lock = threading.Lock()
+        self._shares = {}
+        self._rebalanced = 0.0
+
+    def register(self, job_id, traffic_class='normal', limit=None, metered=True):
+        """Start sharing bandwidth with a job; returns its JobShare"""
+        limits = [value for value in (limit, self.job_limit) if value]
+        share = JobShare(self, job_id, traffic_class, min(limits) if limits else None, metered)
+        with self._lock:
+            self._shares[job_id] = share
+            self._rebalance(time.monotonic())
+        return share
+
+    def unregister(self, job_id):
+        with self._lock:
+            if self._shares.pop(job_id, None) is not None:
+                self._rebalance(time.monotonic())
+
+    def snapshot(self):
+        """Allocated rate and measured throughput of every active job"""
+        with self._lock:
+            return {
+                job_id: {'class': share.traffic_class, 'rate': share.rate, 'throughput': share.throughput}
+                for job_id, share in self._shares.items()
+            }
+
+    def total_throughput(self):
+        with self._lock:
+            return sum(share.throughput for share in self._shares.values())
+
+    def _maybe_rebalance(self, now):
+        if now - self._rebalanced >= REBALANCE_INTERVAL:
+            self._rebalance(now)
+
+    def _rebalance(self, now):
+        """Water-fill the cap.
+
+        Jobs that need less than their weighted share get what they need and
+        the remainder is split among the rest, by weight.
+        """
+        self._rebalanced = now
+        shares = list(self._shares.values())
+        if self.total_limit is None:
+            for share in shares:
+                share.rate = share.limit
+            return
+
+        remaining = float(self.total_limit)
+        unsettled = {share: share._demand() for share in shares}
+        while unsettled:
+            per_weight = remaining / sum(share.weight for share in unsettled)
+            settled = [share for share, demand in unsettled.items() if demand <= per_weight * share.weight]
+            if not settled:
+                for share in unsettled:
+                    share.rate = max(per_weight * share.weight, MIN_RATE)
+                break
+            for share in settled:
+                share.rate = max(unsettled.pop(share), MIN_RATE)
+                remaining = max(remaining - share.rate, 0)
@@ -0,0 +1,72 @@
+"""
+Concurrent metadata extraction for many URLs at once.
+
+Input URLs are resolved in parallel (with bounded parallelism); playlist
+URLs are expanded into their entries, which are resolved the same way.
+Results are yielded as soon as each one completes, so the HTTP layer can
+stream them back as NDJSON. A failing item yields an error result instead
+of failing the batch. If the consumer stops early (e.g. the client
+disconnects), extractions that have not started are cancelled.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def iter_batch(urls, resolve, extract, parallelism=4, max_items=200):
+    """Yield one result dict per video, in completion order.
+
+    resolve(url) returns ('playlist', playlist_info, entry_urls) or
+    ('video', info, None). extract(url) returns the info dict of one video.
+    Every result carries the index of the input URL it came from.
+    """
+    submitted = len(urls)
+    pool = ThreadPoolExecutor(parallelism, thread_name_prefix='batch')
+    pending = {}
+    try:
+        for index, url in enumerate(urls):
+            pending[pool.submit(resolve, url)] = ('resolve', index, url, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, index, url, playlist = pending.pop(future)
+                result = {'index': index, 'url': url}
+                if playlist is not None:
+                    result['playlist'] = playlist
+
+                try:
+                    value = future.result()
+                except Exception as e:
+                    result['error'] = str(e) or type(e).__name__
+                    yield result
+                    continue
+
+                if kind == 'extract':
+                    result['info'] = value
+                    yield result
+                    continue
+
+                resolved_kind, info, entry_urls = value
+                if resolved_kind == 'video':
+                    result['info'] = info
+                    yield result
+                    continue
+
+                # Announce the playlist, then resolve its entries
+                yield dict(result, playlist={'id': info.get('id'), 'title': info.get('title'),
+                                             'count': len(entry_urls)})
+                for position, entry_url in enumerate(entry_urls, 1):
+                    if submitted >= max_items:
+                        yield {'index': index, 'url': entry_url,
+                               'error': f'Batch limit of {max_items} videos reached'}
+                        break
+                    submitted += 1
+                    pending[pool.submit(extract, entry_url)] = (
+                        'extract', index, entry_url, {'id': info.get('id'), 'index': position}
+                    )
+    finally:
+        # Also reached when the client disconnects and the generator is
+        # closed: drop queued work and don't wait for running extractions
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
@@ -0,0 +1,225 @@
+"""
+Batch downloads: many videos (a URL list and/or playlists) under one job ID.
+
+A BatchJob expands its URLs into items and keeps at most `parallelism` of
+them downloading at a time; each item is an ordinary download going through
+the shared scheduler, so worker and per-host limits still apply. The batch
+publishes one aggregate progress record listing every item, and its
+finished files can be sent as a single ZIP archive that is streamed while
+it is written.
+"""
+
+import io
+import os
+import threading
+import time
+import uuid
+import zipfile
+
+from download_queue import DEFAULT_PRIORITY
+from progress_stream import TERMINAL_STATUSES
+
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+
+class BatchJob:
+    """A group of downloads reported and cancelled as one job"""
+
+    def __init__(self, urls, options=None, parallelism=3, priority=DEFAULT_PRIORITY, batch_id=None):
+        self.id = batch_id or uuid.uuid4().hex
+        self.urls = list(urls)
+        self.options = options or {}
+        self.parallelism = max(1, parallelism)
+        self.priority = priority
+        self.created_at = time.time()
+        self.status = 'expanding'
+        self.error = None
+        self.items = []
+        self.cancel_event = threading.Event()
+        self._active = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def summary(self):
+        """Aggregate progress payload with per-item detail"""
+        with self._lock:
+            items = [dict(item) for item in self.items]
+        counts = {'completed': 0, 'error': 0, 'cancelled': 0}
+        total_progress = 0.0
+        for item in items:
+            if item['status'] in counts:
+                counts[item['status']] += 1
+            total_progress += 100 if item['status'] in TERMINAL_STATUSES else item.get('progress') or 0
+
+        payload = {
+            'status': self.status,
+            'type': 'batch',
+            'progress': round(total_progress / len(items), 1) if items else 0,
+            'total': len(items),
+            'completed': counts['completed'],
+            'failed': counts['error'],
+            'cancelled': counts['cancelled'],
+            'items': items,
+        }
+        if self.error:
+            payload['error'] = self.error
+        if self.status == 'completed':
+            payload['download_url'] = f'/api/download/batch/{self.id}/archive'
+        return payload
+
+    def run(self, expand, start_item, get_progress, cancel_item, publish, wait):
+        """Drive the batch to completion on the calling thread.
+
+        expand(urls) returns the video URLs to download; start_item(url)
+        returns the download_id for one of them, which may be a download
+        other clients wait for too; get_progress(id) reads an item;
+        cancel_item(id) withdraws the batch from an item, which cancels it
+        unless other clients still wait for it (then it returns a true
+        value); publish(payload) records the batch's progress; wait(seq,
+        timeout) blocks until any progress changes and returns the new
+        sequence number.
+        """
+        try:
+            urls = expand(self.urls)
+        except Exception as e:
+            self.status, self.error = 'error', str(e) or type(e).__name__
+            publish(self.summary())
+            return
+
+        with self._lock:
+            self.items = [{'index': i, 'url': url, 'download_id': None, 'status': 'pending', 'progress': 0}
+                          for i, url in enumerate(urls)]
+        self.status = 'downloading'
+        next_index = 0
+        seq = 0
+        last_payload = None
+        withdrawn = False
+
+        while True:
+            self._refresh(get_progress)
+
+            if self.cancelled and not withdrawn:
+                withdrawn = True
+                for index in sorted(self._active):
+                    if cancel_item(self.items[index]['download_id']):
+                        # Still running for other clients; the batch no longer waits for it
+                        with self._lock:
+                            self.items[index]['status'] = 'cancelled'
+                            self._active.discard(index)
+                with self._lock:
+                    for item in self.items[next_index:]:
+                        item['status'] = 'cancelled'
+                    next_index = len(self.items)
+
+            while len(self._active) < self.parallelism and next_index < len(self.items):
+                item = self.items[next_index]
+                try:
+                    download_id = start_item(item['url'])
+                except Exception as e:
+                    with self._lock:
+                        item.update(status='error', error=str(e) or type(e).__name__)
+                else:
+                    with self._lock:
+                        item.update(download_id=download_id, status='queued')
+                        self._active.add(next_index)
+                next_index += 1
+
+            if not self._active and next_index >= len(self.items):
+                break
+
+            payload = self.summary()
+            if payload != last_payload:
+                last_payload = payload
+                publish(payload)
+            seq = wait(seq, 1.0)
+
+        if self.cancelled:
+            self.status = 'cancelled'
+        elif self.items and all(item['status'] == 'error' for item in self.items):
+            self.status = 'error'
+            self.error = 'Every item in the batch failed'
+        else:
+            self.status = 'completed'
+        publish(dict(self.summary(), finished_at=time.time()))
+
+    def _refresh(self, get_progress):
+        with self._lock:
+            for index in list(self._active):
+                item = self.items[index]
+                progress = get_progress(item['download_id'])
+                item['status'] = progress.get('status', 'not_found')
+                item['progress'] = progress.get('progress', item['progress'])
+                for field in ('filename', 'title', 'download_url', 'error'):
+                    if field in progress:
+                        item[field] = progress[field]
+                if item['status'] in TERMINAL_STATUSES:
+                    if item['status'] == 'not_found':
+                        item['status'] = 'error'
+                    self._active.discard(index)
+
+
+class _ZipOutput(io.RawIOBase):
+    """Write-only sink that hands the archive out in pieces as it is written"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_names(names):
+    """Make archive member names unique by numbering repeats"""
+    seen = set()
+    result = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate in seen:
+            n += 1
+            candidate = f'{stem} ({n}){ext}'
+        seen.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def iter_zip(members, chunk_size=ZIP_CHUNK_SIZE):
+    """Yield a ZIP archive of (path, arcname) members without buffering it whole.
+
+    Media is already compressed, so members are stored rather than
+    deflated; sizes go in data descriptors since the output can't seek.
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for path, arcname in members:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, 'rb') as source, archive.open(info, 'w', force_zip64=True) as target:
+                while True:
+                    chunk = source.read(chunk_size)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    yield output.drain()
+            yield output.drain()
+    yield output.drain()
@@ -0,0 +1,292 @@
+"""
+End-to-end API benchmark against a local fake media origin.
+
+Starts benchmarks/fake_origin.py in-process and the backend in a child
+process (with its own downloads directory and journal), then drives
+/api/info, /api/formats, /api/download, /api/progress and /api/file at the
+requested concurrency. Reports p50/p99 latency, throughput and the server's
+peak RSS, and appends the results, tagged with the current git commit, to a
+JSON-lines file so runs can be compared across commits.
+
+Usage (from the backend directory):
+    python benchmarks/bench_api.py --videos 20 --concurrency 8
+    python benchmarks/bench_api.py --server gunicorn --compare
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_origin import FakeOrigin  # noqa: E402
+
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, 'results', 'bench_api.jsonl')
+FINAL_STATUSES = ('completed', 'error', 'cancelled', 'not_found')
+
+
+def run_server(workdir, port, server, env):
+    # yt-dlp's download progress would drown out the report
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.chdir(workdir)
+    os.environ.update(env)
+    sys.path.insert(0, BACKEND_DIR)
+    import app
+
+    if server == 'gunicorn':
+        from gunicorn.app.base import BaseApplication
+
+        class Server(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f'127.0.0.1:{port}')
+                self.cfg.set('workers', 1)
+                self.cfg.set('worker_class', 'gthread')
+                self.cfg.set('threads', 32)
+                self.cfg.set('loglevel', 'warning')
+
+            def load(self):
+                return app.app
+
+        Server().run()
+    else:
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        app.start_background_services()
+        make_server('127.0.0.1', port, app.app, threaded=True).serve_forever()
+
+
+class Recorder:
+    """Latencies and outcomes of one scenario's requests"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.bytes = 0
+
+    def request(self, url, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as response:
+                payload = response.read()
+                self.bytes += len(payload)
+        except (urllib.error.URLError, OSError):
+            self.errors += 1
+            return None
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+        return payload
+
+    def request_json(self, url, body=None):
+        payload = self.request(url, body)
+        return json.loads(payload) if payload is not None else None
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        result = {'requests': len(latencies), 'errors': self.errors}
+        if latencies:
+            result['p50_ms'] = round(statistics.median(latencies) * 1000, 1)
+            result['p99_ms'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1)
+            result['rps'] = round(len(latencies) / elapsed, 1)
+        if self.bytes > 1e6:
+            result['mb_per_s'] = round(self.bytes / elapsed / 1e6, 1)
+        return result
+
+
+def run_scenario(name, concurrency, items, work):
+    """Run work(recorder, item) for every item; returns the scenario summary.
+
+    work may return a per-item duration in seconds, which is summarized too.
+    """
+    recorder = Recorder()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        extra = [r for r in pool.map(lambda item: work(recorder, item), items) if isinstance(r, float)]
+    elapsed = time.perf_counter() - started
+    summary = recorder.summary(elapsed)
+    if extra:
+        # Per-item wall times, e.g. from queueing a download until it completes
+        extra.sort()
+        summary['item_p50_s'] = round(statistics.median(extra), 3)
+        summary['item_p99_s'] = round(extra[min(len(extra) - 1, int(len(extra) * 0.99))], 3)
+    summary['wall_s'] = round(elapsed, 2)
+    print(f'  {name:<22} {json.dumps(summary)}')
+    return summary
+
+
+def download_until_done(api, progress, url, poll_interval, completed):
+    """Queue a download and poll it to the end; returns seconds to completion"""
+    start = time.perf_counter()
+    response = progress.request_json(f'{api}/api/download', {'url': url})
+    if not response or 'download_id' not in response:
+        return None
+    download_id = response['download_id']
+    status = response.get('status')
+    while status not in FINAL_STATUSES:
+        time.sleep(poll_interval)
+        state = progress.request_json(f'{api}/api/progress/{download_id}')
+        if state is None:
+            return None
+        status = state.get('status')
+        response = state
+    if status != 'completed':
+        progress.errors += 1
+        return None
+    completed.append(response['download_url'])
+    return time.perf_counter() - start
+
+
+def peak_rss_mb(process):
+    """Peak RSS of the finished server process tree, where the platform reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    process.join(timeout=30)
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BACKEND_DIR,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def compare(previous, current):
+    """Print the change of each scenario metric against an earlier run"""
+    print(f'\nCompared with {previous["commit"]} ({previous["timestamp"]}):')
+    for name, summary in current['scenarios'].items():
+        before = previous['scenarios'].get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in ('p50_ms', 'p99_ms', 'item_p50_s', 'rps', 'mb_per_s'):
+            if metric in summary and before.get(metric):
+                change = (summary[metric] - before[metric]) / before[metric] * 100
+                changes.append(f'{metric} {before[metric]} -> {summary[metric]} ({change:+.0f}%)')
+        print(f'  {name:<22} ' + ', '.join(changes))
+    if previous.get('server_peak_rss_mb') and current.get('server_peak_rss_mb'):
+        print(f'  {"server_peak_rss_mb":<22} {previous["server_peak_rss_mb"]} -> {current["server_peak_rss_mb"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--videos', type=int, default=20, help='distinct videos per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--size-mb', type=float, default=8, help='size of each synthetic video')
+    parser.add_argument('--origin-rate-mbps', type=float, default=None,
+                        help='per-connection origin bandwidth limit in MB/s')
+    parser.add_argument('--poll-interval', type=float, default=0.1)
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug')
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--results', default=DEFAULT_RESULTS, help='JSON-lines file results are appended to')
+    parser.add_argument('--compare', action='store_true', help='compare with the last run of another commit')
+    args = parser.parse_args()
+
+    origin = FakeOrigin(media_bytes=int(args.size_mb * 1024 * 1024),
+                        rate=args.origin_rate_mbps * 1e6 if args.origin_rate_mbps else None).start()
+    run = uuid.uuid4().hex[:6]
+    api = f'http://127.0.0.1:{args.port}'
+    scenarios = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        env = {
+            'JOB_JOURNAL_PATH': os.path.join(workdir, 'jobs.db'),
+            'DOWNLOAD_WORKERS': str(args.concurrency),
+            'DOWNLOAD_HOST_LIMIT': str(args.concurrency),
+            # Synthetic media can't be merged or converted
+            'FFMPEG_PATH': 'none',
+        }
+        server = multiprocessing.Process(target=run_server, args=(workdir, args.port, args.server, env),
+                                         daemon=True)
+        server.start()
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f'{api}/api/health', timeout=2).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        print(f'{args.server}: {args.videos} videos, concurrency {args.concurrency}, {args.size_mb} MB each')
+        try:
+            pages = [origin.page_url(f'{run}-info-{i}') for i in range(args.videos)]
+            scenarios['info_cold'] = run_scenario(
+                'info_cold', args.concurrency, pages,
+                lambda rec, url: rec.request(f'{api}/api/info', {'url': url}))
+            scenarios['info_warm'] = run_scenario(
+                'info_warm', args.concurrency, pages * 5,
+                lambda rec, url: rec.request(f'{api}/api/info', {'url': url}))
+            scenarios['formats'] = run_scenario(
+                'formats', args.concurrency, pages,
+                lambda rec, url: rec.request(f'{api}/api/formats', {'url': url}))
+
+            completed = []
+            scenarios['download_progressive'] = run_scenario(
+                'download_progressive', args.concurrency,
+                [origin.page_url(f'{run}-dl-{i}') for i in range(args.videos)],
+                lambda rec, url: download_until_done(api, rec, url, args.poll_interval, completed))
+            scenarios['download_hls'] = run_scenario(
+                'download_hls', args.concurrency,
+                [origin.hls_url(f'{run}-hls-{i}') for i in range(args.videos)],
+                lambda rec, url: download_until_done(api, rec, url, args.poll_interval, completed))
+            scenarios['file'] = run_scenario(
+                'file', args.concurrency, completed,
+                lambda rec, path: rec.request(f'{api}{path}'))
+        finally:
+            server.terminate()
+            rss = peak_rss_mb(server)
+            origin.stop()
+
+    print(f'  server peak RSS: {rss} MB')
+    result = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': {k: v for k, v in vars(args).items() if k not in ('results', 'compare', 'port')},
+        'scenarios': scenarios,
+        'server_peak_rss_mb': rss,
+    }
+
+    previous = []
+    if os.path.exists(args.results):
+        with open(args.results, encoding='utf-8') as f:
+            previous = [json.loads(line) for line in f if line.strip()]
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result) + '\n')
+    print(f'Results appended to {args.results}')
+
+    if args.compare:
+        others = [r for r in previous if r['commit'] != result['commit'] and r['args'] == result['args']]
+        if others:
+            compare(others[-1], result)
+        else:
+            print('No earlier run of another commit with the same arguments to compare with')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Throughput benchmark for /api/file serving.
+
+Compares Flask's send_file (the previous serving path) with
+file_serving.serve_file under concurrency, for full-file and ranged reads.
+The server runs in a child process so its CPU time can be reported
+separately from the load generator.
+
+Usage (from the backend directory):
+    python benchmarks/bench_file_serving.py --size-mb 200 --concurrency 8
+    python benchmarks/bench_file_serving.py --server gunicorn   # needs gunicorn
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FILENAME = 'bench.mp4'
+
+
+def build_app(directory):
+    from flask import Flask, jsonify, send_file
+    from file_serving import serve_file
+
+    app = Flask(__name__)
+    path = os.path.join(directory, FILENAME)
+
+    @app.route('/send_file')
+    def legacy():
+        return send_file(path, as_attachment=True, download_name=FILENAME)
+
+    @app.route('/serve_file')
+    def fast():
+        return serve_file(path, FILENAME, etag='bench')
+
+    @app.route('/cpu')
+    def cpu():
+        times = os.times()
+        return jsonify({'cpu': times.user + times.system})
+
+    return app
+
+
+def run_server(directory, port, server):
+    app = build_app(directory)
+    if server == 'gunicorn':
+        from gunicorn.app.base import BaseApplication
+
+        class Server(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f'127.0.0.1:{port}')
+                self.cfg.set('workers', 1)
+                self.cfg.set('worker_class', 'gthread')
+                self.cfg.set('threads', 16)
+                self.cfg.set('loglevel', 'warning')
+
+            def load(self):
+                return app
+
+        Server().run()
+    else:
+        import logging
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def fetch(url, byte_range=None):
+    headers = {'Range': f'bytes={byte_range[0]}-{byte_range[1]}'} if byte_range else {}
+    start = time.perf_counter()
+    received = 0
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+        while True:
+            chunk = response.read(1024 * 1024)
+            if not chunk:
+                break
+            received += len(chunk)
+    return time.perf_counter() - start, received
+
+
+def server_cpu(base_url):
+    with urllib.request.urlopen(base_url + '/cpu') as response:
+        return json.load(response)['cpu']
+
+
+def run_case(base_url, route, size, args):
+    if args.ranged:
+        # Resumable-style reads: each request asks for one slice of the file
+        slice_size = size // args.requests
+        jobs = [(i * slice_size, (i + 1) * slice_size - 1) for i in range(args.requests)]
+    else:
+        jobs = [None] * args.requests
+
+    cpu_before = server_cpu(base_url)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(lambda r: fetch(f'{base_url}/{route}', r), jobs))
+    elapsed = time.perf_counter() - started
+    cpu_used = server_cpu(base_url) - cpu_before
+
+    latencies = sorted(latency for latency, _ in results)
+    total = sum(received for _, received in results)
+    return {
+        'route': route,
+        'requests': len(results),
+        'mb_per_s': round(total / elapsed / 1e6, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+        'server_cpu_s_per_gb': round(cpu_used / (total / 1e9), 3) if total else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size-mb', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--ranged', action='store_true', help='request byte ranges instead of whole files')
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn'], default='werkzeug')
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        size = args.size_mb * 1024 * 1024
+        with open(os.path.join(directory, FILENAME), 'wb') as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        server = multiprocessing.Process(target=run_server, args=(directory, args.port, args.server), daemon=True)
+        server.start()
+        base_url = f'http://127.0.0.1:{args.port}'
+        for _ in range(50):
+            try:
+                server_cpu(base_url)
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        try:
+            print(f'{args.server}: {args.requests} requests, concurrency {args.concurrency}, '
+                  f'{args.size_mb} MB file{" (ranged)" if args.ranged else ""}')
+            for route in ('send_file', 'serve_file'):
+                print(json.dumps(run_case(base_url, route, size, args)))
+        finally:
+            server.terminate()
+
+
+if __name__ == '__main__':
+    main()
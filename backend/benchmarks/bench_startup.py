@@ -0,0 +1,151 @@
+"""
+Worker startup time and per-request yt-dlp overhead.
+
+Startup: times `import app` in fresh interpreters, once cold and once after
+the libraries were preloaded the way `python -m backend serve --preload`
+does in the master before forking workers (on platforms with fork the
+import runs in a forked child, like a gunicorn worker).
+
+Per request: runs extract_info against a page on the local fake origin
+with a new YoutubeDL per request (the old path) and with instances checked
+out of a YoutubeDLPool, and reports p50/p99 latency of each. Results are
+appended, tagged with the git commit, to benchmarks/results/bench_startup.jsonl.
+
+Usage (from the backend directory):
+    python benchmarks/bench_startup.py --runs 5 --requests 200
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from bench_api import git_commit  # noqa: E402
+from fake_origin import FakeOrigin  # noqa: E402
+
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, 'results', 'bench_startup.jsonl')
+
+# Runs in a fresh interpreter; prints the seconds `import app` took
+IMPORT_SCRIPT = '''
+import importlib.util, os, sys, time
+sys.path.insert(0, {backend!r})
+preloaded = {preload!r}
+if preloaded:
+    # The backend's entry point, loaded as a module instead of run
+    spec = importlib.util.spec_from_file_location('entry', {entry!r})
+    entry = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(entry)
+    entry.preload()
+
+def timed_import():
+    start = time.perf_counter()
+    import app
+    return time.perf_counter() - start
+
+if preloaded and hasattr(os, 'fork'):
+    read, write = os.pipe()
+    if os.fork() == 0:
+        os.write(write, repr(timed_import()).encode())
+        os._exit(0)
+    os.close(write)
+    os.wait()
+    print(os.read(read, 64).decode())
+else:
+    print(timed_import())
+'''
+
+
+def time_imports(runs, preload):
+    """Seconds to import the app in each of runs fresh interpreters"""
+    script = IMPORT_SCRIPT.format(backend=BACKEND_DIR, preload=preload,
+                                  entry=os.path.join(BACKEND_DIR, '__main__.py'))
+    timings = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ, JOB_JOURNAL_PATH=os.path.join(workdir, 'jobs.db'), FFMPEG_PATH='none')
+            output = subprocess.run([sys.executable, '-c', script], cwd=workdir, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def time_requests(count, extract):
+    """Latencies of count calls to extract(i)"""
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        extract(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    return {
+        'p50_ms': round(statistics.median(timings) * 1000, 1),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per startup scenario')
+    parser.add_argument('--requests', type=int, default=200, help='extractions per request scenario')
+    parser.add_argument('--results', default=DEFAULT_RESULTS, help='JSON-lines file results are appended to')
+    args = parser.parse_args()
+
+    scenarios = {}
+    for name, preload in (('import_cold', False), ('import_preloaded', True)):
+        scenarios[name] = summarize(time_imports(args.runs, preload))
+        print(f'  {name:<22} {json.dumps(scenarios[name])}')
+
+    import yt_dlp
+    from ydl_pool import YoutubeDLPool
+
+    opts = {'quiet': True, 'no_warnings': True}
+    origin = FakeOrigin(media_bytes=1024 * 1024).start()
+    pool = YoutubeDLPool(yt_dlp.YoutubeDL)
+    try:
+        def fresh(i):
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                ydl.extract_info(origin.page_url(f'fresh-{i}'), download=False)
+
+        def pooled(i):
+            with pool.checkout('info', opts) as ydl:
+                ydl.extract_info(origin.page_url(f'pooled-{i}'), download=False)
+
+        pooled(-1)  # the pool's first instance is built outside the measurement, as at startup
+        for name, extract in (('extract_fresh_ydl', fresh), ('extract_pooled_ydl', pooled)):
+            scenarios[name] = summarize(time_requests(args.requests, extract))
+            print(f'  {name:<22} {json.dumps(scenarios[name])}')
+    finally:
+        pool.close()
+        origin.stop()
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'yt_dlp': yt_dlp.version.__version__,
+        'args': {k: v for k, v in vars(args).items() if k != 'results'},
+        'scenarios': scenarios,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result) + '\n')
+    print(f'Results appended to {args.results}')
+
+
+if __name__ == '__main__':
+    main()
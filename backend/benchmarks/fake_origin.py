@@ -0,0 +1,181 @@
+"""
+Local stand-in for a video site, for reproducible benchmarks.
+
+Serves synthetic media that yt-dlp's generic extractor understands, so the
+backend can be exercised end to end without network access:
+
+    /video/<name>.mp4          progressive video (supports Range)
+    /audio/<name>.m4a          progressive audio
+    /hls/<name>/index.m3u8     HLS media playlist of /hls/<name>/seg<i>.ts
+    /page/<name>.html          HTML page embedding the MP4 and M4A as sources
+
+The bytes are random, not playable media: enough for extraction,
+downloading and serving, but not for ffmpeg post-processing.
+
+Usage (standalone):
+    python benchmarks/fake_origin.py --port 8800 --size-mb 8
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BLOCK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)$')
+
+
+class FakeOrigin:
+    """Threaded HTTP server for the synthetic fixtures"""
+
+    def __init__(self, host='127.0.0.1', port=0, media_bytes=8 * 1024 * 1024, segments=10, rate=None):
+        self.media_bytes = media_bytes
+        self.segments = segments
+        self.rate = rate  # bytes/s per connection, None for unthrottled
+        self.block = os.urandom(BLOCK_SIZE)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-origin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def page_url(self, name):
+        return f'{self.base_url}/page/{name}.html'
+
+    def video_url(self, name):
+        return f'{self.base_url}/video/{name}.mp4'
+
+    def hls_url(self, name):
+        return f'{self.base_url}/hls/{name}/index.m3u8'
+
+    def _handler(self):
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_HEAD(self):
+                self._route(send_body=False)
+
+            def do_GET(self):
+                self._route(send_body=True)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _route(self, send_body):
+                path = self.path.split('?', 1)[0]
+                parts = path.strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'video':
+                    self._media('video/mp4', origin.media_bytes, send_body)
+                elif len(parts) == 2 and parts[0] == 'audio':
+                    self._media('audio/mp4', origin.media_bytes // 8, send_body)
+                elif len(parts) == 2 and parts[0] == 'page':
+                    self._page(parts[1].rsplit('.', 1)[0], send_body)
+                elif len(parts) == 3 and parts[0] == 'hls' and parts[2] == 'index.m3u8':
+                    self._playlist(send_body)
+                elif len(parts) == 3 and parts[0] == 'hls' and parts[2].endswith('.ts'):
+                    self._media('video/mp2t', origin.media_bytes // origin.segments, send_body)
+                else:
+                    self._text(404, 'text/plain', 'not found', send_body)
+
+            def _text(self, status, content_type, text, send_body):
+                body = text.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def _page(self, name, send_body):
+                self._text(200, 'text/html; charset=utf-8', (
+                    f'<html><head><title>Benchmark {name}</title></head><body>'
+                    f'<video controls>'
+                    f'<source src="/video/{name}.mp4" type="video/mp4">'
+                    f'<source src="/audio/{name}.m4a" type="audio/mp4">'
+                    f'</video></body></html>'
+                ), send_body)
+
+            def _playlist(self, send_body):
+                lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:4', '#EXT-X-MEDIA-SEQUENCE:0']
+                for i in range(origin.segments):
+                    lines += ['#EXTINF:4.0,', f'seg{i}.ts']
+                lines.append('#EXT-X-ENDLIST')
+                self._text(200, 'application/vnd.apple.mpegurl', '\n'.join(lines) + '\n', send_body)
+
+            def _media(self, content_type, size, send_body):
+                start, stop = 0, size
+                match = _RANGE_RE.match(self.headers.get('Range', ''))
+                if match:
+                    start = int(match.group(1))
+                    stop = min(int(match.group(2)) + 1, size) if match.group(2) else size
+                    if start >= size:
+                        self.send_response(416)
+                        self.send_header('Content-Range', f'bytes */{size}')
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{stop - 1}/{size}')
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(stop - start))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.end_headers()
+                if send_body:
+                    self._send_bytes(stop - start)
+
+            def _send_bytes(self, remaining):
+                started = time.monotonic()
+                sent = 0
+                while remaining:
+                    chunk = origin.block[:min(remaining, BLOCK_SIZE)]
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+                    sent += len(chunk)
+                    if origin.rate:
+                        # Sleep until the average rate is back under the limit
+                        ahead = sent / origin.rate - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--size-mb', type=float, default=8)
+    parser.add_argument('--rate-mbps', type=float, default=None, help='per-connection limit in MB/s')
+    args = parser.parse_args()
+
+    origin = FakeOrigin(args.host, args.port, int(args.size_mb * 1024 * 1024),
+                        rate=args.rate_mbps * 1e6 if args.rate_mbps else None)
+    print(f'Serving fixtures at {origin.base_url} (e.g. {origin.page_url("demo")})')
+    origin.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        origin.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Clip extraction with ffmpeg straight from the source URLs.
+
+ffmpeg seeks in the remote file itself: for progressive MP4 it reads the
+index (moov) and then requests only the byte ranges that cover the clip, so
+nothing outside the clip is downloaded. A clip that starts on a keyframe is
+a pure stream copy. Otherwise only the start of the clip up to the next
+keyframe is re-encoded and joined to a stream copy of the rest ("smart
+cut"), so the cost and quality of a copy are kept apart from at most one
+GOP. Only ffmpeg is needed; keyframes are found with its showinfo filter.
+"""
+
+import os
+import re
+import subprocess
+import tempfile
+import threading
+
+KEYFRAME_TOLERANCE = 0.05  # seconds between the requested start and a keyframe that still counts as on it
+PROBE_WINDOW = 20  # seconds after the start searched for the next keyframe
+
+# Encoders for re-encoding the first GOP in the source's codec
+VIDEO_ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+    'vp9': 'libvpx-vp9',
+    'av1': 'libsvtav1',
+    'mpeg4': 'mpeg4',
+}
+
+_PTS_RE = re.compile(r'pts_time:\s*([\d.]+)')
+_VIDEO_RE = re.compile(r'Stream #\d+:\d+.*?: Video: (\w+)[^,]*, (\w+)')
+
+
+class ClipError(Exception):
+    """ffmpeg could not produce the clip"""
+
+
+class ClipCancelled(Exception):
+    """The clip was cancelled while ffmpeg was running"""
+
+
+def _header_args(url, headers):
+    if headers and url.startswith(('http://', 'https://')):
+        return ['-headers', ''.join(f'{name}: {value}\r\n' for name, value in headers.items())]
+    return []
+
+
+def probe_video(ffmpeg, url, start, headers=None):
+    """Find the video codec, pixel format and keyframe times from start onwards.
+
+    Returns (codec, pix_fmt, keyframes); codec is None when the input has no
+    video stream.
+    """
+    seek = max(start - 1, 0)
+    cmd = [
+        ffmpeg, '-hide_banner', '-nostdin', *_header_args(url, headers),
+        '-skip_frame', 'nokey', '-ss', f'{seek:.6f}', '-t', str(PROBE_WINDOW), '-i', url,
+        '-copyts', '-map', '0:v:0?', '-vf', 'showinfo', '-f', 'null', '-',
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise ClipError(f'Could not probe the video: {e}')
+    match = _VIDEO_RE.search(result.stderr)
+    if match is None:
+        if result.returncode != 0:
+            raise ClipError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'ffmpeg failed')
+        return None, None, []
+    keyframes = sorted(float(t) for t in _PTS_RE.findall(result.stderr))
+    return match.group(1), match.group(2), keyframes
+
+
+def plan_cut(keyframes, start, end):
+    """Decide how to cut [start, end).
+
+    Returns ('copy', None) when start is on a keyframe, ('smart', keyframe)
+    to re-encode up to the next keyframe and copy the rest, or
+    ('encode', None) when no keyframe falls inside the clip.
+    """
+    for keyframe in keyframes:
+        if keyframe < start - KEYFRAME_TOLERANCE:
+            continue
+        if keyframe - start <= KEYFRAME_TOLERANCE:
+            return 'copy', None
+        if keyframe < end:
+            return 'smart', keyframe
+        break
+    return 'encode', None
+
+
+def _run(cmd, duration, on_progress=None, cancelled=None):
+    """Run ffmpeg, reporting the fraction of duration written so far"""
+    process = subprocess.Popen(
+        cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True,
+    )
+    # Drain stderr on a thread so a chatty ffmpeg can't block on a full pipe
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    written = 0
+    try:
+        for line in process.stdout:
+            if cancelled is not None and cancelled():
+                process.kill()
+                raise ClipCancelled()
+            if line.startswith('out_time_us=') and duration > 0:
+                value = line.split('=', 1)[1].strip()
+                if value.isdigit():
+                    written = max(written, int(value))
+                    if on_progress is not None:
+                        on_progress(min(written / 1e6 / duration, 1.0))
+        returncode = process.wait()
+        reader.join()
+        output = ''.join(stderr).strip()
+        if returncode != 0:
+            raise ClipError(output.splitlines()[-1] if output else 'ffmpeg failed')
+        if duration > 0 and not written:
+            raise ClipError('Nothing to clip: the range is past the end of the video')
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        reader.join()
+
+
+def _segment_cmd(ffmpeg, inputs, start, end, headers, video_args, audio_only):
+    cmd = [ffmpeg, '-hide_banner', '-nostdin', '-y']
+    for url in inputs:
+        cmd += [*_header_args(url, headers), '-ss', f'{start:.6f}', '-t', f'{end - start:.6f}', '-i', url]
+    if audio_only:
+        cmd += ['-map', '0:a:0', '-vn']
+    elif len(inputs) > 1:
+        cmd += ['-map', '0:v:0', '-map', '1:a:0']
+    else:
+        cmd += ['-map', '0:v:0', '-map', '0:a:0?']
+    return cmd + video_args + ['-c:a', 'copy']
+
+
+def cut_clip(ffmpeg, inputs, start, end, output, headers=None, audio_only=False, can_encode=None,
+             on_progress=None, cancelled=None):
+    """Write the [start, end) clip of inputs to output.
+
+    inputs holds one URL, or a video URL and an audio URL to combine.
+    can_encode(name) says whether ffmpeg has an encoder; without one for the
+    source codec a clip that doesn't start on a keyframe is copied from the
+    keyframe before start instead. Returns the method used: 'copy',
+    'smart' or 'encode'.
+    """
+    duration = end - start
+    if audio_only:
+        method, keyframe, codec, pix_fmt = 'copy', None, None, None
+    else:
+        codec, pix_fmt, keyframes = probe_video(ffmpeg, inputs[0], start, headers)
+        method, keyframe = plan_cut(keyframes, start, end) if codec else ('copy', None)
+        encoder = VIDEO_ENCODERS.get(codec)
+        if method != 'copy' and (encoder is None or (can_encode is not None and not can_encode(encoder))):
+            method, keyframe = 'copy', None
+
+    if method == 'copy':
+        cmd = _segment_cmd(ffmpeg, inputs, start, end, headers, ['-c:v', 'copy'], audio_only)
+        _run(cmd + ['-movflags', '+faststart', output], duration, on_progress, cancelled)
+        return method
+
+    encode_args = ['-c:v', VIDEO_ENCODERS[codec], '-preset', 'veryfast', '-crf', '18']
+    if pix_fmt:
+        encode_args += ['-pix_fmt', pix_fmt]
+    if method == 'encode':
+        cmd = _segment_cmd(ffmpeg, inputs, start, end, headers, encode_args, audio_only)
+        _run(cmd + ['-movflags', '+faststart', output], duration, on_progress, cancelled)
+        return method
+
+    # Smart cut: MPEG-TS segments carry their parameter sets in-band, so the
+    # re-encoded head and the copied body can be joined without re-encoding
+    # Named after the output so leftovers can be traced back to their clip
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(output) or None,
+                                     prefix=os.path.basename(output).split('.', 1)[0] + '.') as workdir:
+        head = os.path.join(workdir, 'head.ts')
+        body = os.path.join(workdir, 'body.ts')
+        head_share = (keyframe - start) / duration
+
+        cmd = _segment_cmd(ffmpeg, inputs, start, keyframe, headers, encode_args, audio_only)
+        _run(cmd + ['-f', 'mpegts', head], keyframe - start,
+             on_progress and (lambda f: on_progress(f * head_share)), cancelled)
+        # Seeking lands on the last keyframe at or before the position, so
+        # aim just past it to be safe from rounding
+        cmd = _segment_cmd(ffmpeg, inputs, keyframe + 0.001, end, headers, ['-c:v', 'copy'], audio_only)
+        _run(cmd + ['-f', 'mpegts', body], end - keyframe,
+             on_progress and (lambda f: on_progress(head_share + f * (1 - head_share))), cancelled)
+
+        _run([ffmpeg, '-hide_banner', '-nostdin', '-y', '-i', f'concat:{head}|{body}',
+              '-map', '0', '-c', 'copy', '-movflags', '+faststart', output], 0, None, cancelled)
+    return method
@@ -0,0 +1,247 @@
+"""
+Content-addressed store for downloaded artifacts.
+
+Every artifact is keyed by what produced it (video, format selector,
+post-processor options, clip range), so the same request is served from
+disk instead of being downloaded again. The index is a SQLite database next
+to the files, with O(1) lookups by key or by served filename. Every server
+process using the directory reads and writes the same index, one row per
+artifact, so none of them can overwrite what another one recorded.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+INDEX_FILENAME = 'index.db'
+_HASH_BLOCK = 1024 * 1024
+# What builds leave behind: <key>.<ext>.part, <key>.f137.mp4, <key>.<random> clip work directories
+_BUILD_NAME_RE = re.compile(r'[0-9a-f]{32}\.')
+
+
+def artifact_key(video_key, format_selector, postprocessors=None, clip=None):
+    """Stable key for an artifact built from a video with the given options"""
+    material = json.dumps({
+        'video': video_key,
+        'format': format_selector,
+        'postprocessors': postprocessors or [],
+        'clip': clip,
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def video_key(info):
+    """Identify a video independently of the URL it was requested with"""
+    return f"{info.get('extractor_key', 'generic')}:{info.get('id', '')}"
+
+
+class ContentStore:
+    """Shared on-disk artifact index plus tracking of this process's in-flight builds"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False, timeout=30)
+        # WAL lets other processes look artifacts up while one is writing
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS artifacts (
+                key TEXT PRIMARY KEY,
+                file TEXT NOT NULL UNIQUE,
+                size INTEGER NOT NULL,
+                entry TEXT NOT NULL,
+                last_access REAL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._conn.commit()
+        self._in_flight = {}
+        self._accesses = {}  # key -> (last access, hits) not written yet
+        self._forget_missing()
+
+    def path_for(self, entry):
+        return os.path.join(self.directory, entry['file'])
+
+    def get(self, key):
+        """Return the index entry for a materialized artifact, or None"""
+        entry = self._select('WHERE key = ?', (key,))
+        if entry is None or not os.path.exists(self.path_for(entry)):
+            return None
+        return entry
+
+    def get_by_file(self, filename):
+        """Return the index entry for a served filename, or None"""
+        entry = self._select('WHERE file = ?', (filename,))
+        if entry is None or not os.path.exists(self.path_for(entry)):
+            return None
+        return entry
+
+    def entries(self):
+        """Snapshot of all index entries"""
+        with self._lock:
+            rows = self._conn.execute('SELECT entry, last_access, hits FROM artifacts').fetchall()
+            return [self._entry(*row) for row in rows]
+
+    def touch(self, key):
+        """Record an access; persisted on the next flush()"""
+        with self._lock:
+            _, hits = self._accesses.get(key, (None, 0))
+            self._accesses[key] = (time.time(), hits + 1)
+
+    def flush(self):
+        """Persist access times recorded since the last flush"""
+        with self._lock:
+            accesses, self._accesses = self._accesses, {}
+            if not accesses:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    'UPDATE artifacts SET last_access = MAX(COALESCE(last_access, 0), ?), hits = hits + ? '
+                    'WHERE key = ?',
+                    [(last_access, hits, key) for key, (last_access, hits) in accesses.items()],
+                )
+
+    def add(self, key, path, display_name, **extra):
+        """Record a finished artifact in the index.
+
+        The file's checksum is stored with it so clients can verify what
+        they fetched.
+        """
+        entry = {
+            'key': key,
+            'file': os.path.basename(path),
+            'display_name': display_name,
+            'size': os.path.getsize(path),
+            'sha256': file_sha256(path),
+            'created_at': time.time(),
+        }
+        entry.update(extra)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO artifacts (key, file, size, entry) VALUES (?, ?, ?, ?)',
+                    (key, entry['file'], entry['size'], json.dumps(entry)),
+                )
+        return entry
+
+    def remove(self, key):
+        """Drop an artifact from the index (the caller deletes the file)"""
+        entry = self._select('WHERE key = ?', (key,))
+        if entry is not None:
+            with self._lock:
+                self._accesses.pop(key, None)
+                with self._conn:
+                    self._conn.execute('DELETE FROM artifacts WHERE key = ?', (key,))
+        return entry
+
+    def claim(self, key, job_id):
+        """Mark a key as being built by job_id.
+
+        Returns the job ID already building the key, or None if this caller
+        now owns it.
+        """
+        with self._lock:
+            owner = self._in_flight.get(key)
+            if owner is not None:
+                return owner
+            self._in_flight[key] = job_id
+            return None
+
+    def is_in_flight(self, key):
+        with self._lock:
+            return key in self._in_flight
+
+    def release(self, key, job_id):
+        with self._lock:
+            if self._in_flight.get(key) == job_id:
+                del self._in_flight[key]
+
+    def remove_orphans(self, keep_keys=()):
+        """Delete leftovers of builds that will never finish.
+
+        Partial downloads (.part files, fragments, yt-dlp resume state,
+        unmerged formats, clip work directories) are named after their
+        artifact key. Those not in the index and not named after one of
+        keep_keys, the keys of jobs that may still resume, are removed.
+        Other files, such as downloads saved under their title before the
+        content store existed, are left alone. Returns (entries removed,
+        bytes freed).
+        """
+        keep = set(keep_keys)
+        with self._lock:
+            rows = self._conn.execute('SELECT key, file FROM artifacts').fetchall()
+            keep.update(self._in_flight)
+        keep.update(key for key, _ in rows)
+        stored = {file for _, file in rows}
+        removed = freed = 0
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if not _BUILD_NAME_RE.match(name) or name in stored:
+                continue
+            if name.split('.', 1)[0] in keep:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                    shutil.rmtree(entry.path)
+                else:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+            except OSError:
+                continue
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts').fetchone()
+            return {
+                'artifacts': count,
+                'bytes': size,
+                'in_flight': len(self._in_flight),
+            }
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _select(self, where, args):
+        with self._lock:
+            row = self._conn.execute(f'SELECT entry, last_access, hits FROM artifacts {where}', args).fetchone()
+            return self._entry(*row) if row else None
+
+    def _entry(self, raw, last_access, hits):
+        # Caller must hold self._lock; accesses not flushed yet are included
+        entry = json.loads(raw)
+        pending_access, pending_hits = self._accesses.get(entry['key'], (None, 0))
+        if last_access is not None or pending_access is not None:
+            entry['last_access'] = max(last_access or 0, pending_access or 0)
+        if hits or pending_hits:
+            entry['hits'] = hits + pending_hits
+        return entry
+
+    def _forget_missing(self):
+        # Forget artifacts whose files were removed while the server was down
+        with self._lock:
+            rows = self._conn.execute('SELECT key, file FROM artifacts').fetchall()
+            missing = [(key,) for key, file in rows if not os.path.exists(os.path.join(self.directory, file))]
+            if missing:
+                with self._conn:
+                    self._conn.executemany('DELETE FROM artifacts WHERE key = ?', missing)
@@ -0,0 +1,522 @@
+"""
+Bounded download scheduler.
+
+Jobs are fed to a fixed pool of worker threads through a priority queue,
+with a cap on concurrent jobs per host. Queued jobs are journaled to SQLite
+so they survive a restart, along with a checkpoint of how far a running job
+got so it can resume where it stopped. Server processes sharing a journal
+also pass cancel requests for each other's jobs through it, count the
+clients waiting for each job, and never queue two jobs with the same key.
+"""
+
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+DEFAULT_PRIORITY = 5
+
+# Hosts that serve the same site and should share a concurrency limit
+_HOST_ALIASES = {
+    'youtu.be': 'youtube.com',
+    'youtube-nocookie.com': 'youtube.com',
+}
+
+
+def host_key(url):
+    """Group a URL under the host whose concurrency limit it counts against"""
+    host = (urlsplit(url).hostname or '').lower()
+    for prefix in ('www.', 'm.', 'music.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    return _HOST_ALIASES.get(host, host)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled"""
+
+
+class JobExists(Exception):
+    """Raised by submit() when a journaled job with the same key is already queued or running"""
+
+    def __init__(self, job_id):
+        super().__init__(job_id)
+        self.job_id = job_id
+
+
+class DownloadJob:
+    """A unit of work for the scheduler"""
+
+    def __init__(self, url, options=None, priority=DEFAULT_PRIORITY, job_id=None, created_at=None,
+                 checkpoint=None, key=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.url = url
+        self.options = options or {}
+        self.priority = priority
+        self.host = host_key(url)
+        self.created_at = created_at or time.time()
+        self.status = 'queued'
+        self.cancel_event = threading.Event()
+        # Set when a shutdown stops the job; it stays journaled for the next start
+        self.interrupted = False
+        # Progress saved by an earlier run that stopped mid-download
+        self.checkpoint = checkpoint
+        # Jobs with the same key build the same thing; a journal holds one of them at a time
+        self.key = key
+        # Clients waiting for the job, when there is no journal to count them
+        self.clients = 1
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.id)
+
+
+def _instance_id():
+    """Journal owner ID of this process; new on every start, even if the PID is reused"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+
+
+class JobJournal:
+    """SQLite journal of jobs that have not finished yet.
+
+    Each row records the journal instance that owns it, and every instance
+    renews a lease with heartbeat() while it runs. When several server
+    processes share one journal, jobs are only restored once their owner
+    has shut down or stopped renewing its lease, whatever PID it had.
+    Cancel requests for jobs (or anything else with an ID) running in
+    another process are left in the journal for that process to take.
+    A job's key is unique across the journal, and the clients waiting for
+    a job are counted on its row whichever process they came through.
+    """
+
+    def __init__(self, path, lease_seconds=30):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.instance_id = _instance_id()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                options TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                checkpoint TEXT,
+                key TEXT UNIQUE,
+                clients INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS owners (
+                id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS cancels (
+                id TEXT PRIMARY KEY,
+                requested_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self.heartbeat()
+
+    def heartbeat(self):
+        """Renew this instance's lease on the jobs it owns"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO owners (id, heartbeat) VALUES (?, ?)',
+                               (self.instance_id, now))
+            # Requests nobody took within a lease were for jobs that had finished
+            self._conn.execute('DELETE FROM cancels WHERE requested_at < ?', (now - self.lease_seconds,))
+            self._conn.commit()
+
+    def release(self):
+        """Give up the lease, so the next start restores our jobs right away"""
+        with self._lock:
+            self._conn.execute('DELETE FROM owners WHERE id = ?', (self.instance_id,))
+            self._conn.commit()
+
+    def record(self, job):
+        """Journal a job; returns the ID of the job already journaled with its key, or None"""
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        'INSERT INTO jobs (id, url, options, priority, created_at, status, owner, key) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (job.id, job.url, json.dumps(job.options), job.priority, job.created_at, job.status,
+                         self.instance_id, job.key),
+                    )
+            except sqlite3.IntegrityError:
+                row = self._conn.execute('SELECT id FROM jobs WHERE key = ?', (job.key,)).fetchone()
+                if row is None:
+                    raise
+                return row[0]
+        return None
+
+    def join(self, job_id):
+        """Count one more client of a journaled job; returns False if it is not journaled"""
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute('UPDATE jobs SET clients = clients + 1 WHERE id = ?', (job_id,))
+        return cursor.rowcount > 0
+
+    def leave(self, job_id):
+        """Count one client less; returns how many are left, or None if the job is not journaled"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute('BEGIN IMMEDIATE')
+                row = self._conn.execute('SELECT clients FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                if row is None:
+                    return None
+                clients = max(row[0] - 1, 0)
+                self._conn.execute('UPDATE jobs SET clients = ? WHERE id = ?', (clients, job_id))
+        return clients
+
+    def update_status(self, job_id, status):
+        with self._lock:
+            self._conn.execute('UPDATE jobs SET status = ? WHERE id = ?', (status, job_id))
+            self._conn.commit()
+
+    def save_checkpoint(self, job_id, checkpoint):
+        """Record how far a running job got (a JSON-serializable dict)"""
+        with self._lock:
+            self._conn.execute('UPDATE jobs SET checkpoint = ? WHERE id = ?', (json.dumps(checkpoint), job_id))
+            self._conn.commit()
+
+    def options(self):
+        """Options of every journaled job, whichever process owns it"""
+        with self._lock:
+            rows = self._conn.execute('SELECT options FROM jobs').fetchall()
+        return [json.loads(options) for options, in rows]
+
+    def contains(self, job_id):
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM jobs WHERE id = ?', (job_id,)).fetchone() is not None
+
+    def request_cancel(self, job_id):
+        """Ask the process running job_id to cancel it"""
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO cancels (id, requested_at) VALUES (?, ?)',
+                               (job_id, time.time()))
+            self._conn.commit()
+
+    def take_cancel_requests(self, job_ids):
+        """The IDs among job_ids that have a cancel request, consuming the requests"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        with self._lock:
+            with self._conn:
+                placeholders = ','.join('?' * len(job_ids))
+                rows = self._conn.execute(f'SELECT id FROM cancels WHERE id IN ({placeholders})',
+                                          job_ids).fetchall()
+                self._conn.executemany('DELETE FROM cancels WHERE id = ?', rows)
+        return [job_id for job_id, in rows]
+
+    def remove(self, job_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            self._conn.commit()
+
+    def pending(self):
+        """Claim jobs whose owner has shut down or whose lease has expired"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute('BEGIN IMMEDIATE')
+                expired = time.time() - self.lease_seconds
+                self._conn.execute('DELETE FROM owners WHERE heartbeat < ?', (expired,))
+                rows = self._conn.execute(
+                    'SELECT id, url, options, priority, created_at, checkpoint, key, '
+                    '       id IN (SELECT id FROM cancels) FROM jobs '
+                    'WHERE owner != ? AND owner NOT IN (SELECT id FROM owners) ORDER BY created_at',
+                    (self.instance_id,),
+                ).fetchall()
+                self._conn.executemany(
+                    'UPDATE jobs SET owner = ?, status = ? WHERE id = ?',
+                    [(self.instance_id, 'queued', row[0]) for row in rows],
+                )
+                self._conn.executemany('DELETE FROM cancels WHERE id = ?', [(row[0],) for row in rows if row[7]])
+        jobs = []
+        for job_id, url, options, priority, created_at, checkpoint, key, cancelled in rows:
+            job = DownloadJob(url, json.loads(options), priority, job_id=job_id, created_at=created_at,
+                              checkpoint=json.loads(checkpoint) if checkpoint else None, key=key)
+            if cancelled:
+                job.cancel_event.set()
+            jobs.append(job)
+        return jobs
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DownloadScheduler:
+    """Fixed pool of worker threads pulling jobs in priority order.
+
+    run_job(job) is called on a worker thread. It should call
+    job.check_cancelled() periodically; raising JobCancelled ends the job.
+    on_finish(job, error) is called after every job, including cancelled ones.
+    With a journal, on_restore(job) is called for every job taken over from
+    an earlier run or a stopped process, just before it is queued, and
+    cancel requests other processes left in the journal for this one's jobs
+    are checked every cancel_poll_interval seconds. Clients that wait for
+    a job join() it and leave() it; the last one to leave cancels it.
+    """
+
+    def __init__(self, run_job, workers=2, per_host_limit=2, journal=None, on_finish=None, on_restore=None,
+                 cancel_poll_interval=1.0):
+        self.run_job = run_job
+        self.workers = workers
+        self.per_host_limit = per_host_limit
+        self.journal = journal
+        self.on_finish = on_finish
+        self.on_restore = on_restore
+        self.cancel_poll_interval = cancel_poll_interval
+        self._pending = []  # (priority, seq, job), kept sorted
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._running_per_host = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._accepting = True
+        self._stopping = False
+        self._lease_stop = threading.Event()
+        self._lease_thread = None
+
+    def start(self):
+        """Start the workers and re-queue jobs left over from a previous run"""
+        if self._threads:
+            return []
+        restored = self.restore()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'download-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.journal:
+            self._lease_thread = threading.Thread(target=self._renew_lease, name='journal-lease', daemon=True)
+            self._lease_thread.start()
+        return restored
+
+    def restore(self):
+        """Queue journaled jobs whose owner is gone; returns them"""
+        restored = self.journal.pending() if self.journal else []
+        for job in restored:
+            if job.cancelled:
+                # Cancelled through another process before it was taken over
+                job.status = 'cancelled'
+                self.journal.remove(job.id)
+                if self.on_finish:
+                    self.on_finish(job, JobCancelled(job.id))
+                continue
+            if self.on_restore:
+                self.on_restore(job)
+            self._enqueue(job)
+        return restored
+
+    def submit(self, job):
+        """Queue a job; returns its position in the queue (1-based).
+
+        Raises JobExists if the journal already holds a job with the same
+        key, queued or running in this process or another one.
+        """
+        with self._cond:
+            if not self._accepting:
+                raise RuntimeError('Scheduler is shutting down')
+        if self.journal:
+            owner = self.journal.record(job)
+            if owner is not None:
+                raise JobExists(owner)
+        return self._enqueue(job)
+
+    def join(self, job_id):
+        """Count one more client waiting for a job; returns False if it is unknown"""
+        if self.journal is not None:
+            return self.journal.join(job_id)
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.clients += 1
+            return True
+
+    def leave(self, job_id):
+        """Drop one client of a job, cancelling it when no client is left.
+
+        Returns how many clients are still waiting for it (0 once it is
+        cancelled), or None if the job is unknown or already finished.
+        """
+        if self.journal is not None:
+            clients = self.journal.leave(job_id)
+        else:
+            with self._cond:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None
+                job.clients -= 1
+                clients = job.clients
+        if clients is None:
+            return None
+        if clients > 0:
+            return clients
+        return 0 if self.cancel(job_id) else None
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job_id):
+        """1-based position among queued jobs, or None if not queued"""
+        with self._cond:
+            for position, (_, _, job) in enumerate(self._pending, 1):
+                if job.id == job_id:
+                    return position
+        return None
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if it is unknown.
+
+        A job journaled by another process is cancelled by that process
+        once it picks up the request.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                if self.journal is not None and self.journal.contains(job_id):
+                    self.journal.request_cancel(job_id)
+                    return True
+                return False
+            job.cancel_event.set()
+            queued = next((entry for entry in self._pending if entry[2] is job), None)
+            if queued is not None:
+                self._pending.remove(queued)
+                del self._jobs[job_id]
+                job.status = 'cancelled'
+        if queued is not None:
+            if self.journal:
+                self.journal.remove(job_id)
+            if self.on_finish:
+                self.on_finish(job, JobCancelled(job_id))
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.workers,
+                'per_host_limit': self.per_host_limit,
+                'queued': len(self._pending),
+                'running': sum(self._running_per_host.values()),
+                'running_per_host': dict(self._running_per_host),
+            }
+
+    def shutdown(self, drain=True, timeout=None):
+        """Stop accepting jobs and wait for running ones to finish.
+
+        Queued jobs stay in the journal and are picked up on the next start.
+        """
+        with self._cond:
+            self._accepting = False
+            self._stopping = True
+            if not drain:
+                for job in self._jobs.values():
+                    if job.status == 'running':
+                        job.interrupted = True
+                        job.cancel_event.set()
+            self._cond.notify_all()
+        self._lease_stop.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            thread.join(remaining)
+        if self.journal:
+            # What is left in the journal can be taken over without waiting for the lease
+            self.journal.release()
+
+    def _renew_lease(self):
+        # Also takes over jobs of processes that died while this one runs,
+        # and applies cancel requests made through other processes
+        renewed = time.monotonic()
+        while not self._lease_stop.wait(min(self.cancel_poll_interval, self.journal.lease_seconds / 3)):
+            try:
+                with self._cond:
+                    job_ids = list(self._jobs)
+                for job_id in self.journal.take_cancel_requests(job_ids):
+                    self.cancel(job_id)
+                if time.monotonic() - renewed >= self.journal.lease_seconds / 3:
+                    renewed = time.monotonic()
+                    self.journal.heartbeat()
+                    self.restore()
+            except Exception as e:
+                print(f'Job journal lease renewal failed: {e}')
+
+    def _enqueue(self, job):
+        with self._cond:
+            self._jobs[job.id] = job
+            entry = (job.priority, next(self._seq), job)
+            # Insert in sorted order; the queue is short so a linear scan is fine
+            index = len(self._pending)
+            for i, existing in enumerate(self._pending):
+                if entry[:2] < existing[:2]:
+                    index = i
+                    break
+            self._pending.insert(index, entry)
+            self._cond.notify()
+            return index + 1
+
+    def _next_job(self):
+        # Caller must hold self._cond
+        for entry in self._pending:
+            job = entry[2]
+            if self._running_per_host.get(job.host, 0) < self.per_host_limit:
+                self._pending.remove(entry)
+                self._running_per_host[job.host] = self._running_per_host.get(job.host, 0) + 1
+                job.status = 'running'
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopping:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+            if self.journal:
+                self.journal.update_status(job.id, 'running')
+
+            error = None
+            try:
+                job.check_cancelled()
+                self.run_job(job)
+            except Exception as e:
+                error = e
+
+            with self._cond:
+                self._running_per_host[job.host] -= 1
+                if not self._running_per_host[job.host]:
+                    del self._running_per_host[job.host]
+                self._jobs.pop(job.id, None)
+                job.status = 'cancelled' if isinstance(error, JobCancelled) else ('error' if error else 'finished')
+                self._cond.notify_all()
+            if self.journal and not job.interrupted:
+                self.journal.remove(job.id)
+            if self.on_finish:
+                self.on_finish(job, error)
@@ -0,0 +1,145 @@
+"""
+One-time detection of ffmpeg/ffprobe and what they can do.
+
+Probing spawns subprocesses, so it runs at startup (and on an explicit
+refresh or when the binary changes on disk) instead of on every request.
+Format and post-processor selection read the cached result.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+# Used when ffmpeg is installed but not on PATH (e.g. Chocolatey on Windows)
+FALLBACK_LOCATIONS = [
+    r'C:\ProgramData\chocolatey\bin\ffmpeg.exe',
+    r'C:\ProgramData\chocolatey\lib\ffmpeg\tools\ffmpeg\bin\ffmpeg.exe',
+    '/usr/local/bin/ffmpeg',
+    '/opt/homebrew/bin/ffmpeg',
+]
+
+_VERSION_RE = re.compile(r'version\s+(\S+)')
+_ENCODER_RE = re.compile(r'^\s*([VAS])[F.][S.][X.][B.][D.]\s+(\S+)', re.MULTILINE)
+
+
+def _run(args, timeout=10):
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+
+def _locate_ffmpeg(configured=None):
+    if configured and configured.lower() == 'none':
+        # Explicitly disabled, e.g. for benchmarks with synthetic media
+        return None
+    for candidate in [configured, shutil.which('ffmpeg'), *FALLBACK_LOCATIONS]:
+        if candidate and os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _locate_ffprobe(ffmpeg):
+    # Prefer the ffprobe shipped next to the ffmpeg we use
+    sibling = os.path.join(os.path.dirname(ffmpeg), 'ffprobe' + os.path.splitext(ffmpeg)[1])
+    if os.path.isfile(sibling):
+        return sibling
+    return shutil.which('ffprobe')
+
+
+class FFmpegCapabilities:
+    """Cached description of the local ffmpeg install"""
+
+    def __init__(self, ffmpeg_path=None):
+        self.configured_path = ffmpeg_path
+        self._lock = threading.Lock()
+        self._caps = None
+        self._mtime = None
+        self._watcher = None
+
+    def refresh(self):
+        """Probe ffmpeg/ffprobe again and replace the cached capabilities"""
+        ffmpeg = _locate_ffmpeg(self.configured_path)
+        caps = {
+            'available': False,
+            'ffmpeg': ffmpeg,
+            'ffprobe': None,
+            'version': None,
+            'ffprobe_version': None,
+            'audio_encoders': [],
+            'video_encoders': [],
+        }
+        if ffmpeg:
+            version_output = _run([ffmpeg, '-hide_banner', '-version'])
+            if version_output is not None:
+                match = _VERSION_RE.search(version_output)
+                caps['available'] = True
+                caps['version'] = match.group(1) if match else 'unknown'
+                encoders = _run([ffmpeg, '-hide_banner', '-encoders']) or ''
+                for kind, name in _ENCODER_RE.findall(encoders):
+                    if kind == 'A':
+                        caps['audio_encoders'].append(name)
+                    elif kind == 'V':
+                        caps['video_encoders'].append(name)
+
+            ffprobe = _locate_ffprobe(ffmpeg)
+            if ffprobe:
+                probe_output = _run([ffprobe, '-hide_banner', '-version'])
+                if probe_output is not None:
+                    match = _VERSION_RE.search(probe_output)
+                    caps['ffprobe'] = ffprobe
+                    caps['ffprobe_version'] = match.group(1) if match else 'unknown'
+
+        with self._lock:
+            self._caps = caps
+            self._mtime = self._binary_mtime(ffmpeg)
+        return caps
+
+    def snapshot(self):
+        """Cached capabilities, probing on first use"""
+        with self._lock:
+            caps = self._caps
+        return caps if caps is not None else self.refresh()
+
+    @property
+    def available(self):
+        return self.snapshot()['available']
+
+    @property
+    def location(self):
+        """Path to pass as yt-dlp's ffmpeg_location, or None"""
+        caps = self.snapshot()
+        return caps['ffmpeg'] if caps['available'] else None
+
+    def has_encoder(self, name):
+        caps = self.snapshot()
+        return name in caps['audio_encoders'] or name in caps['video_encoders']
+
+    def watch(self, interval=30):
+        """Re-probe whenever the ffmpeg binary is installed, replaced or removed"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                ffmpeg = _locate_ffmpeg(self.configured_path)
+                with self._lock:
+                    changed = self._caps is None or ffmpeg != self._caps['ffmpeg'] \
+                        or self._binary_mtime(ffmpeg) != self._mtime
+                if changed:
+                    self.refresh()
+
+        self._watcher = threading.Thread(target=run, name='ffmpeg-watch', daemon=True)
+        self._watcher.start()
+
+    @staticmethod
+    def _binary_mtime(path):
+        try:
+            return os.path.getmtime(path) if path else None
+        except OSError:
+            return None
@@ -0,0 +1,185 @@
+"""
+Production file responses for downloaded media.
+
+Full files and single ranges are handed to the WSGI server's
+wsgi.file_wrapper, which servers such as gunicorn turn into an os.sendfile()
+zero-copy transfer. Multi-range requests are answered as
+multipart/byteranges, conditional requests use a strong ETag derived from
+the content-store key, and a fronting proxy can take over the transfer
+entirely through X-Accel-Redirect (nginx) or X-Sendfile (Apache/lighttpd).
+"""
+
+import mimetypes
+import os
+import uuid
+from urllib.parse import quote
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date
+
+BLOCK_SIZE = 256 * 1024
+
+# Servers whose file_wrapper sends exactly Content-Length bytes from the
+# current file offset, so a seeked file can be used for a range response
+SENDFILE_RANGE_SERVERS = ('gunicorn',)
+
+
+def content_disposition(download_name, inline=False):
+    return f"{'inline' if inline else 'attachment'}; filename*=UTF-8''{quote(download_name)}"
+
+
+def resolve_ranges(byte_ranges, size):
+    """Turn parsed (start, stop) pairs into absolute half-open ranges.
+
+    Returns None if no range is satisfiable.
+    """
+    resolved = []
+    for start, stop in byte_ranges:
+        if start < 0:
+            start, stop = max(size + start, 0), size
+        elif stop is None or stop > size:
+            stop = size
+        if start < stop:
+            resolved.append((start, stop))
+    return resolved or None
+
+
+def _iter_range(f, start, stop):
+    """Read [start, stop) into one reused buffer"""
+    try:
+        f.seek(start)
+        buffer = bytearray(BLOCK_SIZE)
+        view = memoryview(buffer)
+        remaining = stop - start
+        while remaining:
+            read = f.readinto(view[:min(remaining, BLOCK_SIZE)])
+            if not read:
+                break
+            remaining -= read
+            yield bytes(view[:read])
+    finally:
+        f.close()
+
+
+def _iter_multipart(path, ranges, size, content_type, boundary):
+    with open(path, 'rb') as f:
+        for start, stop in ranges:
+            yield (
+                f'\r\n--{boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n'
+            ).encode('latin-1')
+            f.seek(start)
+            remaining = stop - start
+            while remaining:
+                chunk = f.read(min(remaining, BLOCK_SIZE))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        yield f'\r\n--{boundary}--\r\n'.encode('latin-1')
+
+
+def _multipart_length(ranges, size, content_type, boundary):
+    length = len(f'\r\n--{boundary}--\r\n')
+    for start, stop in ranges:
+        length += len(
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n'
+        ) + (stop - start)
+    return length
+
+
+def _file_body(path, start, stop, size):
+    """Body for one contiguous range, zero-copy when the server allows it"""
+    f = open(path, 'rb')
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    server = request.environ.get('SERVER_SOFTWARE', '')
+    if file_wrapper is not None and (
+        (start == 0 and stop == size) or server.startswith(SENDFILE_RANGE_SERVERS)
+    ):
+        f.seek(start)
+        return file_wrapper(f, BLOCK_SIZE), True
+    return _iter_range(f, start, stop), False
+
+
+def serve_file(path, download_name, etag, accel_mode=None, accel_prefix='/protected-downloads/',
+               cache_control='private, max-age=3600', extra_headers=None, inline=False):
+    """Build a response for a file on disk honouring conditional and Range requests.
+
+    accel_mode is None, 'x-accel' (nginx X-Accel-Redirect to
+    accel_prefix + filename) or 'x-sendfile' (absolute path in X-Sendfile).
+    inline files are meant to be shown rather than saved.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    content_type = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+    etag_value = f'"{etag}"'
+    headers = {
+        'ETag': etag_value,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': cache_control,
+        'Content-Disposition': content_disposition(download_name, inline),
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+
+    # Conditional GET
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if etag_value in tags or '*' in tags:
+            return Response(status=304, headers=headers)
+    else:
+        since = parse_date(request.headers.get('If-Modified-Since'))
+        if since is not None and int(stat.st_mtime) <= since.timestamp():
+            return Response(status=304, headers=headers)
+
+    # The proxy serves the bytes (and handles Range itself)
+    if accel_mode == 'x-accel':
+        headers['X-Accel-Redirect'] = accel_prefix + quote(os.path.basename(path))
+        return Response(status=200, headers=headers, content_type=content_type)
+    if accel_mode == 'x-sendfile':
+        headers['X-Sendfile'] = os.path.abspath(path)
+        return Response(status=200, headers=headers, content_type=content_type)
+
+    # If-Range only allows a partial response for the current version
+    byte_range = request.range if request.method in ('GET', 'HEAD') else None
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range and if_range.strip() != etag_value:
+        byte_range = None
+
+    ranges = None
+    if byte_range is not None and byte_range.units == 'bytes':
+        ranges = resolve_ranges(byte_range.ranges, size)
+        if ranges is None:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+
+    if ranges is None:
+        body, direct = _file_body(path, 0, size, size)
+        response = Response(body, status=200, headers=headers, content_type=content_type,
+                            direct_passthrough=direct)
+        response.content_length = size
+        return response
+
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        body, direct = _file_body(path, start, stop, size)
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        response = Response(body, status=206, headers=headers, content_type=content_type,
+                            direct_passthrough=direct)
+        response.content_length = stop - start
+        return response
+
+    boundary = uuid.uuid4().hex
+    response = Response(
+        _iter_multipart(path, ranges, size, content_type, boundary),
+        status=206,
+        headers=headers,
+        content_type=f'multipart/byteranges; boundary={boundary}',
+    )
+    response.content_length = _multipart_length(ranges, size, content_type, boundary)
+    return response
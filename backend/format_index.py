@@ -0,0 +1,222 @@
+"""
+Ranked, per-video index of downloadable formats.
+
+yt-dlp's info dict lists every format the site offers, often dozens of
+near-duplicates across protocols. FormatIndex reduces them once per info
+dict to a compact table ranked best first, with the size estimated where the
+site doesn't report it, and answers both /api/formats queries (filters and
+pagination) and the download path's choice of a concrete format ID, so
+neither walks the raw list again.
+
+Rows are plain dicts:
+
+    format_id, type        'video' (video and audio), 'video_only' or 'audio'
+    ext, protocol          container and transfer protocol
+    vcodec, acodec         codec family ('h264', 'vp9', 'aac', 'opus', ...)
+    width, height, fps, resolution, quality
+    tbr, abr               total/audio bitrate in kbps
+    filesize               bytes, exact or estimated (filesize_estimated)
+    needs_merge            true when the format has no audio of its own
+"""
+
+import threading
+from collections import OrderedDict
+
+# Protocols ranked by how cheaply they download (progressive first)
+_PROTOCOL_RANK = {'https': 3, 'http': 3, 'm3u8_native': 2, 'm3u8': 2, 'http_dash_segments': 1}
+
+_VCODEC_FAMILIES = (('avc', 'h264'), ('h264', 'h264'), ('hev', 'hevc'), ('hvc', 'hevc'), ('h265', 'hevc'),
+                    ('vp09', 'vp9'), ('vp9', 'vp9'), ('vp8', 'vp8'), ('av01', 'av1'), ('av1', 'av1'))
+_ACODEC_FAMILIES = (('mp4a', 'aac'), ('aac', 'aac'), ('opus', 'opus'), ('vorbis', 'vorbis'), ('mp3', 'mp3'),
+                    ('ac-3', 'ac3'), ('ec-3', 'eac3'), ('flac', 'flac'))
+
+_AUDIO_EXTS = {'m4a', 'mp3', 'opus', 'ogg', 'oga', 'weba', 'aac', 'flac', 'wav'}
+
+FILTERS = ('type', 'ext', 'vcodec', 'acodec', 'protocol', 'min_height', 'max_height', 'progressive')
+
+
+def _family(codec, families):
+    if not codec or codec == 'none':
+        return None
+    codec = codec.lower()
+    for prefix, family in families:
+        if codec.startswith(prefix):
+            return family
+    return codec.split('.', 1)[0]
+
+
+def _row(f, position, duration):
+    vcodec = f.get('vcodec')
+    acodec = f.get('acodec')
+    # Sites that don't report codecs leave them unset; go by the container then
+    has_video = vcodec != 'none' and (vcodec is not None or f.get('ext') not in _AUDIO_EXTS)
+    has_audio = acodec != 'none'
+    if not has_video and not has_audio:
+        return None  # storyboards and other image formats
+    kind = 'audio' if not has_video else ('video' if has_audio else 'video_only')
+
+    filesize = f.get('filesize') or f.get('filesize_approx')
+    estimated = not f.get('filesize')
+    tbr = f.get('tbr')
+    bitrate = tbr or f.get('abr') or f.get('vbr')
+    if not filesize and bitrate and duration:
+        filesize = bitrate * 1000 / 8 * duration
+    height = f.get('height')
+    fps = f.get('fps')
+    abr = f.get('abr')
+
+    if kind == 'audio':
+        quality = f'{round(abr)}kbps' if abr else 'audio'
+        resolution = None
+    else:
+        quality = f.get('format_note') or (f'{height}p' if height else 'unknown')
+        if height and fps and fps > 30 and str(quality) == f'{height}p':
+            quality += str(round(fps))
+        resolution = f"{f.get('width') or 0}x{height or 0}"
+
+    row = {
+        'format_id': f.get('format_id'),
+        'type': kind,
+        'ext': f.get('ext'),
+        'protocol': f.get('protocol'),
+        'vcodec': _family(vcodec, _VCODEC_FAMILIES),
+        'acodec': _family(acodec, _ACODEC_FAMILIES),
+        'width': f.get('width'),
+        'height': height,
+        'fps': fps,
+        'resolution': resolution,
+        'quality': str(quality),
+        'tbr': round(tbr) if tbr else None,
+        'abr': round(abr) if abr else None,
+        'filesize': int(filesize) if filesize else None,
+        'filesize_estimated': estimated if filesize else None,
+        'needs_merge': kind == 'video_only',
+    }
+    # Higher sorts first; yt-dlp's own order (worst to best) breaks ties
+    rank = (
+        (height or 0) if kind != 'audio' else (abr or 0),
+        fps or 0,
+        _PROTOCOL_RANK.get(f.get('protocol'), 0),
+        tbr or 0,
+        position,
+    )
+    return rank, row
+
+
+class FormatIndex:
+    """Formats of one video, ranked best first within each type"""
+
+    def __init__(self, info):
+        formats = info.get('formats') or ([info] if info.get('url') else [])
+        duration = info.get('duration')
+        ranked = [r for r in (_row(f, i, duration) for i, f in enumerate(formats)) if r and r[1]['format_id']]
+        ranked.sort(key=lambda r: r[0], reverse=True)
+
+        # Keep the best of formats that differ only in protocol or bitrate
+        self.rows = []
+        seen = set()
+        for _, row in ranked:
+            identity = (row['type'], row['height'], row['fps'], row['vcodec'], row['acodec'], row['ext'],
+                        row['abr'] if row['type'] == 'audio' else None)
+            if identity not in seen:
+                seen.add(identity)
+                self.rows.append(row)
+        self.by_id = {row['format_id']: row for _, row in ranked}
+
+    def query(self, filters=None, offset=0, limit=None):
+        """Rows matching filters; returns (total matches, requested page)"""
+        rows = [row for row in self.rows if _matches(row, filters or {})]
+        end = None if limit is None else offset + limit
+        return len(rows), rows[offset:end]
+
+    def best(self, kind, max_height=None, ext=None, acodec=None):
+        """Best row of a type, or None"""
+        for row in self.rows:
+            if row['type'] != kind or (ext and row['ext'] != ext) or (acodec and row['acodec'] != acodec):
+                continue
+            if max_height and (row['height'] or 0) > max_height:
+                continue
+            return row
+        return None
+
+    def select_video(self, max_height=None, can_merge=True):
+        """Concrete format ID for a video download: merged MP4 when possible.
+
+        Mirrors the selectors the download path used to compile:
+        bestvideo[ext=mp4]+bestaudio[ext=m4a], then best[ext=mp4], then best.
+        Returns None when the index has nothing suitable.
+        """
+        if can_merge:
+            video = self.best('video_only', max_height, ext='mp4')
+            audio = self.best('audio', ext='m4a')
+            if video and audio:
+                return f"{video['format_id']}+{audio['format_id']}"
+        row = (self.best('video', max_height, ext='mp4') or self.best('video', max_height)
+               or self.best('video'))
+        return row['format_id'] if row else None
+
+    def select_audio(self, codecs=None, prefer_m4a=False):
+        """Concrete format ID for an audio download, preferring codecs in order"""
+        for codec in codecs or ():
+            row = self.best('audio', acodec=codec)
+            if row:
+                return row['format_id']
+        row = (self.best('audio', ext='m4a') if prefer_m4a else None) or self.best('audio') or self.best('video')
+        return row['format_id'] if row else None
+
+    def valid(self, format_id):
+        """Whether a requested format ID (or video+audio pair) exists"""
+        return all(part in self.by_id for part in str(format_id).split('+'))
+
+    def with_audio(self, format_id):
+        """Pair a video-only format with the best audio to merge it with"""
+        row = self.by_id.get(format_id)
+        if row is None or not row['needs_merge']:
+            return format_id
+        audio = (self.best('audio', ext='m4a') if row['ext'] == 'mp4' else None) or self.best('audio')
+        return f"{format_id}+{audio['format_id']}" if audio else format_id
+
+
+def _matches(row, filters):
+    for name, value in filters.items():
+        if value is None or value == '':
+            continue
+        if name in ('type', 'ext', 'vcodec', 'acodec', 'protocol'):
+            allowed = value if isinstance(value, (list, tuple)) else str(value).split(',')
+            if row[name] not in allowed:
+                return False
+        elif name == 'min_height' and (row['height'] or 0) < int(value):
+            return False
+        elif name == 'max_height' and (row['height'] or 0) > int(value):
+            return False
+        elif name == 'progressive' and (row['type'] == 'video') != bool(value):
+            return False
+    return True
+
+
+class FormatIndexCache:
+    """FormatIndex per cached info dict, so each is built once.
+
+    Keyed by object identity: when the metadata cache re-extracts a video
+    the new info dict gets a fresh index.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id(info) -> (info, index)
+        self._lock = threading.Lock()
+
+    def get(self, info):
+        key = id(info)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is info:
+                self._entries.move_to_end(key)
+                return entry[1]
+        index = FormatIndex(info)
+        with self._lock:
+            self._entries[key] = (info, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
@@ -0,0 +1,64 @@
+"""
+Streaming of files that are still being downloaded.
+
+For progressive formats fetched over plain HTTP(S) (a single file, no merge,
+fixup or other post-processing) the bytes yt-dlp has written so far are
+already the final file, so they can be sent to the client while the download
+continues. The reader tails the .part file and switches to the final path
+once yt-dlp renames it.
+"""
+
+import os
+import time
+
+from progress_stream import TERMINAL_STATUSES
+
+CHUNK_SIZE = 1024 * 1024
+POLL_INTERVAL = 0.25
+
+
+class DownloadAborted(Exception):
+    """The download behind a live stream failed or was cancelled"""
+
+
+class LiveFile:
+    """Where a streamable download is being written"""
+
+    def __init__(self, tmpfilename, filename, display_name, total_bytes=None):
+        self.tmpfilename = tmpfilename
+        self.filename = filename
+        self.display_name = display_name
+        self.total_bytes = total_bytes
+
+
+def follow(live, get_status, chunk_size=CHUNK_SIZE, poll_interval=POLL_INTERVAL):
+    """Yield the file's bytes as they are written until the download completes.
+
+    get_status() returns the download's current status. The file is
+    reopened for every read so yt-dlp can rename it on any platform.
+    Any status short of a terminal one (e.g. 'processing' while the
+    finished file is being stored) just means more bytes may come. Raises
+    DownloadAborted if the download ends without completing, so the client
+    sees a broken transfer rather than a silently truncated file.
+    """
+    offset = 0
+    while True:
+        status = get_status()
+        path = live.tmpfilename if os.path.exists(live.tmpfilename) else live.filename
+        data = b''
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(chunk_size)
+        except OSError:
+            pass
+
+        if data:
+            offset += len(data)
+            yield data
+            continue
+        if status == 'completed':
+            return
+        if status in TERMINAL_STATUSES:
+            raise DownloadAborted(f'Download ended with status {status!r}')
+        time.sleep(poll_interval)
@@ -0,0 +1,176 @@
+"""
+Process-wide cache for yt-dlp metadata extraction.
+
+A single user flow hits /api/info, /api/formats and /api/download for the
+same URL, so the extracted info dict is shared between them instead of
+being re-extracted for every call.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+_YOUTUBE_ID_RE = re.compile(
+    r'(?:youtube(?:-nocookie)?\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/|v/)'
+    r'|youtu\.be/)([0-9A-Za-z_-]{11})'
+)
+
+# Query parameters that never change what gets extracted
+_TRACKING_PARAMS = {'feature', 'si', 'utm_source', 'utm_medium', 'utm_campaign', 'pp', 't'}
+
+
+def normalize_url(url):
+    """Build a cache key so equivalent URLs share one cache entry"""
+    url = url.strip()
+    match = _YOUTUBE_ID_RE.search(url)
+    if match:
+        return f'youtube:{match.group(1)}'
+
+    parts = urlsplit(url)
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in _TRACKING_PARAMS
+    )
+    return urlunsplit((
+        parts.scheme.lower(),
+        parts.netloc.lower(),
+        parts.path.rstrip('/') or '/',
+        urlencode(query),
+        '',
+    ))
+
+
+class _InFlight:
+    """An extraction in progress that other callers can wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.info = None
+        self.error = None
+
+
+class MetadataCache:
+    """TTL + LRU cache of info dicts with stampede protection.
+
+    Entries are shared between threads and must be treated as read-only;
+    callers that need to mutate an info dict should copy it first.
+    """
+
+    def __init__(self, ttl=900, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, info, stored_at)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, url):
+        """Return the cached info dict for a URL, or None"""
+        key = normalize_url(url)
+        with self._lock:
+            info = self._lookup(key)
+            if info is not None:
+                self.hits += 1
+            return info
+
+    def get_or_extract(self, url, extract):
+        """Return cached info for a URL, calling extract() on a miss.
+
+        Concurrent misses for the same URL wait on a single extraction.
+        Failures are not cached; every waiter receives the same exception.
+        """
+        key = normalize_url(url)
+        with self._lock:
+            info = self._lookup(key)
+            if info is not None:
+                self.hits += 1
+                return info
+
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = self._in_flight[key] = _InFlight()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.coalesced += 1
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.info
+
+        try:
+            pending.info = extract()
+        except Exception as e:
+            pending.error = e
+            raise
+        else:
+            self.put(url, pending.info)
+            return pending.info
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            pending.event.set()
+
+    def put(self, url, info):
+        """Store an info dict for a URL"""
+        key = normalize_url(url)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, info, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stored_at(self, url):
+        """Wall-clock time the cached info for a URL was stored, or None.
+
+        It changes whenever the info is extracted again, so it versions
+        responses built from the entry.
+        """
+        with self._lock:
+            entry = self._entries.get(normalize_url(url))
+            return entry[2] if entry is not None else None
+
+    def invalidate(self, url):
+        """Drop a URL from the cache"""
+        with self._lock:
+            self._entries.pop(normalize_url(url), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _lookup(self, key):
+        # Caller must hold self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, info, _ = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return info
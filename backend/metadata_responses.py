@@ -0,0 +1,144 @@
+"""
+Cacheable, compact metadata responses.
+
+/api/info and /api/formats answer from the metadata cache, so a video's
+response only changes when its info is extracted again. metadata_response()
+tags each response with a weak ETag and Last-Modified derived from that
+extraction, and answers a matching revalidation with 304 before anything is
+serialized. The body can be trimmed to the fields a client asks for, is sent
+as JSON or, when the client prefers it, MessagePack, and is compressed with
+brotli or gzip as the request's Accept-Encoding allows.
+
+Brotli needs the brotli package and MessagePack the msgpack package
+(pip install brotli msgpack); without them those encodings are not offered.
+"""
+
+import gzip
+import hashlib
+import json
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MIN_COMPRESS_BYTES = 1024  # smaller bodies aren't worth the CPU
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # close to gzip's speed, noticeably smaller output
+
+
+def parse_fields(value):
+    """Field names from a comma-separated string or a list, or None for all"""
+    if not value:
+        return None
+    names = value.split(',') if isinstance(value, str) else value
+    return tuple(sorted({str(name).strip() for name in names if str(name).strip()})) or None
+
+
+def select_fields(payload, fields):
+    """Keep only the named fields of payload.
+
+    A dotted name such as formats.format_id keeps that field of each item of
+    a list (or of a nested dict); naming a field outright keeps it whole.
+    """
+    whole = {name for name in fields if '.' not in name}
+    nested = {}
+    for name in fields:
+        parent, _, child = name.partition('.')
+        if child and parent not in whole:
+            nested.setdefault(parent, set()).add(child)
+
+    def trim(item, children):
+        return {k: v for k, v in item.items() if k in children} if isinstance(item, dict) else item
+
+    result = {}
+    for key, value in payload.items():
+        if key in whole:
+            result[key] = value
+        elif key in nested:
+            children = nested[key]
+            result[key] = [trim(item, children) for item in value] if isinstance(value, list) else trim(value, children)
+    return result
+
+
+def _media_types():
+    return [JSON, MSGPACK, 'application/x-msgpack'] if msgpack is not None else [JSON]
+
+
+def _negotiate_media_type():
+    match = request.accept_mimetypes.best_match(_media_types(), default=JSON)
+    return MSGPACK if match == 'application/x-msgpack' else match
+
+
+def _negotiate_encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    accepted = request.accept_encodings
+    match = accepted.best_match(offered + ['identity'], default='identity')
+    # best_match prefers the client's quality values, then our order
+    return match if match in offered and accepted[match] else None
+
+
+def _opaque(tag):
+    """Entity tag without its weak marker, for weak comparison"""
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def _not_modified(etag, last_modified):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = {_opaque(tag) for tag in if_none_match.split(',')}
+        return _opaque(etag) in tags or '*' in tags
+    since = parse_date(request.headers.get('If-Modified-Since'))
+    return since is not None and int(last_modified) <= since.timestamp()
+
+
+def metadata_response(build, version, last_modified, fields=None, cache_control='private, no-cache'):
+    """Response for a metadata payload produced by build().
+
+    version identifies the data build() returns (e.g. the video and the
+    time its info was extracted) and last_modified is when that data was
+    extracted, as a timestamp. build() is only called when the client's
+    copy is out of date.
+    """
+    media_type = _negotiate_media_type()
+    tag = hashlib.sha1(json.dumps([version, fields, media_type], default=str).encode()).hexdigest()[:32]
+    # Weak: the same tag covers every Content-Encoding of the representation
+    etag = f'W/"{tag}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control,
+        'Vary': 'Accept, Accept-Encoding',
+    }
+    if _not_modified(etag, last_modified):
+        return Response(status=304, headers=headers)
+
+    payload = build()
+    if fields:
+        payload = select_fields(payload, fields)
+    if media_type == MSGPACK:
+        body = msgpack.packb(payload, use_bin_type=True)
+    else:
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+    encoding = _negotiate_encoding() if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding == 'br':
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, headers=headers, content_type=media_type)
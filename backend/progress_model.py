@@ -0,0 +1,109 @@
+"""
+Structured download progress.
+
+yt-dlp calls progress hooks for every chunk it writes, and its `_percent_str`
+and `_speed_str` fields are display strings for a terminal. ProgressRecord
+keeps the raw numbers instead, smooths throughput with an exponentially
+weighted moving average, and tells the hook when an update is due so most
+hook calls return after a single clock comparison.
+"""
+
+SPEED_SMOOTHING = 0.3  # EWMA weight of the newest throughput sample
+
+
+class ProgressRecord:
+    """Latest numeric progress of one download"""
+
+    __slots__ = (
+        'min_interval', 'alpha', 'status', 'downloaded_bytes', 'total_bytes', 'total_bytes_estimate',
+        'speed', 'smoothed_speed', 'eta', 'fragment_index', 'fragment_count', 'stage',
+        '_sample_time', '_sample_bytes', '_last_update',
+    )
+
+    def __init__(self, min_interval=0.5, alpha=SPEED_SMOOTHING):
+        self.min_interval = min_interval
+        self.alpha = alpha
+        self.status = 'downloading'
+        self.downloaded_bytes = None
+        self.total_bytes = None
+        self.total_bytes_estimate = None
+        self.speed = None
+        self.smoothed_speed = None
+        self.eta = None
+        self.fragment_index = None
+        self.fragment_count = None
+        self.stage = None
+        self._sample_time = None
+        self._sample_bytes = None
+        self._last_update = float('-inf')
+
+    def due(self, now):
+        """Whether at least min_interval has passed since the last update"""
+        return now - self._last_update >= self.min_interval
+
+    def update(self, d, now):
+        """Take the numbers from a yt-dlp progress hook dict"""
+        self.status = d['status']
+        self.stage = None
+        downloaded = d.get('downloaded_bytes')
+        self.downloaded_bytes = downloaded
+        self.total_bytes = d.get('total_bytes')
+        self.total_bytes_estimate = d.get('total_bytes_estimate')
+        self.speed = d.get('speed')
+        self.eta = d.get('eta')
+        self.fragment_index = d.get('fragment_index')
+        self.fragment_count = d.get('fragment_count')
+
+        # Sample throughput between updates rather than trusting the
+        # per-chunk speed, which swings wildly from one chunk to the next
+        if downloaded is not None and self._sample_time is not None and now > self._sample_time:
+            rate = (downloaded - self._sample_bytes) / (now - self._sample_time)
+            # A negative rate means the next format (e.g. the audio) started
+            if rate >= 0:
+                if self.smoothed_speed is None:
+                    self.smoothed_speed = rate
+                else:
+                    self.smoothed_speed = self.alpha * rate + (1 - self.alpha) * self.smoothed_speed
+        self._sample_time = now
+        self._sample_bytes = downloaded or 0
+        self._last_update = now
+
+    def start_stage(self, name):
+        """Record that a post-processor (merge, audio extraction...) is running"""
+        self.status = 'processing'
+        self.stage = name
+
+    @property
+    def percent(self):
+        if self.status in ('finished', 'processing'):
+            return 100
+        total = self.total_bytes or self.total_bytes_estimate
+        if total and self.downloaded_bytes is not None:
+            return round(min(self.downloaded_bytes / total, 1) * 100, 1)
+        if self.fragment_count and self.fragment_index is not None:
+            return round(self.fragment_index / self.fragment_count * 100, 1)
+        return None
+
+    @property
+    def smoothed_eta(self):
+        total = self.total_bytes or self.total_bytes_estimate
+        if total and self.downloaded_bytes is not None and self.smoothed_speed:
+            return max(round((total - self.downloaded_bytes) / self.smoothed_speed), 0)
+        return self.eta
+
+    def to_payload(self):
+        """Progress payload; unknown values are left out rather than zeroed"""
+        payload = {'status': self.status, 'progress': self.percent}
+        fields = {
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.total_bytes,
+            'total_bytes_estimate': None if self.total_bytes else self.total_bytes_estimate,
+            'speed': round(self.smoothed_speed) if self.smoothed_speed is not None else None,
+            'instant_speed': round(self.speed) if self.speed is not None else None,
+            'eta': self.smoothed_eta,
+            'fragment_index': self.fragment_index,
+            'fragment_count': self.fragment_count,
+            'stage': self.stage,
+        }
+        payload.update((k, v) for k, v in fields.items() if v is not None)
+        return payload
@@ -0,0 +1,265 @@
+"""
+Storage for the download progress table.
+
+The table maps a download ID to its latest progress payload. By default it
+is a dict in the server process; the SQLite and Redis stores share it
+between server processes (so a poll can hit any worker) and keep it across
+restarts. Shared stores buffer writes in memory and flush them in one batch
+every flush_interval, so frequent progress updates don't become one write
+each; final states are written through immediately.
+
+    PROGRESS_STORE=memory                    (default)
+    PROGRESS_STORE=sqlite:///path/progress.db
+    PROGRESS_STORE=redis://localhost:6379/0  (needs `pip install redis`)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+
+from progress_stream import TERMINAL_STATUSES
+
+_DELETED = object()
+
+
+class MemoryProgressStore(dict):
+    """Progress table private to this process"""
+
+    shared = False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self)}
+
+
+class BufferedProgressStore(MutableMapping):
+    """Progress table in an external store, with write-behind batching.
+
+    Subclasses implement _load(download_id), _ids() and
+    _write(updates, deletes).
+    """
+
+    shared = True
+    backend = None
+
+    def __init__(self, flush_interval=0.5):
+        self.flush_interval = flush_interval
+        self._pending = {}  # download_id -> payload or _DELETED
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._closed = threading.Event()
+        self.buffered_writes = 0
+        self.flushes = 0
+
+    def __getitem__(self, download_id):
+        with self._lock:
+            payload = self._pending.get(download_id)
+        if payload is _DELETED:
+            raise KeyError(download_id)
+        if payload is None:
+            payload = self._load(download_id)
+            if payload is None:
+                raise KeyError(download_id)
+        return payload
+
+    def __setitem__(self, download_id, payload):
+        with self._lock:
+            self._pending[download_id] = payload
+            self.buffered_writes += 1
+        if payload.get('status') in TERMINAL_STATUSES or self.flush_interval <= 0:
+            self.flush()
+        else:
+            self._start_flusher()
+
+    def __delitem__(self, download_id):
+        if download_id not in self:
+            raise KeyError(download_id)
+        with self._lock:
+            self._pending[download_id] = _DELETED
+        self._start_flusher()
+
+    def __contains__(self, download_id):
+        try:
+            self[download_id]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        ids = set(self._ids())
+        with self._lock:
+            for download_id, payload in self._pending.items():
+                if payload is _DELETED:
+                    ids.discard(download_id)
+                else:
+                    ids.add(download_id)
+        return iter(list(ids))
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def flush(self):
+        """Write all buffered changes in one batch"""
+        with self._flush_lock:
+            with self._lock:
+                pending = dict(self._pending)
+            if not pending:
+                return
+            self._write(
+                {k: v for k, v in pending.items() if v is not _DELETED},
+                [k for k, v in pending.items() if v is _DELETED],
+            )
+            self.flushes += 1
+            # Keep anything that changed again while we were writing
+            with self._lock:
+                for download_id, payload in pending.items():
+                    if self._pending.get(download_id) is payload:
+                        del self._pending[download_id]
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'backend': self.backend,
+            'pending_writes': pending,
+            'buffered_writes': self.buffered_writes,
+            'flushes': self.flushes,
+        }
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name='progress-flush', daemon=True)
+        self._flusher.start()
+
+    def _run_flusher(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep the buffer and retry on the next tick
+                print(f'Progress store flush failed: {e}')
+
+    def _load(self, download_id):
+        raise NotImplementedError
+
+    def _ids(self):
+        raise NotImplementedError
+
+    def _write(self, updates, deletes):
+        raise NotImplementedError
+
+
+class SQLiteProgressStore(BufferedProgressStore):
+    """Progress table in a SQLite database in WAL mode.
+
+    WAL lets processes read progress while another one is writing, which is
+    what several server processes on one machine need.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, path, flush_interval=0.5):
+        super().__init__(flush_interval)
+        self.path = path
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Consistent under WAL; a crash can only lose the last flush
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS progress (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+
+    def _load(self, download_id):
+        with self._db_lock:
+            row = self._conn.execute('SELECT payload FROM progress WHERE id = ?', (download_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _ids(self):
+        with self._db_lock:
+            return [row[0] for row in self._conn.execute('SELECT id FROM progress')]
+
+    def _write(self, updates, deletes):
+        now = time.time()
+        with self._db_lock:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO progress (id, payload, updated_at) VALUES (?, ?, ?)',
+                    [(download_id, json.dumps(payload), now) for download_id, payload in updates.items()],
+                )
+                self._conn.executemany('DELETE FROM progress WHERE id = ?', [(k,) for k in deletes])
+
+    def close(self):
+        super().close()
+        with self._db_lock:
+            self._conn.close()
+
+
+class RedisProgressStore(BufferedProgressStore):
+    """Progress table in one Redis hash.
+
+    Works with any server speaking the Redis protocol (Redis, Valkey,
+    KeyDB). Pass client to use an existing connection, e.g. a local
+    stand-in such as fakeredis.FakeRedis() in tests.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, url='redis://localhost:6379/0', key='video-downloader:progress',
+                 flush_interval=0.5, client=None):
+        super().__init__(flush_interval)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError('The Redis progress store needs the redis package: pip install redis')
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self.key = key
+
+    def _load(self, download_id):
+        raw = self._client.hget(self.key, download_id)
+        return json.loads(raw) if raw is not None else None
+
+    def _ids(self):
+        return [k.decode() if isinstance(k, bytes) else k for k in self._client.hkeys(self.key)]
+
+    def _write(self, updates, deletes):
+        pipe = self._client.pipeline(transaction=False)
+        if updates:
+            pipe.hset(self.key, mapping={k: json.dumps(v) for k, v in updates.items()})
+        if deletes:
+            pipe.hdel(self.key, *deletes)
+        pipe.execute()
+
+
+def open_progress_store(spec, flush_interval=0.5):
+    """Create the progress store described by a PROGRESS_STORE value"""
+    if not spec or spec == 'memory':
+        return MemoryProgressStore()
+    if spec.startswith('sqlite:///'):
+        return SQLiteProgressStore(spec[len('sqlite:///'):], flush_interval)
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisProgressStore(spec, flush_interval=flush_interval)
+    raise ValueError(f'Unknown progress store {spec!r}; use memory, sqlite:///<path> or redis://<host>')
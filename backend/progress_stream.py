@@ -0,0 +1,122 @@
+"""
+Push-based progress updates.
+
+Progress writes go through ProgressBroker.publish(), which updates the
+shared progress table and wakes any Server-Sent Events streams. Streams only
+send an ID when its payload actually changed and never more often than
+min_interval, so yt-dlp's very frequent hook calls are coalesced. When the
+table is shared with other processes, whose writes can't wake this one,
+streams also re-read it every poll_interval.
+
+Every open stream holds a server thread, so StreamSlots caps how many
+long-lived responses a process serves at once.
+"""
+
+import json
+import threading
+import time
+
+TERMINAL_STATUSES = ('completed', 'error', 'cancelled', 'not_found')
+
+
+class ProgressBroker:
+    """Progress table plus a change notification for streaming clients"""
+
+    def __init__(self, table, min_interval=0.5, keepalive=15, poll_interval=None):
+        self.table = table
+        self.min_interval = min_interval
+        self.keepalive = keepalive
+        self.poll_interval = poll_interval
+        self._cond = threading.Condition()
+        self._seq = 0
+        self.subscribers = 0
+
+    def publish(self, download_id, payload):
+        """Store a download's latest progress and wake streaming clients"""
+        self.table[download_id] = payload
+        with self._cond:
+            self._seq += 1
+            self._cond.notify_all()
+
+    def wait(self, seq, timeout):
+        """Block until something is published after seq; returns the new seq"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != seq, timeout)
+            return self._seq
+
+    def stream(self, download_ids, snapshot):
+        """Yield SSE frames for download_ids until they all reach a final state.
+
+        snapshot(download_id) returns the payload to send for an ID.
+        """
+        last_sent = {}
+        seq = -1
+        last_emit = 0.0
+        last_yield = time.monotonic()
+        with self._cond:
+            self.subscribers += 1
+        try:
+            yield f'retry: {int(self.keepalive * 1000)}\n\n'
+            while True:
+                frames = []
+                finished = True
+                for download_id in download_ids:
+                    payload = snapshot(download_id)
+                    if payload.get('status') not in TERMINAL_STATUSES:
+                        finished = False
+                    if last_sent.get(download_id) != payload:
+                        last_sent[download_id] = payload
+                        frames.append(format_event(dict(payload, download_id=download_id)))
+                if frames:
+                    last_emit = last_yield = time.monotonic()
+                    yield ''.join(frames)
+                if finished:
+                    return
+
+                new_seq = self.wait(seq, self.poll_interval or self.keepalive)
+                if new_seq == seq and time.monotonic() - last_yield >= self.keepalive:
+                    # Nothing changed; keep proxies from closing an idle stream
+                    last_yield = time.monotonic()
+                    yield ': keepalive\n\n'
+                seq = new_seq
+
+                # Coalesce bursts of updates into one frame per interval
+                delay = self.min_interval - (time.monotonic() - last_emit)
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+
+def format_event(payload, event='progress'):
+    """Encode a payload as one Server-Sent Events message"""
+    return f'event: {event}\ndata: {json.dumps(payload, separators=(",", ":"))}\n\n'
+
+
+class StreamSlots:
+    """Counts long-lived responses (progress and live file streams) against a limit.
+
+    Each one holds a server thread for as long as it is open; refusing new
+    ones past the limit keeps the remaining threads free for short requests.
+    A limit of 0 means no limit.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """Take a slot; returns False when all slots are in use"""
+        with self._lock:
+            if self.limit and self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
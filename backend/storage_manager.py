@@ -0,0 +1,157 @@
+"""
+Disk budget enforcement for the downloads directory.
+
+Artifacts in the content store are evicted least-recently (or
+least-frequently) used first once the store grows past its byte budget.
+Artifacts that are being built, are being sent or were completed recently
+are pinned so clients always get a chance to fetch what they asked for. The same
+background sweep expires finished entries from the progress table.
+"""
+
+import os
+import threading
+import time
+
+from progress_stream import TERMINAL_STATUSES
+
+
+class StorageManager:
+    """Keeps the content store under a byte budget"""
+
+    def __init__(self, store, budget_bytes, policy='lru', pin_seconds=600,
+                 max_age=0, progress=None, progress_ttl=3600):
+        if policy not in ('lru', 'lfu'):
+            raise ValueError(f'Unknown eviction policy: {policy}')
+        self.store = store
+        self.budget_bytes = budget_bytes
+        self.policy = policy
+        self.pin_seconds = pin_seconds
+        self.max_age = max_age
+        self.progress = progress
+        self.progress_ttl = progress_ttl
+        self._lock = threading.Lock()
+        self._pins = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self.evicted_artifacts = 0
+        self.evicted_bytes = 0
+        self.expired_artifacts = 0
+        self.expired_bytes = 0
+        self.expired_progress = 0
+
+    def record_access(self, key):
+        """Note that an artifact was served"""
+        self.store.touch(key)
+
+    def pin(self, key):
+        """Keep an artifact from being evicted until unpin(), e.g. while it is sent"""
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key):
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    def is_pinned(self, entry, now=None):
+        now = now or time.time()
+        with self._lock:
+            if self._pins.get(entry['key']):
+                return True
+        if self.store.is_in_flight(entry['key']):
+            return True
+        return now - entry['created_at'] < self.pin_seconds
+
+    def enforce(self):
+        """Expire old artifacts, then evict until the store fits the budget"""
+        now = time.time()
+        entries = self.store.entries()
+
+        if self.max_age:
+            for entry in entries:
+                if now - entry['created_at'] > self.max_age and not self.is_pinned(entry, now):
+                    freed = self._delete(entry)
+                    self.expired_artifacts += 1
+                    self.expired_bytes += freed
+            entries = self.store.entries()
+
+        total = sum(entry['size'] for entry in entries)
+        if total <= self.budget_bytes:
+            return
+
+        if self.policy == 'lfu':
+            order = lambda entry: (entry.get('hits', 0), entry.get('last_access', entry['created_at']))
+        else:
+            order = lambda entry: entry.get('last_access', entry['created_at'])
+
+        for entry in sorted(entries, key=order):
+            if total <= self.budget_bytes:
+                break
+            if self.is_pinned(entry, now):
+                continue
+            freed = self._delete(entry)
+            total -= entry['size']
+            self.evicted_artifacts += 1
+            self.evicted_bytes += freed
+
+    def expire_progress(self):
+        """Drop finished entries from the progress table after progress_ttl"""
+        if self.progress is None:
+            return
+        cutoff = time.time() - self.progress_ttl
+        for download_id, entry in list(self.progress.items()):
+            if entry.get('status') in TERMINAL_STATUSES and entry.get('finished_at', cutoff) < cutoff:
+                self.progress.pop(download_id, None)
+                self.expired_progress += 1
+
+    def sweep(self):
+        self.enforce()
+        self.expire_progress()
+        self.store.flush()
+
+    def start(self, interval=60):
+        """Run sweep() every interval seconds on a daemon thread"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f'Storage sweep failed: {e}')
+
+        self._thread = threading.Thread(target=run, name='storage-manager', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        entries = self.store.entries()
+        return {
+            'policy': self.policy,
+            'budget_bytes': self.budget_bytes,
+            'stored_bytes': sum(entry['size'] for entry in entries),
+            'artifacts': len(entries),
+            'evicted_artifacts': self.evicted_artifacts,
+            'evicted_bytes': self.evicted_bytes,
+            'expired_artifacts': self.expired_artifacts,
+            'expired_bytes': self.expired_bytes,
+            'reclaimed_bytes': self.evicted_bytes + self.expired_bytes,
+            'expired_progress_entries': self.expired_progress,
+        }
+
+    def _delete(self, entry):
+        """Remove an artifact from the index and disk; returns bytes freed"""
+        self.store.remove(entry['key'])
+        path = self.store.path_for(entry)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return 0
+        return size
@@ -5,6 +5,7 @@ Run this after starting the server to verify all endpoints work
 
 import requests
 import json
+import time
 
 BASE_URL = "http://localhost:5000"
 TEST_VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
@@ -68,6 +69,58 @@ def test_formats():
         print(f"❌ Error: {e}")
         return False
 
+def test_download():
+    """Test download endpoint: queue a download, poll its progress, then fetch the file"""
+    print("Testing Download Endpoint...")
+    print("⚠️  This will actually download the video!")
+    print("Press Enter to continue or Ctrl+C to skip...")
+    try:
+        input()
+    except KeyboardInterrupt:
+        print("\nSkipped download test")
+        return True
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/download",
+            json={
+                "url": TEST_VIDEO_URL,
+                "format": "audio",  # Download audio to save time
+                "quality": "best"
+            },
+            headers={"Content-Type": "application/json"},
+            timeout=120
+        )
+        print(f"Status Code: {response.status_code}")
+        data = response.json()
+        if not data.get('success'):
+            print(f"❌ Download failed: {data.get('error', 'Unknown error')}")
+            return False
+        
+        # The download runs in the background; poll until it finishes
+        download_id = data['download_id']
+        print(f"Download ID: {download_id} ({data.get('status')})")
+        deadline = time.time() + 300  # 5 minutes timeout
+        progress = data
+        while progress.get('status') not in ('completed', 'error', 'cancelled') and time.time() < deadline:
+            time.sleep(1)
+            progress = requests.get(f"{BASE_URL}/api/progress/{download_id}", timeout=30).json()
+            print(f"  {progress.get('status')}: {progress.get('progress', 0)}%")
+        
+        if progress.get('status') != 'completed':
+            print(f"❌ Download failed: {progress.get('error', progress.get('status', 'timed out'))}")
+            return False
+        print(f"✅ Download successful!")
+        print(f"Filename: {progress.get('filename', 'N/A')}")
+        print(f"Download URL: {progress.get('download_url', 'N/A')}")
+        
+        file_response = requests.get(f"{BASE_URL}{progress['download_url']}", timeout=300)
+        print(f"File: {file_response.status_code}, {len(file_response.content):,} bytes")
+        return file_response.status_code == 200
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        return False
+
 def main():
     print("="*60)
     print("Video Downloader Backend API Test Suite")
@@ -91,6 +144,9 @@ def main():
     print_separator()
     results['formats'] = test_formats()
     
+    print_separator()
+    results['download'] = test_download()
+    
     # Summary
     print_separator()
     print("TEST SUMMARY")
@@ -0,0 +1,47 @@
+"""
+Shared fixtures. Everything runs offline: media comes from the fake origin
+in benchmarks/, and the app gets its own downloads directory, journal and
+thumbnail cache under a temporary directory.
+"""
+
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, 'benchmarks')]
+
+from fake_origin import FakeOrigin  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def origin():
+    server = FakeOrigin(media_bytes=256 * 1024).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """The app module, imported once with its state in a temporary directory"""
+    workdir = tmp_path_factory.mktemp('app')
+    os.environ.update({
+        'FFMPEG_PATH': 'none',
+        'JOB_JOURNAL_PATH': str(workdir / 'jobs.db'),
+        'THUMBNAIL_DIR': str(workdir / 'thumbnails'),
+    })
+    cwd = os.getcwd()
+    # DOWNLOAD_DIR is taken from the working directory at import
+    os.chdir(workdir)
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    yield app
+    app.scheduler.shutdown(drain=False, timeout=5)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from batch_info import iter_batch
+
+
+def resolve_videos(url):
+    return 'video', {'id': url}, None
+
+
+def test_results_cover_videos_playlists_and_errors():
+    def resolve(url):
+        if url == 'playlist':
+            return 'playlist', {'id': 'pl', 'title': 'List'}, ['e1', 'e2']
+        if url == 'bad':
+            raise ValueError('unsupported URL')
+        return resolve_videos(url)
+
+    results = list(iter_batch(['v', 'playlist', 'bad'], resolve, lambda url: {'id': url}))
+    by_url = {r['url']: r for r in results}
+    assert by_url['v']['info'] == {'id': 'v'}
+    assert by_url['bad']['error'] == 'unsupported URL'
+    assert by_url['playlist']['playlist'] == {'id': 'pl', 'title': 'List', 'count': 2}
+    assert by_url['e2'] == {'index': 1, 'url': 'e2', 'playlist': {'id': 'pl', 'index': 2}, 'info': {'id': 'e2'}}
+
+
+def test_playlist_entries_stop_at_the_limit():
+    def resolve(url):
+        return 'playlist', {'id': 'pl'}, ['e1', 'e2', 'e3']
+
+    results = list(iter_batch(['playlist'], resolve, lambda url: {'id': url}, max_items=2))
+    assert [r['url'] for r in results if 'info' in r] == ['e1']
+    assert [r['url'] for r in results if 'error' in r] == ['e2']
+    assert 'Batch limit of 2 videos reached' in [r.get('error') for r in results]
+
+
+def test_closing_early_cancels_queued_work_without_waiting():
+    release = threading.Event()
+    started = []
+
+    def resolve(url):
+        started.append(url)
+        if url != 'fast':
+            release.wait(5)
+        return resolve_videos(url)
+
+    results = iter_batch(['fast', 'slow', 'queued-1', 'queued-2'], resolve, None, parallelism=2)
+    assert next(results)['url'] == 'fast'
+    begun = time.monotonic()
+    results.close()  # what a client disconnect does to the response generator
+    assert time.monotonic() - begun < 1
+    release.set()
+    time.sleep(0.1)
+    # 'fast' and 'slow' ran; at most one queued URL slipped in before the close
+    assert len(started) <= 3
@@ -0,0 +1,114 @@
+import hashlib
+
+import pytest
+
+from content_store import ContentStore, artifact_key, video_key
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ContentStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def write(directory, name, data=b'media'):
+    path = directory / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_artifact_key_depends_on_every_option():
+    video = video_key({'extractor_key': 'Youtube', 'id': 'abc'})
+    assert video == 'Youtube:abc'
+    key = artifact_key(video, 'best')
+    assert key == artifact_key(video, 'best')
+    assert len({
+        key,
+        artifact_key(video, 'bestaudio'),
+        artifact_key(video, 'best', postprocessors=[{'key': 'FFmpegExtractAudio'}]),
+        artifact_key(video, 'best', clip=[0, 30]),
+        artifact_key('Youtube:other', 'best'),
+    }) == 5
+
+
+def test_add_and_look_up(store, tmp_path):
+    path = write(tmp_path, 'k1.mp4')
+    entry = store.add('k1', path, 'Video.mp4', title='Video')
+    assert entry['size'] == 5
+    assert entry['sha256'] == hashlib.sha256(b'media').hexdigest()
+    assert store.get('k1')['title'] == 'Video'
+    assert store.get_by_file('k1.mp4')['key'] == 'k1'
+    assert store.path_for(entry) == path
+    assert store.stats() == {'artifacts': 1, 'bytes': 5, 'in_flight': 0}
+
+
+def test_missing_file_is_not_served(store, tmp_path):
+    path = write(tmp_path, 'k1.mp4')
+    store.add('k1', path, 'Video.mp4')
+    (tmp_path / 'k1.mp4').unlink()
+    assert store.get('k1') is None
+    assert store.get_by_file('k1.mp4') is None
+
+
+def test_accesses_are_counted_and_flushed(store, tmp_path):
+    store.add('k1', write(tmp_path, 'k1.mp4'), 'Video.mp4')
+    store.touch('k1')
+    store.touch('k1')
+    # Visible before the flush, and kept after it
+    assert store.get('k1')['hits'] == 2
+    store.flush()
+    store.touch('k1')
+    entry = store.get('k1')
+    assert entry['hits'] == 3
+    assert entry['last_access'] > 0
+
+
+def test_index_is_shared_between_processes(store, tmp_path):
+    other = ContentStore(str(tmp_path))
+    try:
+        store.add('k1', write(tmp_path, 'k1.mp4'), 'One.mp4')
+        other.add('k2', write(tmp_path, 'k2.mp4'), 'Two.mp4')
+        assert {entry['key'] for entry in store.entries()} == {'k1', 'k2'}
+        assert other.get('k1')['display_name'] == 'One.mp4'
+
+        store.touch('k2')
+        other.touch('k2')
+        store.flush()
+        other.flush()
+        assert store.get('k2')['hits'] == 2
+    finally:
+        other.close()
+
+
+def test_claim_and_release(store):
+    assert store.claim('k1', 'job-1') is None
+    assert store.claim('k1', 'job-2') == 'job-1'
+    assert store.is_in_flight('k1')
+    store.release('k1', 'job-2')  # not the owner: no effect
+    assert store.is_in_flight('k1')
+    store.release('k1', 'job-1')
+    assert not store.is_in_flight('k1')
+
+
+def test_remove_orphans_keeps_stored_and_resumable_files(store, tmp_path):
+    done, resumable, orphan = (artifact_key('Youtube:' + name, 'best') for name in ('done', 'resumable', 'orphan'))
+    store.add(done, write(tmp_path, done + '.mp4'), 'Done.mp4')
+    write(tmp_path, resumable + '.mp4.part', b'12345678')
+    write(tmp_path, orphan + '.mp4.part', b'1234')
+    (tmp_path / (orphan + '.x1y2')).mkdir()
+    write(tmp_path / (orphan + '.x1y2'), 'clip.ts', b'12')
+
+    assert store.remove_orphans(keep_keys=[resumable]) == (2, 6)
+    assert sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith('index.db')) == sorted([
+        done + '.mp4', resumable + '.mp4.part'])
+
+
+def test_remove_orphans_leaves_downloads_saved_by_title(store, tmp_path):
+    write(tmp_path, 'My Old Video.mp4')
+    write(tmp_path, 'Another title.mp3')
+    write(tmp_path, artifact_key('Youtube:gone', 'best') + '.webm.part')
+
+    assert store.remove_orphans() == (1, 5)
+    assert sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith('index.db')) == [
+        'Another title.mp3', 'My Old Video.mp4']
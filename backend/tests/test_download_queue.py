@@ -0,0 +1,203 @@
+import threading
+import time
+
+import pytest
+
+from download_queue import DownloadJob, DownloadScheduler, JobCancelled, JobExists, JobJournal, host_key
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+class Recorder:
+    """run_job/on_finish pair that records the order jobs ran and ended in"""
+
+    def __init__(self, block=False):
+        self.started = []
+        self.finished = {}
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def run_job(self, job):
+        self.started.append(job.id)
+        while not self.release.wait(0.01):
+            job.check_cancelled()
+        job.check_cancelled()
+
+    def on_finish(self, job, error):
+        self.finished[job.id] = error
+
+
+def test_host_key_groups_aliases():
+    assert host_key('https://www.youtube.com/watch?v=x') == 'youtube.com'
+    assert host_key('https://youtu.be/x') == 'youtube.com'
+    assert host_key('https://m.example.com/v') == 'example.com'
+
+
+def test_jobs_run_in_priority_order():
+    recorder = Recorder(block=True)
+    scheduler = DownloadScheduler(recorder.run_job, workers=1, on_finish=recorder.on_finish)
+    scheduler.start()
+    first = DownloadJob('https://a.example/1', job_id='first')
+    scheduler.submit(first)
+    wait_until(lambda: recorder.started == ['first'])
+    scheduler.submit(DownloadJob('https://a.example/2', priority=9, job_id='low'))
+    assert scheduler.submit(DownloadJob('https://a.example/3', priority=1, job_id='high')) == 1
+    recorder.release.set()
+    wait_until(lambda: len(recorder.finished) == 3)
+    assert recorder.started == ['first', 'high', 'low']
+    scheduler.shutdown()
+
+
+def test_per_host_limit():
+    recorder = Recorder(block=True)
+    scheduler = DownloadScheduler(recorder.run_job, workers=3, per_host_limit=1, on_finish=recorder.on_finish)
+    scheduler.start()
+    scheduler.submit(DownloadJob('https://a.example/1', job_id='a1'))
+    scheduler.submit(DownloadJob('https://a.example/2', job_id='a2'))
+    scheduler.submit(DownloadJob('https://b.example/1', job_id='b1'))
+    wait_until(lambda: len(recorder.started) == 2)
+    assert sorted(recorder.started) == ['a1', 'b1']
+    assert scheduler.stats()['running_per_host'] == {'a.example': 1, 'b.example': 1}
+    recorder.release.set()
+    wait_until(lambda: len(recorder.finished) == 3)
+    scheduler.shutdown()
+
+
+def test_cancel_queued_and_running():
+    recorder = Recorder(block=True)
+    scheduler = DownloadScheduler(recorder.run_job, workers=1, on_finish=recorder.on_finish)
+    scheduler.start()
+    scheduler.submit(DownloadJob('https://a.example/1', job_id='running'))
+    scheduler.submit(DownloadJob('https://a.example/2', job_id='queued'))
+    wait_until(lambda: recorder.started == ['running'])
+
+    assert scheduler.cancel('queued')
+    assert isinstance(recorder.finished['queued'], JobCancelled)
+    assert scheduler.cancel('running')
+    wait_until(lambda: 'running' in recorder.finished)
+    assert isinstance(recorder.finished['running'], JobCancelled)
+    assert not scheduler.cancel('unknown')
+    assert recorder.started == ['running']
+    scheduler.shutdown()
+
+
+def test_queued_jobs_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    recorder = Recorder(block=True)
+    scheduler = DownloadScheduler(recorder.run_job, workers=1, journal=JobJournal(path))
+    scheduler.start()
+    scheduler.submit(DownloadJob('https://a.example/1', job_id='running'))
+    wait_until(lambda: recorder.started == ['running'])
+    scheduler.submit(DownloadJob('https://a.example/2', {'format': 'audio'}, priority=3, job_id='queued'))
+    scheduler.journal.save_checkpoint('running', {'downloaded_bytes': 10})
+    scheduler.shutdown(drain=False, timeout=5)
+
+    restored = {job.id: job for job in JobJournal(path).pending()}
+    assert set(restored) == {'running', 'queued'}
+    assert restored['queued'].options == {'format': 'audio'}
+    assert restored['queued'].priority == 3
+    assert restored['running'].checkpoint == {'downloaded_bytes': 10}
+
+
+def test_jobs_of_a_live_owner_are_not_taken_over(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    owner = JobJournal(path, lease_seconds=30)
+    owner.record(DownloadJob('https://a.example/1', job_id='job'))
+    other = JobJournal(path, lease_seconds=30)
+    assert other.pending() == []
+    # The owner's own rows are never handed back to it
+    assert owner.pending() == []
+
+    owner.release()
+    assert [job.id for job in other.pending()] == ['job']
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    owner = JobJournal(path, lease_seconds=0.2)
+    owner.record(DownloadJob('https://a.example/1', job_id='job'))
+    other = JobJournal(path, lease_seconds=0.2)
+    assert other.pending() == []
+    time.sleep(0.3)
+    other.heartbeat()
+    assert [job.id for job in other.pending()] == ['job']
+
+
+def test_cancel_through_another_process(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    recorder = Recorder(block=True)
+    owner = DownloadScheduler(recorder.run_job, workers=1, journal=JobJournal(path),
+                              on_finish=recorder.on_finish, cancel_poll_interval=0.05)
+    owner.start()
+    owner.submit(DownloadJob('https://a.example/1', job_id='job'))
+    wait_until(lambda: recorder.started == ['job'])
+
+    other = DownloadScheduler(Recorder().run_job, journal=JobJournal(path))
+    assert other.cancel('job')
+    assert not other.cancel('unknown')
+    wait_until(lambda: 'job' in recorder.finished)
+    assert isinstance(recorder.finished['job'], JobCancelled)
+    owner.shutdown()
+
+
+def test_job_cancelled_before_takeover_is_not_run(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    gone = JobJournal(path)
+    gone.record(DownloadJob('https://a.example/1', job_id='job'))
+    gone.request_cancel('job')
+    gone.release()
+
+    recorder = Recorder()
+    scheduler = DownloadScheduler(recorder.run_job, journal=JobJournal(path), on_finish=recorder.on_finish)
+    assert [job.id for job in scheduler.start()] == ['job']
+    assert isinstance(recorder.finished['job'], JobCancelled)
+    assert recorder.started == []
+    assert not scheduler.journal.contains('job')
+    scheduler.shutdown()
+
+
+def test_processes_join_the_job_building_a_key(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    recorder = Recorder(block=True)
+    owner = DownloadScheduler(recorder.run_job, workers=1, journal=JobJournal(path),
+                              on_finish=recorder.on_finish, cancel_poll_interval=0.05)
+    owner.start()
+    owner.submit(DownloadJob('https://a.example/1', job_id='job', key='k1'))
+    wait_until(lambda: recorder.started == ['job'])
+
+    other = DownloadScheduler(Recorder().run_job, journal=JobJournal(path))
+    with pytest.raises(JobExists) as exists:
+        other.submit(DownloadJob('https://a.example/1', job_id='copy', key='k1'))
+    assert exists.value.job_id == 'job'
+    assert other.join('job')
+    assert owner.leave('job') == 1
+    assert 'job' not in recorder.finished
+    assert other.leave('job') == 0
+    wait_until(lambda: 'job' in recorder.finished)
+    assert isinstance(recorder.finished['job'], JobCancelled)
+    assert other.leave('job') is None
+
+    # The key is free again once the job has ended
+    other.submit(DownloadJob('https://a.example/1', job_id='again', key='k1'))
+    owner.shutdown()
+
+
+def test_last_client_to_leave_cancels_without_a_journal():
+    recorder = Recorder(block=True)
+    scheduler = DownloadScheduler(recorder.run_job, workers=1, on_finish=recorder.on_finish)
+    scheduler.start()
+    scheduler.submit(DownloadJob('https://a.example/1', job_id='job'))
+    assert scheduler.join('job')
+    assert scheduler.leave('job') == 1
+    assert scheduler.leave('job') == 0
+    wait_until(lambda: 'job' in recorder.finished)
+    assert scheduler.leave('job') is None
+    assert not scheduler.join('job')
+    scheduler.shutdown()
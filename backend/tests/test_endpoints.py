@@ -0,0 +1,144 @@
+"""
+End-to-end API tests against the fake origin (no network access needed).
+"""
+
+import json
+import time
+import zipfile
+from io import BytesIO
+
+from fake_origin import FakeOrigin
+
+
+def wait_for(client, download_id, timeout=30):
+    """Poll /api/progress until the download reaches a final state"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        progress = client.get(f'/api/progress/{download_id}').get_json()
+        if progress['status'] in ('completed', 'error', 'cancelled'):
+            return progress
+        time.sleep(0.1)
+    raise AssertionError(f'{download_id} did not finish: {progress}')
+
+
+def test_info_batch_streams_ndjson(client, origin):
+    urls = [origin.video_url('one'), origin.video_url('two'), f'{origin.base_url}/missing']
+    response = client.post('/api/info/batch', json={'urls': urls})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    results = sorted((json.loads(line) for line in response.data.splitlines()), key=lambda r: r['index'])
+    assert [r['index'] for r in results] == [0, 1, 2]
+    assert results[0]['url'] == urls[0]
+    assert results[0]['info']['id'] == 'one'
+    assert results[1]['info']['id'] == 'two'
+    assert 'error' in results[2] and 'info' not in results[2]
+
+
+def test_info_batch_rejects_bad_input(client):
+    assert client.post('/api/info/batch', json={'urls': []}).status_code == 400
+    assert client.post('/api/info/batch', json={'urls': 'not a list'}).status_code == 400
+
+
+def test_download_then_fetch(client, origin):
+    response = client.post('/api/download', json={'url': origin.video_url('fetch')})
+    assert response.status_code == 200
+    queued = response.get_json()
+    assert queued['status'] == 'queued'
+
+    progress = wait_for(client, queued['download_id'])
+    assert progress['status'] == 'completed'
+    file_response = client.get(progress['download_url'])
+    assert file_response.status_code == 200
+    assert len(file_response.data) == origin.media_bytes
+
+    # The same request again is served from the content store
+    again = client.post('/api/download', json={'url': origin.video_url('fetch')}).get_json()
+    assert again['status'] == 'completed'
+    assert again['download_url'] == progress['download_url']
+
+
+def test_head_requests_are_not_counted_as_served(client, origin, app_module):
+    queued = client.post('/api/download', json={'url': origin.video_url('head')}).get_json()
+    url = wait_for(client, queued['download_id'])['download_url']
+
+    def served():
+        return app_module.BYTES_SERVED._values.get(('get_file',), 0)
+
+    before = served()
+    assert client.head(url).status_code == 200
+    assert served() == before
+    client.get(url)
+    assert served() == before + origin.media_bytes
+
+
+def test_joined_download_is_cancelled_when_the_last_client_leaves(client):
+    slow = FakeOrigin(media_bytes=4 * 1024 * 1024, rate=256 * 1024).start()
+    try:
+        url = slow.video_url('shared')
+        first = client.post('/api/download', json={'url': url}).get_json()
+        second = client.post('/api/download', json={'url': url}).get_json()
+        assert second['joined'] and second['download_id'] == first['download_id']
+        download_id = first['download_id']
+
+        left = client.delete(f'/api/download/{download_id}').get_json()
+        assert left['clients'] == 1
+        assert client.get(f'/api/progress/{download_id}').get_json()['status'] != 'cancelled'
+
+        assert 'clients' not in client.delete(f'/api/download/{download_id}').get_json()
+        assert wait_for(client, download_id)['status'] == 'cancelled'
+    finally:
+        slow.stop()
+
+
+def fetch(client, response):
+    """Wait for a queued download or clip and return its progress and file bytes"""
+    assert response.status_code == 200, response.get_json()
+    progress = wait_for(client, response.get_json()['download_id'])
+    assert progress['status'] == 'completed', progress
+    return progress, client.get(progress['download_url']).data
+
+
+def test_clips_and_full_downloads_are_stored_apart(client, origin, app_module, monkeypatch):
+    # ffmpeg isn't needed: the cut writes a marker instead of media
+    def cut_clip(ffmpeg, urls, start, end, output, **kwargs):
+        with open(output, 'wb') as f:
+            f.write(f'clip {start:g}-{end:g}'.encode())
+        return 'copy'
+
+    monkeypatch.setattr(type(app_module.ffmpeg_caps), 'location', property(lambda self: 'ffmpeg'))
+    monkeypatch.setattr(app_module, 'cut_clip', cut_clip)
+    url = origin.video_url('clipped')
+
+    full, full_data = fetch(client, client.post('/api/download', json={'url': url}))
+    assert len(full_data) == origin.media_bytes
+
+    clip, clip_data = fetch(client, client.post('/api/clip', json={'url': url, 'start': 0, 'end': 5}))
+    assert clip_data == b'clip 0-5'
+    assert clip['download_url'] != full['download_url']
+
+    # `duration` is the same clip from the start, served from the store
+    same, _ = fetch(client, client.post('/api/download', json={'url': url, 'duration': 5}))
+    assert same['download_url'] == clip['download_url']
+
+    again, again_data = fetch(client, client.post('/api/download', json={'url': url}))
+    assert again['download_url'] == full['download_url']
+    assert len(again_data) == origin.media_bytes
+
+
+def test_cancel_unknown_download(client):
+    assert client.delete('/api/download/does-not-exist').status_code == 404
+
+
+def test_batch_download_archive(client, origin):
+    urls = [origin.video_url('batch-a'), origin.video_url('batch-b')]
+    batch = client.post('/api/download/batch', json={'urls': urls}).get_json()
+    progress = wait_for(client, batch['download_id'])
+    assert progress['status'] == 'completed'
+    assert progress['completed'] == 2
+
+    archive = client.get(progress['download_url'])
+    assert archive.status_code == 200
+    with zipfile.ZipFile(BytesIO(archive.data)) as zf:
+        assert len(zf.namelist()) == 2
+        assert all(info.file_size == origin.media_bytes for info in zf.infolist())
@@ -0,0 +1,96 @@
+import pytest
+from flask import Flask
+
+from file_serving import resolve_ranges, serve_file
+
+DATA = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(DATA)
+    app = Flask(__name__)
+
+    @app.route('/file')
+    def get_file():
+        return serve_file(str(path), 'My video.mp4', etag='key')
+
+    @app.route('/accel')
+    def get_accel():
+        return serve_file(str(path), 'My video.mp4', etag='key', accel_mode='x-accel')
+
+    return app.test_client()
+
+
+def test_resolve_ranges():
+    assert resolve_ranges([(0, 10)], 100) == [(0, 10)]
+    assert resolve_ranges([(90, None)], 100) == [(90, 100)]
+    assert resolve_ranges([(-10, None)], 100) == [(90, 100)]
+    assert resolve_ranges([(50, 500)], 100) == [(50, 100)]
+    assert resolve_ranges([(100, 200)], 100) is None
+
+
+def test_full_file(client):
+    response = client.get('/file')
+    assert response.status_code == 200
+    assert response.data == DATA
+    assert response.headers['Content-Length'] == str(len(DATA))
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['ETag'] == '"key"'
+    assert response.headers['Content-Type'] == 'video/mp4'
+    assert response.headers['Content-Disposition'] == "attachment; filename*=UTF-8''My%20video.mp4"
+
+
+def test_single_range(client):
+    response = client.get('/file', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == DATA[100:200]
+    assert response.headers['Content-Range'] == f'bytes 100-199/{len(DATA)}'
+    assert response.headers['Content-Length'] == '100'
+
+
+def test_suffix_and_open_ended_ranges(client):
+    assert client.get('/file', headers={'Range': 'bytes=-16'}).data == DATA[-16:]
+    assert client.get('/file', headers={'Range': 'bytes=10200-'}).data == DATA[10200:]
+
+
+def test_multiple_ranges(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-9,20-29'})
+    assert response.status_code == 206
+    assert response.mimetype == 'multipart/byteranges'
+    assert response.headers['Content-Length'] == str(len(response.data))
+    boundary = response.mimetype_params['boundary']
+    parts = response.data.split(f'--{boundary}'.encode())[1:-1]
+    assert len(parts) == 2
+    assert parts[0].endswith(b'\r\n\r\n' + DATA[0:10] + b'\r\n')
+    assert f'Content-Range: bytes 20-29/{len(DATA)}'.encode() in parts[1]
+    assert parts[1].endswith(b'\r\n\r\n' + DATA[20:30] + b'\r\n')
+
+
+def test_unsatisfiable_range(client):
+    response = client.get('/file', headers={'Range': f'bytes={len(DATA)}-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(DATA)}'
+
+
+def test_conditional_requests(client):
+    assert client.get('/file', headers={'If-None-Match': '"key"'}).status_code == 304
+    assert client.get('/file', headers={'If-None-Match': '"other"'}).status_code == 200
+    last_modified = client.get('/file').headers['Last-Modified']
+    assert client.get('/file', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+
+def test_if_range_for_another_version_gets_the_whole_file(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': '"old"'})
+    assert response.status_code == 200
+    assert response.data == DATA
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': '"key"'})
+    assert response.status_code == 206
+
+
+def test_accel_redirect_leaves_the_body_to_the_proxy(client):
+    response = client.get('/accel')
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == '/protected-downloads/video.mp4'
@@ -0,0 +1,99 @@
+import pytest
+
+from progress_store import MemoryProgressStore, SQLiteProgressStore, open_progress_store
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / 'progress.db')
+
+
+def test_open_progress_store(sqlite_path):
+    assert isinstance(open_progress_store('memory'), MemoryProgressStore)
+    assert isinstance(open_progress_store(''), MemoryProgressStore)
+    store = open_progress_store(f'sqlite:///{sqlite_path}')
+    assert isinstance(store, SQLiteProgressStore)
+    store.close()
+    with pytest.raises(ValueError):
+        open_progress_store('postgres://localhost')
+
+
+def test_updates_are_buffered_until_flushed(sqlite_path):
+    # A long interval keeps the background flusher out of the way
+    store = SQLiteProgressStore(sqlite_path, flush_interval=60)
+    other = SQLiteProgressStore(sqlite_path, flush_interval=60)
+    try:
+        store['a'] = {'status': 'downloading', 'progress': 10}
+        store['a'] = {'status': 'downloading', 'progress': 20}
+        assert store['a']['progress'] == 20
+        assert 'a' not in other
+
+        store.flush()
+        assert other['a'] == {'status': 'downloading', 'progress': 20}
+        assert store.stats()['buffered_writes'] == 2
+        assert store.stats()['flushes'] == 1
+        assert store.stats()['pending_writes'] == 0
+    finally:
+        store.close()
+        other.close()
+
+
+def test_final_states_are_written_through(sqlite_path):
+    store = SQLiteProgressStore(sqlite_path, flush_interval=60)
+    other = SQLiteProgressStore(sqlite_path, flush_interval=60)
+    try:
+        store['a'] = {'status': 'downloading', 'progress': 50}
+        store['a'] = {'status': 'completed', 'progress': 100}
+        assert other['a']['status'] == 'completed'
+    finally:
+        store.close()
+        other.close()
+
+
+def test_mapping_behaviour(sqlite_path):
+    store = SQLiteProgressStore(sqlite_path, flush_interval=60)
+    try:
+        store['a'] = {'status': 'completed'}
+        store['b'] = {'status': 'queued'}
+        assert sorted(store) == ['a', 'b']
+        assert len(store) == 2
+        assert store.get('missing', {}) == {}
+
+        del store['a']
+        assert 'a' not in store
+        with pytest.raises(KeyError):
+            store['a']
+        store.flush()
+        assert sorted(store) == ['b']
+        with pytest.raises(KeyError):
+            del store['a']
+    finally:
+        store.close()
+
+
+def test_progress_survives_a_restart(sqlite_path):
+    store = SQLiteProgressStore(sqlite_path, flush_interval=60)
+    store['a'] = {'status': 'downloading', 'progress': 30}
+    store.close()
+
+    store = SQLiteProgressStore(sqlite_path)
+    try:
+        assert store['a']['progress'] == 30
+    finally:
+        store.close()
+
+
+def test_redis_store_with_a_stand_in_client():
+    fakeredis = pytest.importorskip('fakeredis')
+    from progress_store import RedisProgressStore
+
+    client = fakeredis.FakeRedis()
+    store = RedisProgressStore(client=client, flush_interval=60)
+    other = RedisProgressStore(client=client, flush_interval=60)
+    store['a'] = {'status': 'downloading', 'progress': 5}
+    assert 'a' not in other
+    store.flush()
+    assert other['a']['progress'] == 5
+    del store['a']
+    store.flush()
+    assert list(other) == []
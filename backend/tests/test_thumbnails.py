@@ -0,0 +1,26 @@
+import pytest
+
+from thumbnails import ThumbnailCache
+
+
+def test_thumbnails_registered_by_another_process_are_served(origin, tmp_path):
+    one = ThumbnailCache(str(tmp_path), budget_bytes=10 * 1024 * 1024)
+    other = ThumbnailCache(str(tmp_path), budget_bytes=10 * 1024 * 1024)
+    with pytest.raises(KeyError):
+        other.get('Youtube:abc')
+
+    one.register('Youtube:abc', origin.video_url('thumb'))
+    path, _, _ = other.get('Youtube:abc')
+    with open(path, 'rb') as f:
+        assert len(f.read()) == origin.media_bytes
+
+
+def test_registering_again_is_not_counted_twice(origin, tmp_path):
+    cache = ThumbnailCache(str(tmp_path), budget_bytes=10 * 1024 * 1024)
+    cache.register('Youtube:abc', origin.video_url('thumb'))
+    size = cache.stats()['bytes']
+    # A restarted process knows the file but not the URL yet
+    restarted = ThumbnailCache(str(tmp_path), budget_bytes=10 * 1024 * 1024)
+    restarted.register('Youtube:abc', origin.video_url('thumb'))
+    restarted.register('Youtube:abc', origin.video_url('thumb'))
+    assert restarted.stats()['bytes'] == size
@@ -0,0 +1,246 @@
+"""
+Thumbnail proxy cache.
+
+List screens only need small thumbnails, but sites often link full-size
+images. ThumbnailCache fetches a video's thumbnail once, keeps the original
+on disk and derives resized WebP/JPEG variants from it on a small thread
+pool. Requested widths are rounded up to a few fixed steps, so a handful of
+variants serve every screen. Files are kept under a byte budget, least
+recently used first. They are named after the video and written atomically,
+so several server processes can share the directory.
+
+Resizing needs Pillow (pip install Pillow); without it every request gets
+the original.
+"""
+
+import hashlib
+import os
+import threading
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+WIDTHS = (80, 160, 320, 480, 640, 960, 1280)
+FORMATS = {'webp': ('image/webp', 'WEBP'), 'jpeg': ('image/jpeg', 'JPEG')}
+QUALITY = 80
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG', 'image/png'),
+    (b'GIF8', 'image/gif'),
+)
+
+
+class ThumbnailError(Exception):
+    """The thumbnail could not be fetched or decoded"""
+
+
+def content_type(data):
+    """Image type of a file's leading bytes"""
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    return 'application/octet-stream'
+
+
+def _base_name(video_id):
+    """Prefix of the names of a video's files"""
+    return hashlib.sha1(video_id.encode()).hexdigest()[:24]
+
+
+def width_step(width):
+    """Smallest variant width covering a requested width"""
+    return next((step for step in WIDTHS if step >= width), WIDTHS[-1])
+
+
+class ThumbnailCache:
+    """Originals and resized variants of video thumbnails in a directory.
+
+    Thumbnail URLs are learnt from extracted metadata through register(),
+    so only videos the server has seen can be fetched. Each URL is also
+    written to a small .src file next to the images, so a process sharing
+    the directory can fetch a thumbnail another one was told about.
+    """
+
+    def __init__(self, directory, budget_bytes, workers=2, max_sources=4096, timeout=15):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.max_sources = max_sources
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='thumbnail')
+        self._lock = threading.Lock()
+        self._sources = OrderedDict()  # video_id -> origin URL
+        self._files = OrderedDict()  # filename -> size, least recently used first
+        self._etags = {}
+        self._building = {}  # filename -> Future
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith('.tmp'):
+                    os.remove(entry.path)
+                    continue
+                stat = entry.stat()
+                found.append((stat.st_atime, entry.name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._files[name] = size
+            self._bytes += size
+
+    def register(self, video_id, url):
+        """Remember where a video's thumbnail comes from"""
+        if not url:
+            return
+        with self._lock:
+            known = self._sources.get(video_id) == url
+            self._sources[video_id] = url
+            self._sources.move_to_end(video_id)
+            while len(self._sources) > self.max_sources:
+                self._sources.popitem(last=False)
+            source = _base_name(video_id) + '.src'
+            if known and source in self._files:
+                self._files.move_to_end(source)
+                return
+        self._store(source, url.encode('utf-8'))
+
+    def get(self, video_id, width=None, fmt=None):
+        """Path, ETag and content type of a thumbnail, fetching or resizing it first if needed.
+
+        Without width the original is returned as fetched. Raises KeyError
+        for a video whose thumbnail URL is unknown and ThumbnailError when
+        the image can't be fetched or decoded.
+        """
+        base = _base_name(video_id)
+        original = base + '.orig'
+        self._once(original, lambda: self._fetch(video_id))
+        if width is None or Image is None:
+            return self._result(original)
+
+        name = f'{base}.w{width_step(width)}.{fmt}'
+        self._once(name, lambda: self._pool.submit(
+            self._resize, os.path.join(self.directory, original), width_step(width), fmt).result())
+        return self._result(name)
+
+    def stats(self):
+        with self._lock:
+            return {'files': len(self._files), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def _result(self, name):
+        path = os.path.join(self.directory, name)
+        etag = self._etags.get(name)
+        if etag is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+            etag = self._etags[name] = hashlib.sha1(data).hexdigest()
+            mime = content_type(data)
+        else:
+            with open(path, 'rb') as f:
+                mime = content_type(f.read(16))
+        return path, etag, mime
+
+    def _once(self, name, build):
+        """Create file name with build() unless it exists; concurrent callers share one build"""
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+                self.hits += 1
+                return
+            if os.path.exists(os.path.join(self.directory, name)):
+                # Written by another process sharing the directory
+                self._add(name, os.path.getsize(os.path.join(self.directory, name)))
+                return
+            future = self._building.get(name)
+            owner = future is None
+            if owner:
+                future = self._building[name] = Future()
+                self.misses += 1
+        if not owner:
+            future.result(timeout=self.timeout * 2)
+            return
+        try:
+            data = build()
+            self._store(name, data)
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._building[name]
+
+    def _fetch(self, video_id):
+        with self._lock:
+            url = self._sources.get(video_id)
+        if url is None:
+            # Registered by another process sharing the directory
+            try:
+                with open(os.path.join(self.directory, _base_name(video_id) + '.src'), 'rb') as f:
+                    url = f.read().decode('utf-8')
+            except OSError:
+                raise KeyError(video_id)
+        request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read(MAX_SOURCE_BYTES + 1)
+        except OSError as e:
+            raise ThumbnailError(f'Could not fetch the thumbnail: {e}')
+        if len(data) > MAX_SOURCE_BYTES:
+            raise ThumbnailError('The thumbnail is too large')
+        return data
+
+    @staticmethod
+    def _resize(path, width, fmt):
+        try:
+            with Image.open(path) as image:
+                # Only ever shrinks, and lets JPEG decode at a reduced scale
+                image.thumbnail((width, width * 4))
+                if fmt == 'jpeg':
+                    image = image.convert('RGB')
+                elif image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA')
+                options = {'method': 4} if fmt == 'webp' else {'optimize': True, 'progressive': True}
+                out = BytesIO()
+                image.save(out, FORMATS[fmt][1], quality=QUALITY, **options)
+        except (OSError, ValueError) as e:
+            raise ThumbnailError(f'Could not decode the thumbnail: {e}')
+        return out.getvalue()
+
+    def _store(self, name, data):
+        path = os.path.join(self.directory, name)
+        partial = path + '.tmp'
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+        with self._lock:
+            self._etags[name] = hashlib.sha1(data).hexdigest()
+            self._add(name, len(data))
+
+    def _add(self, name, size):
+        """Index a file and evict the least recently used ones over budget (lock held)"""
+        self._bytes -= self._files.pop(name, 0)
+        self._files[name] = size
+        self._bytes += size
+        while self._bytes > self.budget_bytes and len(self._files) > 1:
+            victim, victim_size = self._files.popitem(last=False)
+            self._bytes -= victim_size
+            self._etags.pop(victim, None)
+            try:
+                os.remove(os.path.join(self.directory, victim))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,150 @@
+"""
+Reusable, pre-warmed YoutubeDL instances.
+
+Building a YoutubeDL registers every extractor, which costs tens of
+milliseconds per request or job, and starts with no open connections.
+YoutubeDLPool keeps idle instances per option profile ('info', 'batch',
+'formats', 'download-video', 'download-audio') and checks one out for a
+single request or job at a time. Job-specific options (output template,
+format, hooks, pacing) are applied on checkout and undone on return, so the
+next user sees the profile's own options. A reused instance keeps its
+request director, so with the requests package installed keep-alive
+connections to media origins carry over from one job to the next.
+
+An instance whose use raised is closed instead of returned: yt-dlp's state
+after an interrupted download is not guaranteed to be clean.
+"""
+
+import json
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+def _fingerprint(opts):
+    return json.dumps(opts, sort_keys=True, default=repr)
+
+
+class _Baseline:
+    """A fresh instance's state, restored when it goes back to the pool"""
+
+    def __init__(self, ydl):
+        self.params = dict(ydl.params)
+        self.format_selector = ydl.format_selector
+        self.progress_hooks = len(ydl._progress_hooks)
+        self.postprocessor_hooks = len(ydl._postprocessor_hooks)
+
+    def restore(self, ydl):
+        ydl.params.clear()
+        ydl.params.update(self.params)
+        ydl.format_selector = self.format_selector
+        del ydl._progress_hooks[self.progress_hooks:]
+        del ydl._postprocessor_hooks[self.postprocessor_hooks:]
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls.clear()
+        ydl._printed_messages.clear()
+
+
+class YoutubeDLPool:
+    """Idle YoutubeDL instances per profile, at most max_idle of each.
+
+    factory(opts) builds an instance (normally yt_dlp.YoutubeDL). When a
+    profile's options change, e.g. after ffmpeg moved, its idle instances
+    are closed and new ones are built with the new options.
+    """
+
+    def __init__(self, factory, max_idle=4):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}  # profile -> (options fingerprint, deque of (ydl, baseline))
+        self.created = 0
+        self.reused = 0
+
+    @contextmanager
+    def checkout(self, profile, opts, format=None, outtmpl=None, progress_hooks=(), postprocessor_hooks=(),
+                 **params):
+        """Borrow an instance built with opts, with job-specific options on top.
+
+        format replaces the format selector, outtmpl the default output
+        template, hooks are added after the profile's own and any other
+        keyword arguments are set as params.
+        """
+        fingerprint = _fingerprint(opts)
+        entry = self._take(profile, fingerprint) or self._create(opts)
+        ydl, baseline = entry
+        try:
+            if format is not None:
+                ydl.params['format'] = format
+                ydl.format_selector = ydl.build_format_selector(format)
+            if outtmpl is not None:
+                ydl.params['outtmpl'] = dict(ydl.params['outtmpl'], default=outtmpl)
+            ydl.params.update(params)
+            for hook in progress_hooks:
+                ydl.add_progress_hook(hook)
+            for hook in postprocessor_hooks:
+                ydl.add_postprocessor_hook(hook)
+            yield ydl
+        except BaseException:
+            ydl.close()
+            raise
+        baseline.restore(ydl)
+        self._give(profile, fingerprint, entry)
+
+    def warm(self, profile, opts, count=1):
+        """Build instances ahead of the first request that needs them"""
+        fingerprint = _fingerprint(opts)
+        self._select(profile, fingerprint)
+        for _ in range(min(count, self.max_idle)):
+            with self._lock:
+                if len(self._idle[profile][1]) >= count:
+                    return
+            self._give(profile, fingerprint, self._create(opts))
+
+    def stats(self):
+        with self._lock:
+            idle = sum(len(entries) for _, entries in self._idle.values())
+            return {'idle': idle, 'created': self.created, 'reused': self.reused}
+
+    def close(self):
+        """Close every idle instance"""
+        with self._lock:
+            stale = [entry for _, entries in self._idle.values() for entry in entries]
+            self._idle.clear()
+        for ydl, _ in stale:
+            ydl.close()
+
+    def _create(self, opts):
+        ydl = self.factory(dict(opts))
+        with self._lock:
+            self.created += 1
+        return ydl, _Baseline(ydl)
+
+    def _select(self, profile, fingerprint):
+        """Make fingerprint the profile's current options, retiring instances built with others"""
+        with self._lock:
+            stored = self._idle.get(profile)
+            if stored is not None and stored[0] == fingerprint:
+                return
+            self._idle[profile] = (fingerprint, deque())
+        for ydl, _ in stored[1] if stored is not None else ():
+            ydl.close()
+
+    def _take(self, profile, fingerprint):
+        self._select(profile, fingerprint)
+        with self._lock:
+            entries = self._idle[profile][1]
+            if self._idle[profile][0] != fingerprint or not entries:
+                return None
+            self.reused += 1
+            return entries.pop()
+
+    def _give(self, profile, fingerprint, entry):
+        with self._lock:
+            stored = self._idle.get(profile)
+            if stored is not None and stored[0] == fingerprint and len(stored[1]) < self.max_idle:
+                stored[1].append(entry)
+                return
+        entry[0].close()